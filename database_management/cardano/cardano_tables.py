@@ -7,9 +7,11 @@ from sqlalchemy import (
     DateTime,
     ForeignKey,
     Integer,
+    BigInteger,
     UUID,
     Boolean,
     func,
+    Index,
     Numeric
 )
 from sqlalchemy.ext.declarative import declarative_base
@@ -243,3 +245,19 @@ provider_to_s3_import_status_table: Table = Table(
     ),  # date you insert the row
 )
 
+s3_processed_objects_table: Table = Table(
+    "s3_processed_objects",
+    metadata,
+    Column("key", String, primary_key=True),  # full S3 key of a raw or transformed file loaded into the database
+    Column("etag", String, nullable=True),  # null for files uploaded in the background during a direct load
+    Column("size", BigInteger, nullable=True),  # bytes
+    Column("rows", Integer, nullable=False),  # records read from the raw file, or rows staged from the transformed file
+    Column(
+        "loaded_at",
+        DateTime(timezone=False),
+        nullable=False,
+        server_default=func.now()  # server-side default
+    ),
+)
+# the ledger's keys in bytewise order, S3's listing order, from which the greatest key under a prefix is read
+Index("ix_s3_processed_objects_key_c", s3_processed_objects_table.c.key.collate("C"))
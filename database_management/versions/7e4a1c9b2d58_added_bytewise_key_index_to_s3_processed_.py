@@ -0,0 +1,26 @@
+"""added bytewise key index to s3_processed_objects
+
+Revision ID: 7e4a1c9b2d58
+Revises: 5c1e7d2a9f30
+Create Date: 2026-10-17 14:03:21.870412
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7e4a1c9b2d58'
+down_revision: Union[str, None] = '5c1e7d2a9f30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_s3_processed_objects_key_c', 's3_processed_objects', [sa.text('key COLLATE "C"')], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_s3_processed_objects_key_c', table_name='s3_processed_objects')
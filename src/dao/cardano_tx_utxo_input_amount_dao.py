@@ -5,12 +5,22 @@ from dotenv import load_dotenv
 import logging
 import pandas as pd
 from datetime import datetime
+from typing import Any
 from sqlalchemy import (Table, text)
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncConnection
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncConnection
 from sqlalchemy.exc import OperationalError
 from asyncio import new_event_loop, AbstractEventLoop
 from tenacity import retry, wait_fixed, stop_after_attempt, retry_if_exception_type
+from src.dao.engine_registry import EngineRegistry, get_default_engine_registry
 from src.utils.logging_utils import setup_logging
+from src.dao.parquet_utils import transformed_file_to_copy_records
+from src.file_explorer.transformed_files import is_parquet
+from src.dao.staging_utils import (
+    StagingMergeResult,
+    copy_records_to_temp_table,
+    parse_copy_status,
+)
+from src.utils.typed_records import df_to_copy_records
 
 from database_management.cardano.cardano_tables import  cardano_tx_utxo_output_amount_table
 
@@ -22,10 +32,12 @@ class CardanoTxUtxoInputAmtDAO:
     """
     Responsible for inserting a list of CardanoTransactionUtxoDTO into DB
     """
-    def __init__(self, connection_string: str, table: Table) -> None:
-        self._engine: AsyncEngine = create_async_engine(connection_string)
+    def __init__(self, connection_string: str, table: Table, use_binary_copy: bool = True, engine_registry: EngineRegistry | None = None) -> None:
+        self._engine: AsyncEngine = (engine_registry or get_default_engine_registry()).get_engine(connection_string)
         self._table: Table = table
         self._temp_table_name: str | None = None
+        # binary COPY of typed records, False falls back to the CSV text COPY
+        self._use_binary_copy: bool = use_binary_copy
 
     @retry(
         retry=retry_if_exception_type(OperationalError),
@@ -62,7 +74,15 @@ class CardanoTxUtxoInputAmtDAO:
         stop=stop_after_attempt(5),
         reraise=True,
     )
-    async def copy_tx_utxo_input_amt_to_db(self, async_connection: AsyncConnection, data_buffer: BytesIO) -> None:
+    async def copy_tx_utxo_input_amt_to_db(self, async_connection: AsyncConnection, data_buffer: BytesIO) -> StagingMergeResult:
+        # a Parquet file has no CSV text to COPY, it is always loaded as typed records
+        if self._use_binary_copy or is_parquet(data_buffer):
+            # parse the csv or parquet file once into typed records and stream them with the binary COPY protocol
+            records: list[tuple[Any, ...]] = transformed_file_to_copy_records(data_buffer, self._table)
+            staged: int = await copy_records_to_temp_table(async_connection, self._temp_table_name, self._table, records)
+            inserted: int = await self._merge_temp_table(async_connection)
+            return StagingMergeResult(table=self._table.name, staged=staged, inserted=inserted)
+
         # this 'raw_adapt' is not the real asyncpg.Connection:
         raw_adapt = await async_connection.get_raw_connection()
         # ***WARNING***: private attribute; can break in future SQLAlchemy versions
@@ -92,7 +112,7 @@ class CardanoTxUtxoInputAmtDAO:
         df.to_csv(new_buffer, index=False, header=True)
         new_buffer.seek(0)
 
-        await actual_asyncpg_conn.copy_to_table(
+        status: str = await actual_asyncpg_conn.copy_to_table(
             table_name=self._temp_table_name,
             source=new_buffer,
             columns=copy_columns,
@@ -100,18 +120,46 @@ class CardanoTxUtxoInputAmtDAO:
             header=True,
         )
 
-        # 4. Merge temp into real table
-        col_sql = ",".join(f'"{col}"' for col in copy_columns)
+        staged: int = parse_copy_status(status)
+        inserted: int = await self._merge_temp_table(async_connection)
+        return StagingMergeResult(table=self._table.name, staged=staged, inserted=inserted)
+
+    @retry(
+        retry=retry_if_exception_type(OperationalError),
+        wait=wait_fixed(0.01),
+        stop=stop_after_attempt(5),
+        reraise=True,
+    )
+    async def copy_records_to_db(self, async_connection: AsyncConnection, records: list[tuple[Any, ...]]) -> StagingMergeResult:
+        """
+        bulk loads records, tuples in the table's column order typed as typed_records.to_copy_records returns them,
+        into the temp table with the binary COPY protocol, then merges them into the table
+        """
+        staged: int = await copy_records_to_temp_table(async_connection, self._temp_table_name, self._table, records)
+        inserted: int = await self._merge_temp_table(async_connection)
+        return StagingMergeResult(table=self._table.name, staged=staged, inserted=inserted)
+
+    async def copy_df_to_db(self, async_connection: AsyncConnection, df: pd.DataFrame) -> StagingMergeResult:
+        return await self.copy_records_to_db(async_connection, df_to_copy_records(df, self._table))
+
+    async def _merge_temp_table(self, async_connection: AsyncConnection) -> int:
+        """
+        inserts the rows staged since the last merge, then empties the temp table so the next file
+        only merges its own rows; returns the number of rows inserted
+        """
+        col_names_str = ",".join(f'"{col.name}"' for col in self._table.columns)
         insert_clause = text(
             f"""
-                INSERT INTO {self._table.name} ({col_sql})
-                SELECT {col_sql}
+                INSERT INTO {self._table.name} ({col_names_str})
+                SELECT {col_names_str}
                 FROM {self._temp_table_name}
                 ON CONFLICT (id) DO NOTHING
             """
         )
-        await async_connection.execute(insert_clause)
-        logger.info("%s → inserted %d rows", self._table.name, len(df))
+        result = await async_connection.execute(insert_clause)
+        logger.info("%s → inserted %d rows", self._table.name, result.rowcount)
+        await async_connection.execute(text(f"TRUNCATE {self._temp_table_name}"))
+        return result.rowcount
 
     @property
     def table(self):
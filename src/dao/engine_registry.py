@@ -0,0 +1,145 @@
+import logging
+import os
+from typing import Any
+
+from pydantic import BaseModel
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+from src.utils.logging_utils import setup_logging
+
+logger = logging.getLogger(__name__)
+setup_logging(logger)
+
+
+class PoolStatus(BaseModel):
+    """
+    connection usage of one engine's pool at the time it is read
+    """
+    database: str
+    pool_size: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    peak_checked_out: int
+
+
+class EngineRegistry:
+    """
+    Responsible for handing out one AsyncEngine, hence one connection pool, per connection string
+    - every DAO and pipeline asks the registry for its engine instead of calling create_async_engine,
+      so the whole process shares one pool per database instead of one per object
+    - pool size, overflow, pre-ping, recycle and the asyncpg statement caches are configured here only
+    - pool_status() reports the connections in use and the peak reached, per database
+    """
+    def __init__(
+        self,
+        pool_size: int = 10,
+        max_overflow: int = 5,
+        pool_timeout: float = 30.0,
+        pool_recycle: int = 1800,
+        pool_pre_ping: bool = True,
+        statement_cache_size: int = 100,
+    ) -> None:
+        if pool_size < 1 or max_overflow < 0:
+            raise ValueError(f"invalid pool settings: pool_size={pool_size}, max_overflow={max_overflow}")
+        self._pool_size: int = pool_size
+        self._max_overflow: int = max_overflow
+        self._pool_timeout: float = pool_timeout
+        self._pool_recycle: int = pool_recycle
+        self._pool_pre_ping: bool = pool_pre_ping
+        self._statement_cache_size: int = statement_cache_size
+        self._engines: dict[str, AsyncEngine] = {}
+        self._peak_checked_out: dict[str, int] = {}
+
+    @staticmethod
+    def from_env() -> "EngineRegistry":
+        """
+        a statement cache size of 0 disables prepared statement caching, as required behind pgbouncer in transaction mode
+        """
+        return EngineRegistry(
+            pool_size=int(os.getenv("DB_POOL_SIZE", "10")),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "5")),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+            pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+            pool_pre_ping=os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+            statement_cache_size=int(os.getenv("DB_STATEMENT_CACHE_SIZE", "100")),
+        )
+
+    def get_engine(self, connection_string: str) -> AsyncEngine:
+        engine: AsyncEngine | None = self._engines.get(connection_string)
+        if engine is None:
+            engine = create_async_engine(
+                connection_string,
+                pool_size=self._pool_size,
+                max_overflow=self._max_overflow,
+                pool_timeout=self._pool_timeout,
+                pool_recycle=self._pool_recycle,
+                pool_pre_ping=self._pool_pre_ping,
+                connect_args={
+                    # SQLAlchemy's cache of prepared statements per connection, and asyncpg's own
+                    "prepared_statement_cache_size": self._statement_cache_size,
+                    "statement_cache_size": self._statement_cache_size,
+                },
+            )
+            self._track_peak(connection_string, engine)
+            self._engines[connection_string] = engine
+        return engine
+
+    def pool_status(self) -> list[PoolStatus]:
+        statuses: list[PoolStatus] = []
+        for connection_string, engine in self._engines.items():
+            pool: Any = engine.pool
+            statuses.append(
+                PoolStatus(
+                    # no credentials in the report
+                    database=make_url(connection_string).render_as_string(hide_password=True),
+                    pool_size=pool.size(),
+                    checked_out=pool.checkedout(),
+                    checked_in=pool.checkedin(),
+                    overflow=max(pool.overflow(), 0),
+                    peak_checked_out=self._peak_checked_out[connection_string],
+                )
+            )
+        return statuses
+
+    def log_pool_status(self) -> None:
+        for status in self.pool_status():
+            logger.info(
+                "pool %s: %d checked out (peak %d), %d idle, %d overflow, size %d + %d overflow",
+                status.database, status.checked_out, status.peak_checked_out, status.checked_in,
+                status.overflow, status.pool_size, self._max_overflow,
+            )
+
+    async def dispose(self) -> None:
+        """
+        closes every pooled connection, for the end of a run
+        """
+        for engine in self._engines.values():
+            await engine.dispose()
+        self._engines.clear()
+        self._peak_checked_out.clear()
+
+    def _track_peak(self, connection_string: str, engine: AsyncEngine) -> None:
+        self._peak_checked_out[connection_string] = 0
+
+        def on_checkout(*_: Any) -> None:
+            checked_out: int = engine.pool.checkedout()
+            if checked_out > self._peak_checked_out.get(connection_string, 0):
+                self._peak_checked_out[connection_string] = checked_out
+
+        event.listen(engine.sync_engine, "checkout", on_checkout)
+
+
+_default_engine_registry: EngineRegistry | None = None
+
+
+def get_default_engine_registry() -> EngineRegistry:
+    """
+    returns the process-wide registry shared by every DAO and pipeline that is not given one explicitly
+    """
+    global _default_engine_registry
+    if _default_engine_registry is None:
+        _default_engine_registry = EngineRegistry.from_env()
+    return _default_engine_registry
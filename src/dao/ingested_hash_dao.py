@@ -0,0 +1,68 @@
+import logging
+
+from tenacity import retry, wait_fixed, stop_after_attempt, retry_if_exception_type
+from sqlalchemy.exc import SQLAlchemyError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy import (
+    Table,
+    Select,
+    select,
+    CursorResult,
+)
+
+from src.dao.engine_registry import EngineRegistry, get_default_engine_registry
+from src.utils.iter_utils import batched
+from src.utils.logging_utils import setup_logging
+
+logger = logging.getLogger(__name__)
+setup_logging(logger)
+
+# hashes looked up per query, a bounded IN list probed against the hash primary key
+DEFAULT_LOOKUP_BATCH_SIZE: int = 1000
+
+
+class IngestedHashDAO:
+    """
+    Responsible for telling which transaction hashes already have rows in a table keyed by hash,
+    e.g. cardano_transactions or cardano_tx_utxo, so the provider pipelines skip fetching them again
+    - the hashes are looked up in batches of lookup_batch_size against the table's primary key,
+      an anti-join that costs an index probe per hash instead of a Blockfrost call
+    """
+    def __init__(
+            self,
+            connection_string: str,
+            table: Table,
+            engine_registry: EngineRegistry | None = None,
+            lookup_batch_size: int = DEFAULT_LOOKUP_BATCH_SIZE,
+    ) -> None:
+        self._engine: AsyncEngine = (engine_registry or get_default_engine_registry()).get_engine(connection_string)
+        self._table: Table = table
+        self._lookup_batch_size: int = lookup_batch_size
+
+    async def read_ingested_hashes(self, hashes: list[str]) -> set[str]:
+        """
+        returns the hashes, among the given ones, that already have a row in the table
+        """
+        ingested: set[str] = set()
+        for hash_batch in batched(dict.fromkeys(hashes), self._lookup_batch_size):
+            ingested.update(await self._read_ingested_batch(hash_batch))
+        return ingested
+
+    @retry(
+        retry=retry_if_exception_type(OperationalError),
+        wait=wait_fixed(0.01),  # ~10ms before attempts
+        stop=stop_after_attempt(5),  # equivalent to 5 retries
+        reraise=True
+    )
+    async def _read_ingested_batch(self, hashes: list[str]) -> list[str]:
+        query_ingested: Select = select(self._table.c.hash).where(self._table.c.hash.in_(hashes))
+        try:
+            async with self._engine.begin() as conn:
+                cursor_result: CursorResult = await conn.execute(query_ingested)
+            return list(cursor_result.scalars().all())
+        except OperationalError:
+            logger.warning("Failed to fetch ingested hashes due to OperationalError.Retrying..")
+            raise
+        except SQLAlchemyError:
+            logger.exception("Failed to fetch ingested hashes due to unexpected error. Exiting..")
+            raise
@@ -0,0 +1,29 @@
+"""
+Binary COPY records of the transformed S3 layer's files, csv or Parquet, the file formats being those of
+src.file_explorer.transformed_files
+"""
+import io
+from typing import Any
+
+from sqlalchemy import Table
+
+from src.dao.staging_utils import csv_to_copy_records
+from src.file_explorer.transformed_files import is_parquet, read_parquet_columns
+from src.utils.typed_records import to_copy_records
+
+
+def parquet_to_copy_records(data_buffer: io.BytesIO, table: Table) -> list[tuple[Any, ...]]:
+    """
+    reads the table's columns of a transformed Parquet file, and no other, into binary COPY records
+    """
+    columns: list[str] = [column.name for column in table.columns]
+    return to_copy_records(zip(*read_parquet_columns(data_buffer, columns)), table)
+
+
+def transformed_file_to_copy_records(data_buffer: io.BytesIO, table: Table) -> list[tuple[Any, ...]]:
+    """
+    parses a transformed file, Parquet or CSV whichever it holds, into binary COPY records
+    """
+    if is_parquet(data_buffer):
+        return parquet_to_copy_records(data_buffer, table)
+    return csv_to_copy_records(data_buffer, table)
@@ -4,7 +4,7 @@ from asyncio import new_event_loop, AbstractEventLoop
 from dotenv import load_dotenv
 from tenacity import retry, wait_fixed, stop_after_attempt
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncConnection
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncConnection
 from sqlalchemy import (
     Table,
     Insert,
@@ -18,6 +18,7 @@ from sqlalchemy.dialects.postgresql import insert
 from datetime import datetime
 import logging
 from database_management.cardano.cardano_tables import provider_to_s3_import_status_table
+from src.dao.engine_registry import EngineRegistry, get_default_engine_registry
 from src.models.database_transfer_objects.provider_to_s3_import_status import ProviderToS3ImportStatusDTO
 from src.utils.logging_utils import setup_logging
 
@@ -26,8 +27,8 @@ setup_logging(logger)
 
 
 class ProviderToS3ImportStatusDAO:
-    def __init__(self, connection_string: str) -> None:
-        self._engine: AsyncEngine = create_async_engine(connection_string)
+    def __init__(self, connection_string: str, engine_registry: EngineRegistry | None = None) -> None:
+        self._engine: AsyncEngine = (engine_registry or get_default_engine_registry()).get_engine(connection_string)
         self._table: Table = provider_to_s3_import_status_table
 
     @retry(
@@ -0,0 +1,125 @@
+import logging
+
+from tenacity import retry, wait_fixed, stop_after_attempt, retry_if_exception_type
+from sqlalchemy.exc import SQLAlchemyError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncConnection
+from sqlalchemy import (
+    Table,
+    Insert,
+    Select,
+    select,
+    func,
+    CursorResult,
+)
+from sqlalchemy.dialects.postgresql import insert
+
+from database_management.cardano.cardano_tables import s3_processed_objects_table
+from src.dao.engine_registry import EngineRegistry, get_default_engine_registry
+from src.models.database_transfer_objects.s3_processed_object_dto import S3ProcessedObjectDTO
+from src.utils.iter_utils import batched
+from src.utils.logging_utils import setup_logging
+
+logger = logging.getLogger(__name__)
+setup_logging(logger)
+
+# keys looked up per query, a bounded IN list probed against the key primary key
+DEFAULT_LOOKUP_BATCH_SIZE: int = 1000
+
+
+class S3ProcessedObjectDAO:
+    """
+    Responsible for the ledger of S3 objects already loaded into the database
+    - insert_processed_objects() is called on the connection loading the objects, so an object is recorded if and only
+      if its rows are committed
+    - read_processed_keys() tells which of the listed keys are already loaded
+    - read_max_processed_key() returns the watermark of a prefix, the greatest key loaded under it
+    """
+    def __init__(self, connection_string: str, engine_registry: EngineRegistry | None = None) -> None:
+        self._engine: AsyncEngine = (engine_registry or get_default_engine_registry()).get_engine(connection_string)
+        self._table: Table = s3_processed_objects_table
+
+    @retry(
+        retry=retry_if_exception_type(OperationalError),
+        wait=wait_fixed(0.01),  # ~10ms before attempts
+        stop=stop_after_attempt(5),  # equivalent to 5 retries
+        reraise=True
+    )
+    async def insert_processed_objects(
+            self, processed_objects: list[S3ProcessedObjectDTO], conn: AsyncConnection
+    ) -> None:
+        if not processed_objects:
+            return
+        insert_clause: Insert = insert(self._table).values(
+            [processed_object.model_dump() for processed_object in processed_objects]
+        ).on_conflict_do_nothing()
+        try:
+            await conn.execute(insert_clause)
+        except OperationalError:
+            logger.warning("Failed to insert processed objects due to OperationalError.Retrying..")
+            raise
+        except SQLAlchemyError:
+            logger.exception("Failed to insert processed objects due to unexpected error. Exiting..")
+            raise
+
+    async def read_processed_keys(self, keys: list[str]) -> set[str]:
+        """
+        returns the keys, among the given ones, that are in the ledger; looked up in batches against the key primary key
+        """
+        processed_keys: set[str] = set()
+        for key_batch in batched(dict.fromkeys(keys), DEFAULT_LOOKUP_BATCH_SIZE):
+            processed_keys.update(await self._read_processed_key_batch(key_batch))
+        return processed_keys
+
+    @retry(
+        retry=retry_if_exception_type(OperationalError),
+        wait=wait_fixed(0.01),  # ~10ms before attempts
+        stop=stop_after_attempt(5),  # equivalent to 5 retries
+        reraise=True
+    )
+    async def _read_processed_key_batch(self, keys: list[str]) -> list[str]:
+        query_processed_keys: Select = select(self._table.c.key).where(self._table.c.key.in_(keys))
+        try:
+            async with self._engine.begin() as conn:
+                cursor_result: CursorResult = await conn.execute(query_processed_keys)
+            return list(cursor_result.scalars().all())
+        except OperationalError:
+            logger.warning("Failed to fetch processed keys due to OperationalError.Retrying..")
+            raise
+        except SQLAlchemyError:
+            logger.exception("Failed to fetch processed keys due to unexpected error. Exiting..")
+            raise
+
+    @retry(
+        retry=retry_if_exception_type(OperationalError),
+        wait=wait_fixed(0.01),  # ~10ms before attempts
+        stop=stop_after_attempt(5),  # equivalent to 5 retries
+        reraise=True
+    )
+    async def read_max_processed_key(self, key_prefix: str) -> str | None:
+        """
+        returns the greatest key of the ledger under key_prefix, None when nothing under it is loaded yet
+        - keys compare bytewise (COLLATE "C"), the order S3 lists them in, so the result can be passed as StartAfter
+        - the prefix is matched as a key range, so the max is read off the end of ix_s3_processed_objects_key_c
+          instead of scanning every key of the prefix
+        """
+        key_c = self._table.c.key.collate("C")
+        query_max_key: Select = select(func.max(key_c)).where(key_c >= key_prefix, key_c < _prefix_upper_bound(key_prefix))
+        try:
+            async with self._engine.begin() as conn:
+                cursor_result: CursorResult = await conn.execute(query_max_key)
+            return cursor_result.scalar()
+        except OperationalError:
+            logger.warning("Failed to fetch the max processed key due to OperationalError.Retrying..")
+            raise
+        except SQLAlchemyError:
+            logger.exception("Failed to fetch the max processed key due to unexpected error. Exiting..")
+            raise
+
+
+def _prefix_upper_bound(key_prefix: str) -> str:
+    """
+    the smallest string greater than every key starting with key_prefix, e.g. "cardano/blocks/raw/" -> "cardano/blocks/raw0"
+    """
+    if not key_prefix:
+        raise ValueError("key_prefix must not be empty")
+    return key_prefix[:-1] + chr(ord(key_prefix[-1]) + 1)
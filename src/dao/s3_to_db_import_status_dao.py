@@ -5,7 +5,7 @@ from asyncio import new_event_loop, AbstractEventLoop
 from dotenv import load_dotenv
 from tenacity import retry, wait_fixed, stop_after_attempt, retry_if_exception_type
 from sqlalchemy.exc import SQLAlchemyError, OperationalError
-from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncConnection
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncConnection
 from sqlalchemy import (
     Table,
     Insert,
@@ -19,6 +19,7 @@ from sqlalchemy.dialects.postgresql import insert
 from datetime import datetime
 import logging
 from database_management.cardano.cardano_tables import s3_to_db_import_status_table
+from src.dao.engine_registry import EngineRegistry, get_default_engine_registry
 from src.models.database_transfer_objects.s3_to_db_import_status_dto import S3ToDBImportStatusDTO
 from src.utils.logging_utils import setup_logging
 
@@ -27,8 +28,8 @@ setup_logging(logger)
 
 
 class S3ToDbImportStatusDAO:
-    def __init__(self, connection_string: str) -> None:
-        self._engine: AsyncEngine = create_async_engine(connection_string)
+    def __init__(self, connection_string: str, engine_registry: EngineRegistry | None = None) -> None:
+        self._engine: AsyncEngine = (engine_registry or get_default_engine_registry()).get_engine(connection_string)
         self._table: Table = s3_to_db_import_status_table
 
     @retry(
@@ -90,7 +91,7 @@ if __name__ == "__main__":
     )
 
     async def run_insert_import_status() -> None:
-        engine: AsyncEngine = create_async_engine(connection_string)
+        engine: AsyncEngine = get_default_engine_registry().get_engine(connection_string)
         async with engine.begin() as conn:
             await dao.insert_latest_import_status(db_import_status_dto, conn)
     asyncio.run(run_insert_import_status())
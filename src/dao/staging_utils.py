@@ -0,0 +1,84 @@
+"""
+Helpers shared by the DAOs to bulk load rows into their temporary staging tables with the binary COPY protocol
+
+The DAOs used to parse each transformed CSV with pandas, reorder it and write it back to CSV for a text COPY.
+Here the rows are converted once into Python values typed after the SQLAlchemy column types of the table
+(src.utils.typed_records), and asyncpg's copy_records_to_table streams them to Postgres in the binary format,
+so the server does not parse any text either.
+"""
+import csv
+import io
+from typing import Any
+
+from pydantic import BaseModel
+from sqlalchemy import Table
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from src.utils.typed_records import to_copy_records
+
+
+class StagingMergeResult(BaseModel):
+    """
+    rows of one file copied into a staging table, and how many of them were new to the target table
+    """
+    table: str
+    staged: int
+    inserted: int
+
+    @property
+    def skipped(self) -> int:
+        # rows already in the table, dropped by ON CONFLICT DO NOTHING
+        return self.staged - self.inserted
+
+
+def csv_to_copy_records(data_buffer: io.BytesIO, table: Table) -> list[tuple[Any, ...]]:
+    """
+    parses a transformed CSV file, with a header row, once into binary COPY records
+    the columns may be in any order, they are matched to the table by header name
+    """
+    data_buffer.seek(0)
+    text_stream: io.TextIOWrapper = io.TextIOWrapper(data_buffer, encoding="utf-8-sig", newline="")
+    try:
+        reader = csv.reader(text_stream)
+        try:
+            # remove non-printable characters / trim spaces from header names
+            header: list[str] = ["".join(ch for ch in name if ch >= " ").strip() for name in next(reader)]
+        except StopIteration:
+            return []
+        positions: dict[str, int] = {name: position for position, name in enumerate(header)}
+        missing: set[str] = {column.name for column in table.columns} - set(positions)
+        if missing:
+            raise ValueError(f"CSV is missing required column(s): {', '.join(sorted(missing))}")
+        order: list[int] = [positions[column.name] for column in table.columns]
+        return to_copy_records(([row[position] for position in order] for row in reader if row), table)
+    finally:
+        # hand the buffer back to the caller open, the wrapper would close it when collected
+        text_stream.detach()
+
+
+def parse_copy_status(status: str) -> int:
+    """
+    number of rows from the command tag asyncpg returns for a COPY, e.g. 'COPY 1000'
+    """
+    return int(status.rsplit(" ", 1)[-1])
+
+
+async def copy_records_to_temp_table(
+    async_connection: AsyncConnection, temp_table_name: str, table: Table, records: list[tuple[Any, ...]]
+) -> int:
+    """
+    streams records, in the table's column order, into temp_table_name with the binary COPY protocol
+    returns the number of rows copied
+    """
+    if not records:
+        return 0
+    # this 'raw_adapt' is not the real asyncpg.Connection:
+    raw_adapt = await async_connection.get_raw_connection()
+    # ***WARNING***: private attribute; can break in future SQLAlchemy versions
+    actual_asyncpg_conn = raw_adapt._connection
+    status: str = await actual_asyncpg_conn.copy_records_to_table(
+        temp_table_name,
+        records=records,
+        columns=[column.name for column in table.columns],
+    )
+    return parse_copy_status(status)
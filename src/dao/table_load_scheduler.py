@@ -0,0 +1,48 @@
+import asyncio
+from contextlib import AsyncExitStack
+from typing import Awaitable, Callable
+
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+# one step of a load: stages and merges one table using the connection of its chain
+TableLoad = Callable[[AsyncConnection], Awaitable[None]]
+
+
+class TableLoadScheduler:
+    """
+    Responsible for loading several tables of one batch concurrently, with the import status as the batch's commit point
+    - every chain of loads runs on its own pooled connection, in its own transaction, concurrently with the others
+    - the loads of a chain run in order, so a parent table is merged before the children whose foreign keys point to it
+    - nothing is committed until every chain has loaded: an error in any chain cancels the others and rolls all of them back
+    - the status write runs last, on its own connection, and is committed only after every chain has committed,
+    so a checkpoint never points past data that is not in the database
+
+    The batch is not atomic across chains. Once every chain has loaded, their transactions are committed one after
+    another, not through a shared two phase commit. Should one of these commits fail, the chains committed before it
+    stay committed, and readers see their tables ahead of the others until the batch is loaded again. The status is
+    rolled back in that case, so the next run loads the batch again and the ON CONFLICT DO NOTHING merges absorb the
+    rows already committed. Each chain on its own, and the status, are atomic.
+    """
+    def __init__(self, engine: AsyncEngine) -> None:
+        self._engine: AsyncEngine = engine
+
+    async def run(self, chains: list[list[TableLoad]], status_write: TableLoad) -> None:
+        async with AsyncExitStack() as stack:
+            # entered first so it is committed last, the exit stack unwinds in reverse order
+            status_connection: AsyncConnection = await stack.enter_async_context(self._engine.begin())
+            chain_connections: list[AsyncConnection] = [
+                await stack.enter_async_context(self._engine.begin()) for _ in chains
+            ]
+            try:
+                async with asyncio.TaskGroup() as task_group:
+                    for connection, chain in zip(chain_connections, chains):
+                        task_group.create_task(self._run_chain(connection, chain))
+            except ExceptionGroup as group:
+                # surface the failing chain's own error, as a sequential load would have raised it
+                raise group.exceptions[0]
+            await status_write(status_connection)
+
+    @staticmethod
+    async def _run_chain(connection: AsyncConnection, chain: list[TableLoad]) -> None:
+        for load in chain:
+            await load(connection)
@@ -1,17 +1,20 @@
 import io
 from typing import Any
-import json
 import os
 from asyncio import AbstractEventLoop, new_event_loop
 from datetime import datetime
 import boto3
 from dotenv import load_dotenv
 
+from src.dao.engine_registry import get_default_engine_registry
 from src.extractors.get_block_transactions import CardanoBlockTransactionsExtractor
+from src.extractors.blockfrost_session_provider import BlockfrostSessionProvider
 from src.models.blockfrost_models.cardano_block_transactions import CardanoBlockTransactions
 from src.dao.provider_to_s3_import_status_dao import ProviderToS3ImportStatusDAO
 from src.dao.s3_to_db_import_status_dao import S3ToDbImportStatusDAO
 from src.file_explorer.s3_file_explorer import S3Explorer
+from src.file_explorer.key_layout import height_range_key
+from src.utils import json_codec
 from src.models.database_transfer_objects.provider_to_s3_import_status import ProviderToS3ImportStatusDTO
 
 
@@ -69,24 +72,23 @@ class CardanoBlockTransactionsToETLPipeline:
         print(f"start_block_height = {start_block_height}")
         end_block_height: int = blocks_latest_block_height
         print(f"end block height = {end_block_height}")
-        # list to collect all block transactions data into a list of dict
-        block_tx_info_list: list[dict[str, Any]] = []
-
         # chunk all of these into the while loop and limit each json batch file to 2000 blocks
         batch_limit: int = 2000
         curr: int = start_block_height
         while curr <= end_block_height:
             end_batch: int = min(curr+batch_limit-1, end_block_height)
+            # list to collect the block transactions data of this batch into a list of dict
+            block_tx_info_list: list[dict[str, Any]] = []
             # fetch and collect up to batch limit blocks
             for height in range(curr, end_batch+1):
                 block_tx_info: CardanoBlockTransactions = await self._extractor.get_block_transactions(str(height))
                 block_tx_info_list.append(block_tx_info.model_dump())
 
             # convert the entire list to a JSON string and encode it to bytesIO
-            combined_json_bytes = json.dumps(block_tx_info_list).encode('utf-8')
+            combined_json_bytes = json_codec.dumps(block_tx_info_list)
             bytes_io = io.BytesIO(combined_json_bytes)
 
-            self._s3_explorer.upload_buffer(bytes_io, source_path=f"cardano/block_tx/raw/{end_batch}/cardano_blocks_tx_raw{end_batch}.json")
+            self._s3_explorer.upload_buffer(bytes_io, source_path=height_range_key("block_tx", "raw", curr, end_batch, extension="json"))
 
             updated_s3_import_status: ProviderToS3ImportStatusDTO = ProviderToS3ImportStatusDTO(
                 table=self._table,
@@ -120,7 +122,8 @@ def run():
     s3_to_db_import_status_dao: S3ToDbImportStatusDAO = S3ToDbImportStatusDAO(
         os.getenv("ASYNC_PG_CONNECTION_STRING", "")
     )
-    extractor: CardanoBlockTransactionsExtractor = CardanoBlockTransactionsExtractor()
+    session_provider: BlockfrostSessionProvider = BlockfrostSessionProvider()
+    extractor: CardanoBlockTransactionsExtractor = CardanoBlockTransactionsExtractor(session_provider=session_provider)
     cardano_block_tx_to_s3_etl_pipeline: CardanoBlockTransactionsToETLPipeline = CardanoBlockTransactionsToETLPipeline(
         provider_to_s3_import_status_dao=provider_to_s3_import_status_dao,
         s3_to_db_import_status_dao=s3_to_db_import_status_dao,
@@ -129,7 +132,13 @@ def run():
         extractor=extractor
     )
     event_loop: AbstractEventLoop = new_event_loop()
-    event_loop.run_until_complete(cardano_block_tx_to_s3_etl_pipeline.run())
+    try:
+        event_loop.run_until_complete(cardano_block_tx_to_s3_etl_pipeline.run())
+    finally:
+        event_loop.run_until_complete(session_provider.close())
+        s3_explorer.close()
+        get_default_engine_registry().log_pool_status()
+        event_loop.run_until_complete(get_default_engine_registry().dispose())
 
 
 if __name__ == "__main__":
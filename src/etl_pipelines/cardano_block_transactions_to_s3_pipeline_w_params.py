@@ -1,6 +1,3 @@
-import io
-from typing import Any
-import json
 import os
 from asyncio import AbstractEventLoop, new_event_loop
 from datetime import datetime
@@ -8,11 +5,15 @@ import boto3
 from dotenv import load_dotenv
 import click
 
+from src.dao.engine_registry import get_default_engine_registry
 from src.extractors.get_block_transactions import CardanoBlockTransactionsExtractor
+from src.extractors.blockfrost_session_provider import BlockfrostSessionProvider
 from src.models.blockfrost_models.cardano_block_transactions import CardanoBlockTransactions
 from src.dao.provider_to_s3_import_status_dao import ProviderToS3ImportStatusDAO
 from src.dao.s3_to_db_import_status_dao import S3ToDbImportStatusDAO
 from src.file_explorer.s3_file_explorer import S3Explorer
+from src.file_explorer.compression import CODEC_CHOICES, compressed_extension, parse_codec
+from src.file_explorer.key_layout import height_range_key
 from src.models.database_transfer_objects.provider_to_s3_import_status import ProviderToS3ImportStatusDTO
 
 
@@ -21,8 +22,7 @@ class CardanoBlockTransactionsToETLPipeline:
     Responsible for:
     - checking if last block height from block_transactions in database < latest block in provider_to_s3_import_status_table with cardano_block_transactions column vs cardano_block_column
     - extracting raw cardano block transactions from Blockfrost in batches of 2000
-    - convert list of extracted block transactions data (dict type) to json -> bytes
-    - upload extracted data to S3 in json format
+    - stream each batch of extracted block transactions data (dict type) to S3 in json lines format as it arrives
     - update provider_to_s3 import_status table with latest block_number for columns with cardano_block_transactions
     """
     def __init__(
@@ -31,13 +31,15 @@ class CardanoBlockTransactionsToETLPipeline:
         s3_to_db_import_status_dao: S3ToDbImportStatusDAO,
         table: str,
         s3_explorer: S3Explorer,
-        extractor: CardanoBlockTransactionsExtractor
+        extractor: CardanoBlockTransactionsExtractor,
+        codec: str | None = None,
     ) -> None:
         self._provider_to_s3_import_status_dao: ProviderToS3ImportStatusDAO = provider_to_s3_import_status_dao
         self._s3_to_db_import_status_dao: S3ToDbImportStatusDAO = s3_to_db_import_status_dao
         self._table: str = table
         self._s3_explorer: S3Explorer = s3_explorer
         self._extractor: CardanoBlockTransactionsExtractor = extractor
+        self._codec: str | None = codec
 
     async def run(self, start_block_height: int, end_block_height: int) -> None:
         """
@@ -70,24 +72,19 @@ class CardanoBlockTransactionsToETLPipeline:
         print(f"start_block_height = {start_block_height}")
         end_block_height: int = end_block_height
         print(f"end block height = {end_block_height}")
-        # list to collect all block transactions data into a list of dict
-        block_tx_info_list: list[dict[str, Any]] = []
 
         # chunk all of these into the while loop and limit each json batch file to 2000 blocks
         batch_limit: int = 2000
         curr: int = start_block_height
         while curr <= end_block_height:
             end_batch: int = min(curr+batch_limit-1, end_block_height)
-            # fetch and collect up to batch limit blocks
-            for height in range(curr, end_batch+1):
-                block_tx_info: CardanoBlockTransactions = await self._extractor.get_block_transactions(str(height))
-                block_tx_info_list.append(block_tx_info.model_dump())
-
-            # convert the entire list to a JSON string and encode it to bytesIO
-            combined_json_bytes = json.dumps(block_tx_info_list).encode('utf-8')
-            bytes_io = io.BytesIO(combined_json_bytes)
-
-            self._s3_explorer.upload_buffer(bytes_io, source_path=f"cardano/block_tx/raw/{end_batch}/cardano_blocks_tx_raw{end_batch}.json")
+            # fetch up to batch limit blocks, each written to the batch file as it arrives
+            with self._s3_explorer.open_json_lines_writer(
+                height_range_key("block_tx", "raw", curr, end_batch, extension=compressed_extension("jsonl", self._codec))
+            ) as writer:
+                for height in range(curr, end_batch+1):
+                    block_tx_info: CardanoBlockTransactions = await self._extractor.get_block_transactions(str(height))
+                    writer.write(block_tx_info.model_dump())
 
             updated_s3_import_status: ProviderToS3ImportStatusDTO = ProviderToS3ImportStatusDTO(
                 table=self._table,
@@ -103,7 +100,14 @@ class CardanoBlockTransactionsToETLPipeline:
 @click.command()
 @click.option("--start-block-height", type=int, required=True, help="First block height")
 @click.option("--end-block-height", type=int, required=True, help="Last block height")
-def run(start_block_height: int, end_block_height: int) -> None:
+@click.option(
+    "--codec",
+    type=click.Choice(CODEC_CHOICES),
+    default="none",
+    show_default=True,
+    help="Compress the raw json lines files written to S3, gzip or zstd (needs the zstandard package).",
+)
+def run(start_block_height: int, end_block_height: int, codec: str) -> None:
     """
     Responsible for running the S3ETLPipeline
     """
@@ -123,16 +127,24 @@ def run(start_block_height: int, end_block_height: int) -> None:
     s3_to_db_import_status_dao: S3ToDbImportStatusDAO = S3ToDbImportStatusDAO(
         os.getenv("ASYNC_PG_CONNECTION_STRING", "")
     )
-    extractor: CardanoBlockTransactionsExtractor = CardanoBlockTransactionsExtractor()
+    session_provider: BlockfrostSessionProvider = BlockfrostSessionProvider()
+    extractor: CardanoBlockTransactionsExtractor = CardanoBlockTransactionsExtractor(session_provider=session_provider)
     cardano_block_tx_to_s3_etl_pipeline: CardanoBlockTransactionsToETLPipeline = CardanoBlockTransactionsToETLPipeline(
         provider_to_s3_import_status_dao=provider_to_s3_import_status_dao,
         s3_to_db_import_status_dao=s3_to_db_import_status_dao,
         table="cardano_block_transactions",
         s3_explorer=s3_explorer,
-        extractor=extractor
+        extractor=extractor,
+        codec=parse_codec(codec),
     )
     event_loop: AbstractEventLoop = new_event_loop()
-    event_loop.run_until_complete(cardano_block_tx_to_s3_etl_pipeline.run(start_block_height=start_block_height, end_block_height=end_block_height))
+    try:
+        event_loop.run_until_complete(cardano_block_tx_to_s3_etl_pipeline.run(start_block_height=start_block_height, end_block_height=end_block_height))
+    finally:
+        event_loop.run_until_complete(session_provider.close())
+        s3_explorer.close()
+        get_default_engine_registry().log_pool_status()
+        event_loop.run_until_complete(get_default_engine_registry().dispose())
 
 
 if __name__ == "__main__":
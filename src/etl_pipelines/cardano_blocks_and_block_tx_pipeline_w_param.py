@@ -4,17 +4,24 @@ import boto3
 import click
 from dotenv import load_dotenv
 
+from src.dao.engine_registry import get_default_engine_registry
 from src.dao.provider_to_s3_import_status_dao import ProviderToS3ImportStatusDAO
 from src.dao.s3_to_db_import_status_dao import S3ToDbImportStatusDAO
 from src.file_explorer.s3_file_explorer import S3Explorer
+from src.file_explorer.compression import CODEC_CHOICES, parse_codec
+from src.file_explorer.transformed_files import TRANSFORMED_FORMATS, parse_transformed_format
+from src.file_explorer.key_layout import height_range_prefix
 from src.extractors.get_block import CardanoBlockExtractor
+from src.extractors.get_block_range import CardanoBlockRangeExtractor
 from src.extractors.get_block_from_s3 import CardanoBlockS3Extractor
 from src.extractors.get_block_transactions import CardanoBlockTransactionsExtractor
+from src.extractors.blockfrost_session_provider import BlockfrostSessionProvider
 from src.extractors.get_block_transactions_from_s3 import CardanoBlockTransactionsS3Extractor
 from src.transformer.transform_cardano_block_dto_to_df import TransformCardanoBlockDTOToDF
 from src.transformer.transform_cardano_block_tx_dto_to_df import TransformCardanoBlockTxDTOToDf
 from src.dao.cardano_block_dao import CardanoBlockDAO
 from src.dao.cardano_block_transactions_dao import CardanoBlockTransactionsDAO
+from src.etl_pipelines.windowed_stage_pipeline import DEFAULT_WINDOWS_AHEAD, WindowStage, WindowedStagePipeline
 
 from cardano_blocks_to_s3_pipeline_w_param import CardanoBlocksToETLPipeline
 from s3_to_db_cardano_blocks_pipeline import S3ToDBCardanoBlocksETLPipeline
@@ -27,38 +34,67 @@ class CardanoBlocksAndBlockTxETLPipeline:
     Responsible for ingesting large blocks data and block transactions)tx hash for each block) data
     from blockfrost to s3 and then to local database/postgres
     the start block height and end block height will have to be specified for this pipeline to run using click
+
+    The blocks and block_tx fetches need only the height range and run side by side, sharing the Blockfrost rate
+    limiter; each S3 to DB load takes a window once its fetch is done with it, and overlaps the next window's fetch.
+    The S3 to DB loads list only the height range of their window, checked against the processed object ledger
     """
     def __init__(
         self,
         blocks_provider_to_s3_pipeline: CardanoBlocksToETLPipeline,
         blocks_s3_to_db_pipeline: S3ToDBCardanoBlocksETLPipeline,
         block_tx_provider_to_s3_pipeline: CardanoBlockTransactionsToETLPipeline,
-        block_tx_s3_to_db_pipeline: S3ToDBCardanoBlockTransactionsETLPipeline
+        block_tx_s3_to_db_pipeline: S3ToDBCardanoBlockTransactionsETLPipeline,
+        windows_ahead: int = DEFAULT_WINDOWS_AHEAD,
     ) -> None:
         self._blocks_provider_to_s3_pipeline = blocks_provider_to_s3_pipeline
         self._blocks_s3_to_db_pipeline = blocks_s3_to_db_pipeline
         self._block_tx_provider_to_s3_pipeline = block_tx_provider_to_s3_pipeline
         self._block_tx_s3_to_db_pipeline = block_tx_s3_to_db_pipeline
+        self._windowed_pipeline: WindowedStagePipeline = WindowedStagePipeline(
+            stages=[
+                WindowStage("blocks_to_s3", self._blocks_provider_to_s3_pipeline.run),
+                WindowStage("blocks_s3_to_db", self._blocks_s3_to_db_pipeline.run, depends_on=["blocks_to_s3"]),
+                # needs only the height range, so it is fetched alongside the blocks
+                WindowStage("block_tx_to_s3", self._block_tx_provider_to_s3_pipeline.run),
+                WindowStage("block_tx_s3_to_db", self._block_tx_s3_to_db_pipeline.run, depends_on=["block_tx_to_s3"]),
+            ],
+            window_size=2000,
+            windows_ahead=windows_ahead,
+        )
 
     async def run(self, start_block_height: int, end_block_height: int) -> None:
-        # curr = start_block_height
-        end_block_height = end_block_height
-        batch: int = 2000
-        while start_block_height <= end_block_height:
-            # curr_start_block: int = max(start_block_height, curr_start_block)
-            curr_end_block: int = min(start_block_height+batch-1, end_block_height)
-            await self._blocks_provider_to_s3_pipeline.run(start_block_height=start_block_height, end_block_height=curr_end_block)
-            await self._blocks_s3_to_db_pipeline.run()
-            await self._block_tx_provider_to_s3_pipeline.run(start_block_height=start_block_height, end_block_height=curr_end_block)
-            await self._block_tx_s3_to_db_pipeline.run()
-            start_block_height = curr_end_block+1
+        await self._windowed_pipeline.run(start_block_height=start_block_height, end_block_height=end_block_height)
 
 
 @click.command()
 @click.option("--start-block-height", type=int, required=True, help="First block.")
 @click.option("--end-block-height", type=int, required=True, help="Last block.")
-def run(start_block_height: int, end_block_height: int):
+@click.option(
+    "--codec",
+    type=click.Choice(CODEC_CHOICES),
+    default="none",
+    show_default=True,
+    help="Compress the raw and transformed files written to S3, gzip or zstd (needs the zstandard package).",
+)
+@click.option(
+    "--transformed-format",
+    type=click.Choice(TRANSFORMED_FORMATS),
+    default="csv",
+    show_default=True,
+    help="Write the transformed files as csv, or as typed Parquet (needs the pyarrow package).",
+)
+@click.option(
+    "--windows-ahead",
+    type=click.IntRange(min=1),
+    default=DEFAULT_WINDOWS_AHEAD,
+    show_default=True,
+    help="Maximum number of 2000 block windows a stage may finish ahead of the next stage.",
+)
+def run(start_block_height: int, end_block_height: int, codec: str, transformed_format: str, windows_ahead: int):
     load_dotenv()
+    selected_codec: str | None = parse_codec(codec)
+    selected_transformed_format: str = parse_transformed_format(transformed_format)
     provider_to_s3_import_status_dao: ProviderToS3ImportStatusDAO = ProviderToS3ImportStatusDAO(
         os.getenv("ASYNC_PG_CONNECTION_STRING", "")
     )
@@ -75,11 +111,15 @@ def run(start_block_height: int, end_block_height: int):
         bucket_name=os.getenv("AWS_S3_BUCKET", ""),
         client=client
     )
-    block_extractor: CardanoBlockExtractor = CardanoBlockExtractor()
+    session_provider: BlockfrostSessionProvider = BlockfrostSessionProvider()
+    block_extractor: CardanoBlockExtractor = CardanoBlockExtractor(session_provider=session_provider)
+    block_range_extractor: CardanoBlockRangeExtractor = CardanoBlockRangeExtractor(
+        block_extractor=block_extractor, session_provider=session_provider
+    )
     blocks_s3_extractor: CardanoBlockS3Extractor = CardanoBlockS3Extractor(
         s3_explorer=s3_explorer
     )
-    block_tx_extractor: CardanoBlockTransactionsExtractor = CardanoBlockTransactionsExtractor()
+    block_tx_extractor: CardanoBlockTransactionsExtractor = CardanoBlockTransactionsExtractor(session_provider=session_provider)
     block_tx_s3_extractor: CardanoBlockTransactionsS3Extractor = CardanoBlockTransactionsS3Extractor(
         s3_explorer=s3_explorer
     )
@@ -96,18 +136,22 @@ def run(start_block_height: int, end_block_height: int):
         table="cardano_blocks",
         s3_explorer=s3_explorer,
         extractor=block_extractor,
+        range_extractor=block_range_extractor,
+        codec=selected_codec,
     )
     s3_to_db_cardano_blocks_etl_pipeline: S3ToDBCardanoBlocksETLPipeline = (
         S3ToDBCardanoBlocksETLPipeline(
             s3_to_db_import_status_dao=s3_to_db_import_status_dao,
             provider_to_s3_import_status_dao=provider_to_s3_import_status_dao,
             table="cardano_blocks",
-            s3_raw_blocks_path="cardano/blocks/raw",
+            s3_raw_blocks_path=height_range_prefix("blocks", "raw"),
             extractor=blocks_s3_extractor,
             transformer=blocks_transformer,
-            s3_transformed_blocks_path="cardano/blocks/transformed",
+            s3_transformed_blocks_path=height_range_prefix("blocks", "transformed"),
             cardano_block_dao=cardano_block_dao,
             s3_explorer=s3_explorer,
+            codec=selected_codec,
+            transformed_format=selected_transformed_format,
         )
     )
     cardano_block_transactions_to_etl_pipeline: CardanoBlockTransactionsToETLPipeline = CardanoBlockTransactionsToETLPipeline(
@@ -115,27 +159,37 @@ def run(start_block_height: int, end_block_height: int):
         s3_to_db_import_status_dao=s3_to_db_import_status_dao,
         table="cardano_block_transactions",
         s3_explorer=s3_explorer,
-        extractor=block_tx_extractor
+        extractor=block_tx_extractor,
+        codec=selected_codec,
     )
     s3_to_db_cardano_block_tx_etl_pipeline: S3ToDBCardanoBlockTransactionsETLPipeline = S3ToDBCardanoBlockTransactionsETLPipeline(
         s3_to_db_import_status_dao=s3_to_db_import_status_dao,
         provider_to_s3_import_status_dao=provider_to_s3_import_status_dao,
         table="cardano_block_transactions",
-        s3_raw_block_tx_path="cardano/block_tx/raw",
+        s3_raw_block_tx_path=height_range_prefix("block_tx", "raw"),
         extractor=block_tx_s3_extractor,
         transformer=block_tx_transformer,
-        s3_transformed_block_tx_path="cardano/block_tx/transformed",
+        s3_transformed_block_tx_path=height_range_prefix("block_tx", "transformed"),
         cardano_block_transactions_dao=cardano_block_tx_dao,
         s3_explorer=s3_explorer,
+        codec=selected_codec,
+        transformed_format=selected_transformed_format,
     )
     batch_etl_pipeline: CardanoBlocksAndBlockTxETLPipeline = CardanoBlocksAndBlockTxETLPipeline(
         blocks_provider_to_s3_pipeline=cardano_blocks_to_etl_pipeline,
         blocks_s3_to_db_pipeline=s3_to_db_cardano_blocks_etl_pipeline,
         block_tx_provider_to_s3_pipeline=cardano_block_transactions_to_etl_pipeline,
         block_tx_s3_to_db_pipeline=s3_to_db_cardano_block_tx_etl_pipeline,
+        windows_ahead=windows_ahead,
     )
     event_loop: AbstractEventLoop = new_event_loop()
-    event_loop.run_until_complete(batch_etl_pipeline.run(start_block_height=start_block_height, end_block_height=end_block_height))
+    try:
+        event_loop.run_until_complete(batch_etl_pipeline.run(start_block_height=start_block_height, end_block_height=end_block_height))
+    finally:
+        event_loop.run_until_complete(session_provider.close())
+        s3_explorer.close()
+        get_default_engine_registry().log_pool_status()
+        event_loop.run_until_complete(get_default_engine_registry().dispose())
 
 
 if __name__ == "__main__":
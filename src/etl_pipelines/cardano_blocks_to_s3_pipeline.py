@@ -1,6 +1,5 @@
 import io
 from typing import Any
-import json
 import os
 from asyncio import AbstractEventLoop, new_event_loop
 from datetime import datetime
@@ -8,10 +7,14 @@ from datetime import datetime
 import boto3
 from dotenv import load_dotenv
 
+from src.dao.engine_registry import get_default_engine_registry
 from src.extractors.get_block import CardanoBlockExtractor
+from src.extractors.blockfrost_session_provider import BlockfrostSessionProvider
 from src.models.blockfrost_models.raw_cardano_blocks import RawBlockfrostCardanoBlockInfo
 from src.dao.provider_to_s3_import_status_dao import ProviderToS3ImportStatusDAO
 from src.file_explorer.s3_file_explorer import S3Explorer
+from src.file_explorer.key_layout import height_range_key
+from src.utils import json_codec
 from src.models.database_transfer_objects.provider_to_s3_import_status import ProviderToS3ImportStatusDTO
 
 
@@ -60,10 +63,10 @@ class CardanoBlocksToETLPipeline:
             block_info_list.append(block_info.model_dump())
             curr_block_height += 1
 
-        combined_json_bytes = json.dumps(block_info_list).encode('utf-8')
+        combined_json_bytes = json_codec.dumps(block_info_list)
         # create a bytesIO buffer from JSON bytes
         bytes_io = io.BytesIO(combined_json_bytes)
-        self._s3_explorer.upload_buffer(bytes_io, source_path=f"cardano/blocks/raw/{end_block_height}/cardano_blocks_raw/{end_block_height}.json")
+        self._s3_explorer.upload_buffer(bytes_io, source_path=height_range_key("blocks", "raw", start_block_height, end_block_height, extension="json"))
         print(f"uploaded file to s3")
         updated_s3_import_status: ProviderToS3ImportStatusDTO = ProviderToS3ImportStatusDTO(
             table=self._table,
@@ -92,7 +95,8 @@ def run():
     provider_to_s3_import_status_dao: ProviderToS3ImportStatusDAO = ProviderToS3ImportStatusDAO(
         os.getenv("ASYNC_PG_CONNECTION_STRING", "")
     )
-    extractor: CardanoBlockExtractor = CardanoBlockExtractor()
+    session_provider: BlockfrostSessionProvider = BlockfrostSessionProvider()
+    extractor: CardanoBlockExtractor = CardanoBlockExtractor(session_provider=session_provider)
     cardano_blocks_to_s3_etl_pipeline: CardanoBlocksToETLPipeline = CardanoBlocksToETLPipeline(
         provider_to_s3_import_status_dao=provider_to_s3_import_status_dao,
         table="cardano_blocks",
@@ -100,7 +104,13 @@ def run():
         extractor=extractor
     )
     event_loop: AbstractEventLoop = new_event_loop()
-    event_loop.run_until_complete(cardano_blocks_to_s3_etl_pipeline.run())
+    try:
+        event_loop.run_until_complete(cardano_blocks_to_s3_etl_pipeline.run())
+    finally:
+        event_loop.run_until_complete(session_provider.close())
+        s3_explorer.close()
+        get_default_engine_registry().log_pool_status()
+        event_loop.run_until_complete(get_default_engine_registry().dispose())
 
 
 if __name__ == "__main__":
@@ -1,6 +1,3 @@
-import io
-from typing import Any
-import json
 import os
 from asyncio import AbstractEventLoop, new_event_loop
 from datetime import datetime
@@ -8,11 +5,17 @@ import boto3
 from dotenv import load_dotenv
 import click
 
+from src.dao.engine_registry import get_default_engine_registry
 from src.extractors.get_block import CardanoBlockExtractor
+from src.extractors.get_block_range import CardanoBlockRangeExtractor
+from src.extractors.blockfrost_session_provider import BlockfrostSessionProvider
 from src.models.blockfrost_models.raw_cardano_blocks import RawBlockfrostCardanoBlockInfo
 from src.dao.provider_to_s3_import_status_dao import ProviderToS3ImportStatusDAO
 from src.file_explorer.s3_file_explorer import S3Explorer
+from src.file_explorer.compression import CODEC_CHOICES, compressed_extension, parse_codec
+from src.file_explorer.key_layout import MAX_HEIGHT_RANGE_WIDTH, height_range_key
 from src.models.database_transfer_objects.provider_to_s3_import_status import ProviderToS3ImportStatusDTO
+from src.utils.concurrency_utils import gather_with_concurrency
 
 
 class CardanoBlocksToETLPipeline:
@@ -20,8 +23,9 @@ class CardanoBlocksToETLPipeline:
     Responsible for:
     - checking if last block height in database < the latest block in blockfrost (to_do next)
     - extracting raw cardano blocks data from Blockfrost in batches of 1000
-    - convert list of extracted block data(dict type) to json -> bytes
-    - upload extracted data to S3 in json format
+      with up to max_concurrency block requests in flight at once (1 = one block at a time),
+      or in pages of 100 blocks through range_extractor when one is given
+    - stream the extracted block data(dict type) to S3 in json lines format, one block per line
     - update provider_to_s3_import_status table with the latest block number for "cardano_blocks" on 'table' column
     """
 
@@ -30,12 +34,18 @@ class CardanoBlocksToETLPipeline:
         provider_to_s3_import_status_dao: ProviderToS3ImportStatusDAO,
         table: str,
         s3_explorer: S3Explorer,
-        extractor: CardanoBlockExtractor
+        extractor: CardanoBlockExtractor,
+        max_concurrency: int = 1,
+        range_extractor: CardanoBlockRangeExtractor | None = None,
+        codec: str | None = None,
     ) -> None:
         self._provider_to_s3_import_status_dao: ProviderToS3ImportStatusDAO = provider_to_s3_import_status_dao
         self._table: str = table
         self._s3_explorer: S3Explorer = s3_explorer
         self._extractor: CardanoBlockExtractor = extractor
+        self._max_concurrency: int = max_concurrency
+        self._range_extractor: CardanoBlockRangeExtractor | None = range_extractor
+        self._codec: str | None = codec
 
     async def run(self, start_block_height: int, end_block_height: int) -> None:
         latest_block_height: int | None = (
@@ -49,21 +59,30 @@ class CardanoBlocksToETLPipeline:
         start_block_height: int = start_block_height
         print(f"start block height to be ingested: {start_block_height}")
         end_block_height: int = end_block_height
-        curr_block_height: int = start_block_height
 
-        # list to collect all block data into a list of dict
-        block_info_list: list[dict[str, Any]] = []
         # TODO: introduce a cut off for the block numbers to stop extracting beyond it
         # TODO: implement a try catch to catch blocks that could not be extracted anymore
-        while curr_block_height <= end_block_height:
-            block_info: RawBlockfrostCardanoBlockInfo = await self._extractor.get_block(str(curr_block_height))
-            block_info_list.append(block_info.model_dump())
-            curr_block_height += 1
-
-        combined_json_bytes = json.dumps(block_info_list).encode('utf-8')
-        # create a bytesIO buffer from JSON bytes
-        bytes_io = io.BytesIO(combined_json_bytes)
-        self._s3_explorer.upload_buffer(bytes_io, source_path=f"cardano/blocks/raw/{end_block_height}/cardano_blocks_raw/{end_block_height}.json")
+        block_infos: list[RawBlockfrostCardanoBlockInfo]
+        if self._range_extractor is not None:
+            block_infos = await self._range_extractor.get_block_range(start_block_height, end_block_height)
+        else:
+            # fan out the block requests, gather_with_concurrency returns them in height order
+            block_infos = await gather_with_concurrency(
+                self._max_concurrency,
+                (
+                    self._extractor.get_block(str(block_height))
+                    for block_height in range(start_block_height, end_block_height+1)
+                ),
+            )
+        # one file per MAX_HEIGHT_RANGE_WIDTH blocks at most, so listing by height range finds every file
+        for file_start in range(start_block_height, end_block_height+1, MAX_HEIGHT_RANGE_WIDTH):
+            file_end: int = min(file_start+MAX_HEIGHT_RANGE_WIDTH-1, end_block_height)
+            with self._s3_explorer.open_json_lines_writer(
+                height_range_key("blocks", "raw", file_start, file_end, extension=compressed_extension("jsonl", self._codec))
+            ) as writer:
+                writer.write_many(
+                    block_info.model_dump() for block_info in block_infos if file_start <= block_info.height <= file_end
+                )
         print(f"uploaded file to s3")
         updated_s3_import_status: ProviderToS3ImportStatusDTO = ProviderToS3ImportStatusDTO(
             table=self._table,
@@ -78,7 +97,27 @@ class CardanoBlocksToETLPipeline:
 @click.command()
 @click.option("--start-block-height", type=int, required=True, help="First block.")
 @click.option("--end-block-height", type=int, required=True, help="Last block.")
-def run(start_block_height: int, end_block_height: int) -> None:
+@click.option(
+    "--max-concurrency",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Maximum number of Blockfrost block requests in flight at once.",
+)
+@click.option(
+    "--use-block-range/--no-use-block-range",
+    default=True,
+    show_default=True,
+    help="Fetch blocks in pages of 100 via /blocks/{height}/next instead of one request per block.",
+)
+@click.option(
+    "--codec",
+    type=click.Choice(CODEC_CHOICES),
+    default="none",
+    show_default=True,
+    help="Compress the raw json lines files written to S3, gzip or zstd (needs the zstandard package).",
+)
+def run(start_block_height: int, end_block_height: int, max_concurrency: int, use_block_range: bool, codec: str) -> None:
     """
     Responsible for running the S3ETLPipeline
     """
@@ -95,15 +134,32 @@ def run(start_block_height: int, end_block_height: int) -> None:
     provider_to_s3_import_status_dao: ProviderToS3ImportStatusDAO = ProviderToS3ImportStatusDAO(
         os.getenv("ASYNC_PG_CONNECTION_STRING", "")
     )
-    extractor: CardanoBlockExtractor = CardanoBlockExtractor()
+    session_provider: BlockfrostSessionProvider = BlockfrostSessionProvider()
+    extractor: CardanoBlockExtractor = CardanoBlockExtractor(session_provider=session_provider)
+    range_extractor: CardanoBlockRangeExtractor | None = (
+        CardanoBlockRangeExtractor(
+            block_extractor=extractor, session_provider=session_provider, max_concurrency=max_concurrency
+        )
+        if use_block_range
+        else None
+    )
     cardano_blocks_to_s3_etl_pipeline: CardanoBlocksToETLPipeline = CardanoBlocksToETLPipeline(
         provider_to_s3_import_status_dao=provider_to_s3_import_status_dao,
         table="cardano_blocks",
         s3_explorer=s3_explorer,
-        extractor=extractor
+        extractor=extractor,
+        max_concurrency=max_concurrency,
+        range_extractor=range_extractor,
+        codec=parse_codec(codec),
     )
     event_loop: AbstractEventLoop = new_event_loop()
-    event_loop.run_until_complete(cardano_blocks_to_s3_etl_pipeline.run(start_block_height=start_block_height, end_block_height=end_block_height))
+    try:
+        event_loop.run_until_complete(cardano_blocks_to_s3_etl_pipeline.run(start_block_height=start_block_height, end_block_height=end_block_height))
+    finally:
+        event_loop.run_until_complete(session_provider.close())
+        s3_explorer.close()
+        get_default_engine_registry().log_pool_status()
+        event_loop.run_until_complete(get_default_engine_registry().dispose())
 
 
 if __name__ == "__main__":
@@ -4,12 +4,17 @@ from asyncio import AbstractEventLoop, new_event_loop
 import click
 import boto3
 
+from src.dao.engine_registry import get_default_engine_registry
 from src.dao.provider_to_s3_import_status_dao import ProviderToS3ImportStatusDAO
 from src.dao.s3_to_db_import_status_dao import S3ToDbImportStatusDAO
 from src.file_explorer.s3_file_explorer import S3Explorer
+from src.file_explorer.compression import CODEC_CHOICES, parse_codec
+from src.file_explorer.transformed_files import TRANSFORMED_FORMATS, parse_transformed_format
+from src.file_explorer.key_layout import height_range_prefix
 from src.extractors.get_transactions import CardanoTransactionsExtractor
 from src.extractors.get_transactions_from_s3 import CardanoTransactionsS3Extractor
 from src.extractors.get_tx_utxo import CardanoTxUtxoExtractor
+from src.extractors.blockfrost_session_provider import BlockfrostSessionProvider
 from src.extractors.get_tx_utxo_from_s3 import CardanoTxUtxoS3Extractor
 from src.transformer.transform_cardano_tx_dto_to_df import TransformCardanoTransactionsDTOToDf
 from src.transformer.transform_cardano_tx_utxo_dto_to_df import TransformCardanoTxUtxoDTOToDf
@@ -22,6 +27,9 @@ from src.etl_pipelines.cardano_transactions_to_s3_pipeline_w_param import Cardan
 from src.etl_pipelines.s3_to_db_cardano_transactions_pipeline import S3ToDBCardanoTransactionsETLPipeline
 from src.etl_pipelines.cardano_tx_utxo_to_s3_pipeline_w_param import CardanoTxUtxoToETLPipeline
 from src.etl_pipelines.s3_to_db_cardano_tx_utxo_pipeline import S3ToDBCardanoTxUtxoETLPipeline
+from src.etl_pipelines.direct_load import direct_load_options
+from src.etl_pipelines.tx_hash_handoff import TxHashHandoff
+from src.etl_pipelines.windowed_stage_pipeline import DEFAULT_WINDOWS_AHEAD, WindowStage, WindowedStagePipeline
 
 
 class CardanoTxFullETLPipeline:
@@ -32,6 +40,12 @@ class CardanoTxFullETLPipeline:
     - cardano tx utxo etl pipeline to extract tx utxo data from Blockfrost to S3
     - cardano tx utxo etl pipeline to extract tx utxo data from S3 to DB
     This entire pipeline is ran with parameters "start block height" and "end block height"
+
+    The four stages run concurrently over windows of 1000 blocks, each taking a window once the stage before it is
+    done with it: the Blockfrost fetches of the next window overlap the DB loads of the current one, while utxo
+    is still only fetched once the tx rows of its window are in the DB. The transactions stage hands the tx hashes
+    of each window to the utxo stage through a TxHashHandoff, sparing the utxo stage its cardano_transactions query.
+    The S3 to DB stages list only the height range of their window, checked against the processed object ledger
     """
     def __init__(
             self,
@@ -39,29 +53,74 @@ class CardanoTxFullETLPipeline:
             tx_s3_to_db_pipeline: S3ToDBCardanoTransactionsETLPipeline,
             tx_utx_to_s3_pipeline: CardanoTxUtxoToETLPipeline,
             tx_utxo_s3_to_db_pipeline: S3ToDBCardanoTxUtxoETLPipeline,
+            windows_ahead: int = DEFAULT_WINDOWS_AHEAD,
     ) -> None:
         self._tx_to_s3_pipeline = tx_to_s3_pipeline
         self._tx_s3_to_db_pipeline = tx_s3_to_db_pipeline
         self._tx_utxo_to_s3_pipeline = tx_utx_to_s3_pipeline
         self._tx_utxo_s3_to_db_pipeline = tx_utxo_s3_to_db_pipeline
+        # set batch to be 1000 - congruent to the batch limits in transactions and utxo pipelines
+        self._windowed_pipeline: WindowedStagePipeline = WindowedStagePipeline(
+            stages=[
+                WindowStage("tx_to_s3", self._tx_to_s3_pipeline.run),
+                WindowStage("tx_s3_to_db", self._tx_s3_to_db_pipeline.run, depends_on=["tx_to_s3"]),
+                # reads the tx hashes of its window from the DB
+                WindowStage("tx_utxo_to_s3", self._tx_utxo_to_s3_pipeline.run, depends_on=["tx_s3_to_db"]),
+                WindowStage("tx_utxo_s3_to_db", self._tx_utxo_s3_to_db_pipeline.run, depends_on=["tx_utxo_to_s3"]),
+            ],
+            window_size=1000,
+            windows_ahead=windows_ahead,
+        )
 
     async def run(self, start_block_height: int, end_block_height: int) -> None:
-        # set batch to be 1000 - congruent to the batch limits in transactions and utxo pipelines
-        batch: int = 1000
-        while start_block_height <= end_block_height:
-            curr_end_block: int = min(start_block_height+batch-1, end_block_height)
-            await self._tx_to_s3_pipeline.run(start_block_height=start_block_height, end_block_height=curr_end_block)
-            await self._tx_s3_to_db_pipeline.run()
-            await self._tx_utxo_to_s3_pipeline.run(start_block_height=start_block_height, end_block_height=curr_end_block)
-            await self._tx_utxo_s3_to_db_pipeline.run()
-            start_block_height = curr_end_block+1
+        await self._windowed_pipeline.run(start_block_height=start_block_height, end_block_height=end_block_height)
 
 
 @click.command()
 @click.option("--start-block", type=int, required=True, help="First block.")
 @click.option("--end-block", type=int, required=True, help="Last block.")
-def run(start_block: int, end_block: int) -> None:
+@click.option(
+    "--max-concurrency",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Maximum number of blocks whose transaction utxos are fetched at once.",
+)
+@direct_load_options
+@click.option(
+    "--codec",
+    type=click.Choice(CODEC_CHOICES),
+    default="none",
+    show_default=True,
+    help="Compress the raw and transformed files written to S3, gzip or zstd (needs the zstandard package).",
+)
+@click.option(
+    "--transformed-format",
+    type=click.Choice(TRANSFORMED_FORMATS),
+    default="csv",
+    show_default=True,
+    help="Write the transformed files as csv, or as typed Parquet (needs the pyarrow package).",
+)
+@click.option(
+    "--windows-ahead",
+    type=click.IntRange(min=1),
+    default=DEFAULT_WINDOWS_AHEAD,
+    show_default=True,
+    help="Maximum number of 1000 block windows a stage may finish ahead of the next stage.",
+)
+def run(
+    start_block: int,
+    end_block: int,
+    max_concurrency: int,
+    direct_load: bool,
+    upload_transformed: bool,
+    codec: str,
+    transformed_format: str,
+    windows_ahead: int,
+) -> None:
     load_dotenv()
+    selected_codec: str | None = parse_codec(codec)
+    selected_transformed_format: str = parse_transformed_format(transformed_format)
     client = boto3.client(
         "s3",
         endpoint_url=os.getenv("AWS_S3_ENDPOINT", ""),
@@ -77,7 +136,8 @@ def run(start_block: int, end_block: int) -> None:
     s3_to_db_import_status_dao: S3ToDbImportStatusDAO = S3ToDbImportStatusDAO(
         connection_string=os.getenv("ASYNC_PG_CONNECTION_STRING", "")
     )
-    tx_extractor: CardanoTransactionsExtractor = CardanoTransactionsExtractor()
+    session_provider: BlockfrostSessionProvider = BlockfrostSessionProvider()
+    tx_extractor: CardanoTransactionsExtractor = CardanoTransactionsExtractor(session_provider=session_provider)
     tx_s3_extractor: CardanoTransactionsS3Extractor = CardanoTransactionsS3Extractor(
         s3_explorer=s3_explorer
     )
@@ -85,7 +145,7 @@ def run(start_block: int, end_block: int) -> None:
     cardano_tx_dao: CardanoTransactionsDAO = CardanoTransactionsDAO(
         connection_string=os.getenv("ASYNC_PG_CONNECTION_STRING", "")
     )
-    tx_utxo_extractor: CardanoTxUtxoExtractor = CardanoTxUtxoExtractor()
+    tx_utxo_extractor: CardanoTxUtxoExtractor = CardanoTxUtxoExtractor(session_provider=session_provider)
     tx_utxo_s3_extractor: CardanoTxUtxoS3Extractor = CardanoTxUtxoS3Extractor(
         s3_explorer=s3_explorer
     )
@@ -109,22 +169,29 @@ def run(start_block: int, end_block: int) -> None:
         connection_string=os.getenv("ASYNC_PG_CONNECTION_STRING", ""),
         table=cardano_tx_utxo_input_amount_table
     )
+    tx_hash_handoff: TxHashHandoff = TxHashHandoff()
     tx_to_s3_etl_pipeline: CardanoTransactionsTOETLPipeline = CardanoTransactionsTOETLPipeline(
         provider_to_s3_import_status_dao=provider_to_s3_import_status_dao,
         s3_to_db_import_status_dao=s3_to_db_import_status_dao,
         table="cardano_transactions",
         s3_explorer=s3_explorer,
-        extractor=tx_extractor
+        extractor=tx_extractor,
+        codec=selected_codec,
+        tx_hash_handoff=tx_hash_handoff,
     )
     tx_s3_to_db_etl_pipeline: S3ToDBCardanoTransactionsETLPipeline = S3ToDBCardanoTransactionsETLPipeline(
         s3_to_db_import_status_dao=s3_to_db_import_status_dao,
         table="cardano_transactions",
-        s3_raw_tx_path="cardano/transactions/raw",
+        s3_raw_tx_path=height_range_prefix("transactions", "raw"),
         extractor=tx_s3_extractor,
         transformer=tx_transformer,
-        s3_transformed_tx_path="cardano/transactions/transformed",
+        s3_transformed_tx_path=height_range_prefix("transactions", "transformed"),
         s3_explorer=s3_explorer,
         cardano_transactions_dao=cardano_tx_dao,
+        direct_load=direct_load,
+        upload_transformed=upload_transformed,
+        codec=selected_codec,
+        transformed_format=selected_transformed_format,
     )
     tx_utxo_to_s3_etl_pipeline: CardanoTxUtxoToETLPipeline = CardanoTxUtxoToETLPipeline(
         provider_to_s3_import_status_dao=provider_to_s3_import_status_dao,
@@ -132,33 +199,47 @@ def run(start_block: int, end_block: int) -> None:
         table="cardano_transactions_utxo",
         s3_explorer=s3_explorer,
         extractor=tx_utxo_extractor,
+        max_concurrency=max_concurrency,
+        codec=selected_codec,
+        tx_hash_handoff=tx_hash_handoff,
     )
     tx_utxo_s3_to_db_etl_pipeline: S3ToDBCardanoTxUtxoETLPipeline = S3ToDBCardanoTxUtxoETLPipeline(
         s3_to_db_import_status_dao=s3_to_db_import_status_dao,
         table="cardano_tx_utxo",
-        s3_raw_tx_path="cardano/transaction_utxo/raw",
+        s3_raw_tx_path=height_range_prefix("transaction_utxo", "raw"),
         extractor=tx_utxo_s3_extractor,
         transformer=tx_utxo_transformer,
         s3_explorer=s3_explorer,
-        s3_transformed_tx_utxo_path="cardano/transaction_utxo/transformed/utxo/",
-        s3_transformed_tx_utxo_input_path="cardano/transaction_utxo/transformed/utxo_input/",
-        s3_transformed_tx_utxo_input_amt_path="cardano/transaction_utxo/transformed/utxo_input_amount/",
-        s3_transformed_tx_utxo_output_path="cardano/transaction_utxo/transformed/utxo_output/",
-        s3_transformed_tx_utxo_output_amt_path="cardano/transaction_utxo/transformed/utxo_output_amount/",
+        s3_transformed_tx_utxo_path=height_range_prefix("transaction_utxo", "transformed/utxo"),
+        s3_transformed_tx_utxo_input_path=height_range_prefix("transaction_utxo", "transformed/utxo_input"),
+        s3_transformed_tx_utxo_input_amt_path=height_range_prefix("transaction_utxo", "transformed/utxo_input_amount"),
+        s3_transformed_tx_utxo_output_path=height_range_prefix("transaction_utxo", "transformed/utxo_output"),
+        s3_transformed_tx_utxo_output_amt_path=height_range_prefix("transaction_utxo", "transformed/utxo_output_amount"),
         cardano_tx_utxo_dao=cardano_tx_utxo_dao,
         cardano_tx_utxo_output_dao=cardano_tx_utxo_output_dao,
         cardano_tx_utxo_output_amt_dao=cardano_tx_utxo_output_amt_dao,
         cardano_tx_utxo_input_dao=cardano_tx_utxo_input_dao,
         cardano_tx_utxo_input_amt_dao=cardano_tx_utxo_input_amt_dao,
+        direct_load=direct_load,
+        upload_transformed=upload_transformed,
+        codec=selected_codec,
+        transformed_format=selected_transformed_format,
     )
     tx_and_utxo_pipeline: CardanoTxFullETLPipeline = CardanoTxFullETLPipeline(
         tx_to_s3_pipeline=tx_to_s3_etl_pipeline,
         tx_s3_to_db_pipeline=tx_s3_to_db_etl_pipeline,
         tx_utx_to_s3_pipeline=tx_utxo_to_s3_etl_pipeline,
-        tx_utxo_s3_to_db_pipeline=tx_utxo_s3_to_db_etl_pipeline
+        tx_utxo_s3_to_db_pipeline=tx_utxo_s3_to_db_etl_pipeline,
+        windows_ahead=windows_ahead,
     )
     event_loop: AbstractEventLoop = new_event_loop()
-    event_loop.run_until_complete(tx_and_utxo_pipeline.run(start_block_height=start_block, end_block_height=end_block))
+    try:
+        event_loop.run_until_complete(tx_and_utxo_pipeline.run(start_block_height=start_block, end_block_height=end_block))
+    finally:
+        event_loop.run_until_complete(session_provider.close())
+        s3_explorer.close()
+        get_default_engine_registry().log_pool_status()
+        event_loop.run_until_complete(get_default_engine_registry().dispose())
 
 
 if __name__ == "__main__":
@@ -1,5 +1,4 @@
 import io
-import json
 import os
 from asyncio import AbstractEventLoop, new_event_loop
 from datetime import datetime
@@ -7,13 +6,17 @@ from datetime import datetime
 import boto3
 from dotenv import load_dotenv
 from sqlalchemy import select, Select
-from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine
 
+from src.dao.engine_registry import EngineRegistry, get_default_engine_registry
 from src.extractors.get_transactions import CardanoTransactionsExtractor
+from src.extractors.blockfrost_session_provider import BlockfrostSessionProvider
 from src.models.blockfrost_models.raw_cardano_transactions import CardanoTransactions
 from src.dao.provider_to_s3_import_status_dao import ProviderToS3ImportStatusDAO
 from src.dao.s3_to_db_import_status_dao import S3ToDbImportStatusDAO
 from src.file_explorer.s3_file_explorer import S3Explorer
+from src.file_explorer.key_layout import height_range_key
+from src.utils import json_codec
 from src.models.database_transfer_objects.provider_to_s3_import_status import ProviderToS3ImportStatusDTO
 from database_management.cardano.cardano_tables import cardano_block_transactions_table
 
@@ -34,14 +37,15 @@ class CardanoTransactionsTOETLPipeline:
             s3_to_db_import_status_dao: S3ToDbImportStatusDAO,
             table: str,
             s3_explorer: S3Explorer,
-            extractor: CardanoTransactionsExtractor
+            extractor: CardanoTransactionsExtractor,
+            engine_registry: EngineRegistry | None = None,
     ) -> None:
         self._provider_to_s3_import_status_dao: ProviderToS3ImportStatusDAO = provider_to_s3_import_status_dao
         self._s3_to_db_import_status_dao: S3ToDbImportStatusDAO = s3_to_db_import_status_dao
         self._table: str = table
         self._s3_explorer: S3Explorer = s3_explorer
         self._extractor: CardanoTransactionsExtractor = extractor
-        self._engine: AsyncEngine = create_async_engine(
+        self._engine: AsyncEngine = (engine_registry or get_default_engine_registry()).get_engine(
             os.getenv("ASYNC_PG_CONNECTION_STRING", "")
         )
 
@@ -109,10 +113,10 @@ class CardanoTransactionsTOETLPipeline:
             curr = end_batch + 1
 
         # convert entire list to a JSON string and encode it to a bytesIO
-        combined_json_bytes = json.dumps(tx_info_list).encode('utf-8')
+        combined_json_bytes = json_codec.dumps(tx_info_list)
         bytes_io = io.BytesIO(combined_json_bytes)
 
-        self._s3_explorer.upload_buffer(bytes_io, source_path=f"cardano/transactions/raw/{end_batch}/cardano_transactions_{end_batch}.json")
+        self._s3_explorer.upload_buffer(bytes_io, source_path=height_range_key("transactions", "raw", start_block_height, end_batch, extension="json"))
 
         updated_s3_import_status: ProviderToS3ImportStatusDTO = ProviderToS3ImportStatusDTO(
             table=self._table,
@@ -142,7 +146,8 @@ def run():
     s3_to_db_import_status_dao: S3ToDbImportStatusDAO = S3ToDbImportStatusDAO(
         connection_string=os.getenv("ASYNC_PG_CONNECTION_STRING", "")
     )
-    extractor: CardanoTransactionsExtractor = CardanoTransactionsExtractor()
+    session_provider: BlockfrostSessionProvider = BlockfrostSessionProvider()
+    extractor: CardanoTransactionsExtractor = CardanoTransactionsExtractor(session_provider=session_provider)
     cardano_tx_to_s3_etl_pipeline: CardanoTransactionsTOETLPipeline = CardanoTransactionsTOETLPipeline(
         provider_to_s3_import_status_dao=provider_to_s3_import_status_dao,
         s3_to_db_import_status_dao=s3_to_db_import_status_dao,
@@ -151,7 +156,13 @@ def run():
         extractor=extractor
     )
     event_loop: AbstractEventLoop = new_event_loop()
-    event_loop.run_until_complete(cardano_tx_to_s3_etl_pipeline.run())
+    try:
+        event_loop.run_until_complete(cardano_tx_to_s3_etl_pipeline.run())
+    finally:
+        event_loop.run_until_complete(session_provider.close())
+        s3_explorer.close()
+        get_default_engine_registry().log_pool_status()
+        event_loop.run_until_complete(get_default_engine_registry().dispose())
 
 
 if __name__ == "__main__":
@@ -1,21 +1,25 @@
-import io
-import json
 import os
 from asyncio import AbstractEventLoop, new_event_loop
 from datetime import datetime
 import boto3
 from dotenv import load_dotenv
 from sqlalchemy import select, Select
-from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine
 import click
 
+from src.dao.engine_registry import EngineRegistry, get_default_engine_registry
+from src.dao.ingested_hash_dao import IngestedHashDAO
 from src.extractors.get_transactions import CardanoTransactionsExtractor
+from src.extractors.blockfrost_session_provider import BlockfrostSessionProvider
 from src.models.blockfrost_models.raw_cardano_transactions import CardanoTransactions
 from src.dao.provider_to_s3_import_status_dao import ProviderToS3ImportStatusDAO
 from src.dao.s3_to_db_import_status_dao import S3ToDbImportStatusDAO
 from src.file_explorer.s3_file_explorer import S3Explorer
+from src.file_explorer.compression import CODEC_CHOICES, compressed_extension, parse_codec
+from src.file_explorer.key_layout import height_range_key, height_range_prefix
+from src.etl_pipelines.tx_hash_handoff import TxHashHandoff
 from src.models.database_transfer_objects.provider_to_s3_import_status import ProviderToS3ImportStatusDTO
-from database_management.cardano.cardano_tables import cardano_block_transactions_table
+from database_management.cardano.cardano_tables import cardano_block_transactions_table, cardano_transactions_table
 
 
 class CardanoTransactionsTOETLPipeline:
@@ -23,10 +27,12 @@ class CardanoTransactionsTOETLPipeline:
     Responsible for:
     - checking if last block height from transactions in database < latest block in provider_to_s3_import_table with
     cardano_transactions column vs cardano_block_transactions column
-    - extracting raw cardano transactions from Blockfrost in batches of 1000 blocks worth of transactions
-    - convert list of extracted transactions to json -> bytes
-    - upload extracted data to S3 in json format
-    - update provider_to_s3_import_status table with latest block number for columns with cardano_transactions
+    - extracting raw cardano transactions from Blockfrost in batches of 1000 blocks worth of transactions,
+      skipping the transactions already in cardano_transactions so a rerun of a range does not fetch them again
+    - stream each batch of extracted transactions to S3 in json lines format as they arrive
+    - update provider_to_s3_import_status table with the batch's last block number for cardano_transactions,
+      so a rerun of the same range resumes after the last uploaded batch
+    - publish the tx hashes of each uploaded batch to tx_hash_handoff when given, for the utxo stage of the same process
     """
     def __init__(
             self,
@@ -34,16 +40,25 @@ class CardanoTransactionsTOETLPipeline:
             s3_to_db_import_status_dao: S3ToDbImportStatusDAO,
             table: str,
             s3_explorer: S3Explorer,
-            extractor: CardanoTransactionsExtractor
+            extractor: CardanoTransactionsExtractor,
+            engine_registry: EngineRegistry | None = None,
+            codec: str | None = None,
+            tx_hash_handoff: TxHashHandoff | None = None,
+            ingested_hash_dao: IngestedHashDAO | None = None,
     ) -> None:
         self._provider_to_s3_import_status_dao: ProviderToS3ImportStatusDAO = provider_to_s3_import_status_dao
         self._s3_to_db_import_status_dao: S3ToDbImportStatusDAO = s3_to_db_import_status_dao
         self._table: str = table
         self._s3_explorer: S3Explorer = s3_explorer
         self._extractor: CardanoTransactionsExtractor = extractor
-        self._engine: AsyncEngine = create_async_engine(
+        self._codec: str | None = codec
+        self._tx_hash_handoff: TxHashHandoff | None = tx_hash_handoff
+        self._engine: AsyncEngine = (engine_registry or get_default_engine_registry()).get_engine(
             os.getenv("ASYNC_PG_CONNECTION_STRING", "")
         )
+        self._ingested_hash_dao: IngestedHashDAO = ingested_hash_dao or IngestedHashDAO(
+            os.getenv("ASYNC_PG_CONNECTION_STRING", ""), cardano_transactions_table, engine_registry
+        )
 
     async def run(self, start_block_height: int, end_block_height: int) -> None:
         """
@@ -71,55 +86,84 @@ class CardanoTransactionsTOETLPipeline:
         #     print(f"transactions in S3 up to date")
         #     return None
 
+        # resume after the last uploaded batch when a previous run of this range stopped part way
+        if tx_latest_block_height is not None and start_block_height <= tx_latest_block_height < end_block_height:
+            start_block_height = tx_latest_block_height+1
         print(f"start_block_height = {start_block_height}")
         print(f"end block height = {end_block_height}")
-        # list to collect all  transactions data into a list of dict
-        tx_info_list: list[CardanoTransactions] = []
 
         # chunk all of these into the while loop and limit each json batch file to 1000 blocks
         batch_limit: int = 1000
+        skipped_calls: int = 0
         while start_block_height <= end_block_height:
             end_batch: int = min(start_block_height+batch_limit-1, end_block_height)
             block_ids: list[str] = [str(i) for i in range(start_block_height, end_batch+1)]
-            # query database for the transaction hash from cardano_block_transactions table
+            # query database for the transaction hashes of each block from cardano_block_transactions table
             stmt: Select = (
-                select(cardano_block_transactions_table.c.tx_hash)
+                select(cardano_block_transactions_table.c.block, cardano_block_transactions_table.c.tx_hash)
                 .where(cardano_block_transactions_table.c.block.in_(block_ids))
             )
             async with self._engine.begin() as conn:
                 result = await conn.execute(stmt)
-                # results.scalar() yields each tx_hash column value
-                rows: list[list[str]] = result.scalars().all()
-
-            # iterate and call extractor for each hash at a time
-            for hashes_in_block in rows:
-                for tx_hash in hashes_in_block:
-                    tx_info: CardanoTransactions = await self._extractor.get_transaction(tx_hash=tx_hash)
-                    tx_info_list.append(tx_info.model_dump())
+                # block holds the height as a string, sort the blocks by their height
+                tx_hashes_by_block: dict[int, list[str]] = {
+                    int(block): tx_hashes
+                    for block, tx_hashes in sorted(result.all(), key=lambda row: int(row[0]))
+                    if tx_hashes
+                }
 
-            start_block_height = end_batch+1
+            # anti-join against cardano_transactions, the transactions already ingested are not fetched again
+            tx_hashes: list[str] = [tx_hash for hashes_in_block in tx_hashes_by_block.values() for tx_hash in hashes_in_block]
+            ingested_hashes: set[str] = await self._ingested_hash_dao.read_ingested_hashes(tx_hashes)
+            batch_skipped_calls: int = sum(1 for tx_hash in tx_hashes if tx_hash in ingested_hashes)
+            skipped_calls += batch_skipped_calls
+            print(f"Skipped {batch_skipped_calls} of {len(tx_hashes)} transactions already in cardano_transactions")
 
-        # convert entire list to a JSON string and encode it to a bytesIO
-        combined_json_bytes = json.dumps(tx_info_list).encode('utf-8')
-        bytes_io = io.BytesIO(combined_json_bytes)
+            new_tx_hashes: list[str] = [tx_hash for tx_hash in tx_hashes if tx_hash not in ingested_hashes]
+            if new_tx_hashes:
+                # a rerun of the range writes its new transactions to the next free part, the objects of the earlier
+                # runs are already in s3_processed_objects and are never overwritten
+                part: int = self._s3_explorer.next_height_range_part(
+                    height_range_prefix("transactions", "raw"), start_block_height, end_batch
+                )
+                # iterate and call extractor for each hash at a time, writing each transaction to the batch file as it arrives
+                with self._s3_explorer.open_json_lines_writer(
+                    height_range_key("transactions", "raw", start_block_height, end_batch, part=part, extension=compressed_extension("jsonl", self._codec))
+                ) as writer:
+                    for tx_hash in new_tx_hashes:
+                        tx_info: CardanoTransactions = await self._extractor.get_transaction(tx_hash=tx_hash)
+                        writer.write(tx_info.model_dump())
+            else:
+                print(f"No new transactions for blocks {start_block_height} to {end_batch}, nothing written")
 
-        self._s3_explorer.upload_buffer(bytes_io, source_path=f"cardano/transactions/raw/{end_batch}/cardano_transactions_{end_batch}.json")
+            updated_s3_import_status: ProviderToS3ImportStatusDTO = ProviderToS3ImportStatusDTO(
+                table=self._table,
+                block_height=end_batch,
+                created_at=datetime.utcnow()
+            )
+            await self._provider_to_s3_import_status_dao.insert_latest_import_status(
+                updated_s3_import_status
+            )
+            if self._tx_hash_handoff is not None:
+                # every hash of the batch, the skipped ones may still lack their utxo
+                self._tx_hash_handoff.publish(start_block_height, end_batch, tx_hashes_by_block)
+            print(f"Uploaded batch ending at block: {end_batch}")
 
-        updated_s3_import_status: ProviderToS3ImportStatusDTO = ProviderToS3ImportStatusDTO(
-            table=self._table,
-            block_height=end_batch,
-            created_at=datetime.utcnow()
-        )
-        await self._provider_to_s3_import_status_dao.insert_latest_import_status(
-            updated_s3_import_status
-        )
-        print(f"Uploaded batch ending at block: {end_batch}")
+            start_block_height = end_batch+1
+        print(f"Skipped {skipped_calls} Blockfrost calls for transactions already ingested")
 
 
 @click.command()
 @click.option("--tx_start-block", type=int, required=True, help="Start block height for ingestion od cardano tx")
 @click.option("--tx_end-block", type=int, required=True, help="Start block height for ingestion od cardano tx")
-def run(tx_start_block: int, tx_end_block: int):
+@click.option(
+    "--codec",
+    type=click.Choice(CODEC_CHOICES),
+    default="none",
+    show_default=True,
+    help="Compress the raw json lines files written to S3, gzip or zstd (needs the zstandard package).",
+)
+def run(tx_start_block: int, tx_end_block: int, codec: str):
     load_dotenv()
     client = boto3.client(
         "s3",
@@ -136,16 +180,24 @@ def run(tx_start_block: int, tx_end_block: int):
     s3_to_db_import_status_dao: S3ToDbImportStatusDAO = S3ToDbImportStatusDAO(
         connection_string=os.getenv("ASYNC_PG_CONNECTION_STRING", "")
     )
-    extractor: CardanoTransactionsExtractor = CardanoTransactionsExtractor()
+    session_provider: BlockfrostSessionProvider = BlockfrostSessionProvider()
+    extractor: CardanoTransactionsExtractor = CardanoTransactionsExtractor(session_provider=session_provider)
     cardano_tx_to_s3_etl_pipeline: CardanoTransactionsTOETLPipeline = CardanoTransactionsTOETLPipeline(
         provider_to_s3_import_status_dao=provider_to_s3_import_status_dao,
         s3_to_db_import_status_dao=s3_to_db_import_status_dao,
         table="cardano_transactions",
         s3_explorer=s3_explorer,
-        extractor=extractor
+        extractor=extractor,
+        codec=parse_codec(codec),
     )
     event_loop: AbstractEventLoop = new_event_loop()
-    event_loop.run_until_complete(cardano_tx_to_s3_etl_pipeline.run(start_block_height=tx_start_block, end_block_height=tx_end_block))
+    try:
+        event_loop.run_until_complete(cardano_tx_to_s3_etl_pipeline.run(start_block_height=tx_start_block, end_block_height=tx_end_block))
+    finally:
+        event_loop.run_until_complete(session_provider.close())
+        s3_explorer.close()
+        get_default_engine_registry().log_pool_status()
+        event_loop.run_until_complete(get_default_engine_registry().dispose())
 
 
 if __name__ == "__main__":
@@ -1,5 +1,4 @@
 import io
-import json
 import os
 from asyncio import AbstractEventLoop, new_event_loop
 from datetime import datetime
@@ -7,13 +6,17 @@ from datetime import datetime
 import boto3
 from dotenv import load_dotenv
 from sqlalchemy import Select, select
-from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine
 
+from src.dao.engine_registry import EngineRegistry, get_default_engine_registry
 from src.extractors.get_tx_utxo import CardanoTxUtxoExtractor
+from src.extractors.blockfrost_session_provider import BlockfrostSessionProvider
 from src.models.blockfrost_models.cardano_transaction_utxo import TransactionUTxO
 from src.dao.provider_to_s3_import_status_dao import ProviderToS3ImportStatusDAO
 from src.dao.s3_to_db_import_status_dao import S3ToDbImportStatusDAO
 from src.file_explorer.s3_file_explorer import S3Explorer
+from src.file_explorer.key_layout import height_range_key
+from src.utils import json_codec
 from src.models.database_transfer_objects.provider_to_s3_import_status import ProviderToS3ImportStatusDTO
 from database_management.cardano.cardano_tables import cardano_transactions_table
 
@@ -34,14 +37,15 @@ class CardanoTxUtxoToETLPipeline:
             s3_to_db_import_status_dao: S3ToDbImportStatusDAO,
             table: str,
             s3_explorer: S3Explorer,
-            extractor: CardanoTxUtxoExtractor
+            extractor: CardanoTxUtxoExtractor,
+            engine_registry: EngineRegistry | None = None,
     ) -> None:
         self._provider_to_s3_import_status_dao: ProviderToS3ImportStatusDAO = provider_to_s3_import_status_dao
         self._s3_to_db_import_status_dao: S3ToDbImportStatusDAO = s3_to_db_import_status_dao
         self._table: str = table
         self._s3_explorer: S3Explorer = s3_explorer
         self._extractor: CardanoTxUtxoExtractor = extractor
-        self._engine: AsyncEngine = create_async_engine(
+        self._engine: AsyncEngine = (engine_registry or get_default_engine_registry()).get_engine(
             os.getenv("ASYNC_PG_CONNECTION_STRING", "")
         )
 
@@ -80,14 +84,13 @@ class CardanoTxUtxoToETLPipeline:
         # end_block_height: int = 11302209
         # end_block_height: int = 11329236
         print(f"end block height = {end_block_height}")
-        # list to collect all transactions utxo data into a list of dict
-        tx_utxo_info_list: list[TransactionUTxO] = []
-
         # chunk all of these into the while loop and limit each json batch file to 200 blocks
         batch_limit: int = 2000
         curr: int = start_block_height
         while curr <= end_block_height:
             end_batch: int = min(curr+batch_limit-1, end_block_height)
+            # list to collect the transactions utxo data of this batch into a list of dict
+            tx_utxo_info_list: list[TransactionUTxO] = []
 
             block_ids: list[int] = [i for i in range(curr, end_batch+1)]
 
@@ -110,13 +113,12 @@ class CardanoTxUtxoToETLPipeline:
                     continue
                 tx_utxo_info_list.append(tx_utxo_info.model_dump())
 
-            curr = end_batch+1
-
-        # convert entire list to a json string and encode it to a bytesIO
-        combined_json_bytes = json.dumps(tx_utxo_info_list).encode('utf-8')
-        bytes_io = io.BytesIO(combined_json_bytes)
+            # one file per batch, as the key layout bounds the block range of a file
+            combined_json_bytes = json_codec.dumps(tx_utxo_info_list)
+            bytes_io = io.BytesIO(combined_json_bytes)
+            self._s3_explorer.upload_buffer(bytes_io, source_path=height_range_key("transaction_utxo", "raw", curr, end_batch, extension="json"))
 
-        self._s3_explorer.upload_buffer(bytes_io, source_path=f"cardano/transaction_utxo/raw/{end_batch}/cardano_tx_utxo_{end_batch}.json")
+            curr = end_batch+1
 
         updated_s3_import_status: ProviderToS3ImportStatusDTO = ProviderToS3ImportStatusDTO(
             table=self._table,
@@ -146,7 +148,8 @@ def run():
     s3_to_db_import_status_dao: S3ToDbImportStatusDAO = S3ToDbImportStatusDAO(
         connection_string=os.getenv("ASYNC_PG_CONNECTION_STRING", "")
     )
-    extractor: CardanoTxUtxoExtractor = CardanoTxUtxoExtractor()
+    session_provider: BlockfrostSessionProvider = BlockfrostSessionProvider()
+    extractor: CardanoTxUtxoExtractor = CardanoTxUtxoExtractor(session_provider=session_provider)
     cardano_tx_utxo_to_s3_etl_pipeline: CardanoTxUtxoToETLPipeline = CardanoTxUtxoToETLPipeline(
         provider_to_s3_import_status_dao=provider_to_s3_import_status_dao,
         s3_to_db_import_status_dao=s3_to_db_import_status_dao,
@@ -155,7 +158,13 @@ def run():
         extractor=extractor
     )
     event_loop: AbstractEventLoop = new_event_loop()
-    event_loop.run_until_complete(cardano_tx_utxo_to_s3_etl_pipeline.run())
+    try:
+        event_loop.run_until_complete(cardano_tx_utxo_to_s3_etl_pipeline.run())
+    finally:
+        event_loop.run_until_complete(session_provider.close())
+        s3_explorer.close()
+        get_default_engine_registry().log_pool_status()
+        event_loop.run_until_complete(get_default_engine_registry().dispose())
 
 
 if __name__ == "__main__":
@@ -1,22 +1,28 @@
-import io
-import json
 import os
-from asyncio import AbstractEventLoop, new_event_loop
+from asyncio import AbstractEventLoop, new_event_loop, gather
 from datetime import datetime
+from typing import Any
 
 import boto3
 from dotenv import load_dotenv
 from sqlalchemy import Select, select
-from sqlalchemy.ext.asyncio import  AsyncEngine, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine
 import click
 
+from src.dao.engine_registry import EngineRegistry, get_default_engine_registry
+from src.dao.ingested_hash_dao import IngestedHashDAO
 from src.extractors.get_tx_utxo import CardanoTxUtxoExtractor
+from src.extractors.blockfrost_session_provider import BlockfrostSessionProvider
 from src.models.blockfrost_models.cardano_transaction_utxo import TransactionUTxO
 from src.dao.provider_to_s3_import_status_dao import ProviderToS3ImportStatusDAO
 from src.dao.s3_to_db_import_status_dao import S3ToDbImportStatusDAO
 from src.file_explorer.s3_file_explorer import S3Explorer
+from src.file_explorer.compression import CODEC_CHOICES, compressed_extension, parse_codec
+from src.file_explorer.key_layout import height_range_key, height_range_prefix
+from src.etl_pipelines.tx_hash_handoff import TxHashHandoff
 from src.models.database_transfer_objects.provider_to_s3_import_status import ProviderToS3ImportStatusDTO
-from database_management.cardano.cardano_tables import cardano_transactions_table
+from src.utils.concurrency_utils import gather_with_concurrency
+from database_management.cardano.cardano_tables import cardano_transactions_table, cardano_tx_utxo_table
 
 
 class CardanoTxUtxoToETLPipeline:
@@ -24,10 +30,15 @@ class CardanoTxUtxoToETLPipeline:
     Responsible for:
     - checking if last transaction hash from tx_utxo in database
     != to latest tx hash in transaction column of 'table' in provider_to_s3_import_status_table
-    - extracting raw cardano transaction utxo from Blockfrost in batches of 200
-    - convert list of extracted transaction utxo data to json -> bytesIO
-    - upload extracted data to s3 in json bytesio format
-    - update provider_to_s3 import_status table with latest block_number for columns with cardano_block_transactions
+    - extracting raw cardano transaction utxo from Blockfrost in batches of 999 blocks,
+      with up to max_concurrency blocks in flight at once; the tx hashes of a block are fetched together,
+      and results are flushed every blocks_per_flush blocks so a slow hash only holds up its own window
+    - stream each batch of extracted transaction utxo data to s3 in json lines format, one window of blocks at a time
+    - update provider_to_s3 import_status table with the batch's last block_number for cardano_transactions_utxo,
+      so a rerun of the same range resumes after the last uploaded batch
+    - take the tx hashes of each batch from tx_hash_handoff when given and published by the transactions stage,
+      querying cardano_transactions for them otherwise
+    - skip the transactions already in cardano_tx_utxo, so a rerun of a range does not fetch them again
     """
     def __init__(
             self,
@@ -35,16 +46,29 @@ class CardanoTxUtxoToETLPipeline:
             s3_to_db_import_status_dao: S3ToDbImportStatusDAO,
             table: str,
             s3_explorer: S3Explorer,
-            extractor: CardanoTxUtxoExtractor
+            extractor: CardanoTxUtxoExtractor,
+            max_concurrency: int = 1,
+            blocks_per_flush: int = 100,
+            engine_registry: EngineRegistry | None = None,
+            codec: str | None = None,
+            tx_hash_handoff: TxHashHandoff | None = None,
+            ingested_hash_dao: IngestedHashDAO | None = None,
     ) -> None:
         self._provider_to_s3_import_status_dao: ProviderToS3ImportStatusDAO = provider_to_s3_import_status_dao
         self._s3_to_db_import_status_dao: S3ToDbImportStatusDAO = s3_to_db_import_status_dao
         self._table: str = table
         self._s3_explorer: S3Explorer = s3_explorer
         self._extractor: CardanoTxUtxoExtractor = extractor
-        self._engine: AsyncEngine = create_async_engine(
+        self._max_concurrency: int = max_concurrency
+        self._blocks_per_flush: int = blocks_per_flush
+        self._codec: str | None = codec
+        self._tx_hash_handoff: TxHashHandoff | None = tx_hash_handoff
+        self._engine: AsyncEngine = (engine_registry or get_default_engine_registry()).get_engine(
             os.getenv("ASYNC_PG_CONNECTION_STRING", "")
         )
+        self._ingested_hash_dao: IngestedHashDAO = ingested_hash_dao or IngestedHashDAO(
+            os.getenv("ASYNC_PG_CONNECTION_STRING", ""), cardano_tx_utxo_table, engine_registry
+        )
 
 
     async def run(self, start_block_height: int, end_block_height: int) -> None:
@@ -57,12 +81,12 @@ class CardanoTxUtxoToETLPipeline:
             start_block = provider_to_s3_import_status_table.read_latest_import_status("cardano_transactions_utxo) + 1
             end_block = provider_to_s3_import_status_table.read_latest_import_status("cardano_transactions)
         """
-        # tx_utxo_latest_block_height: int | None = (
-        #     await self._provider_to_s3_import_status_dao.read_latest_import_status(
-        #         "cardano_transactions_utxo"
-        #     )
-        # )
-        # print(f"tx_utxo_latest_block_height = {tx_utxo_latest_block_height}")
+        tx_utxo_latest_block_height: int | None = (
+            await self._provider_to_s3_import_status_dao.read_latest_import_status(
+                self._table
+            )
+        )
+        print(f"tx_utxo_latest_block_height = {tx_utxo_latest_block_height}")
         # tx_latest_block_height: int | None = (
         #     await self._provider_to_s3_import_status_dao.read_latest_import_status(
         #         "cardano_transactions"
@@ -73,65 +97,127 @@ class CardanoTxUtxoToETLPipeline:
         #     print(f"transactions utxo in S3 up to date")
         #     return None
 
-        # start_block_height: int = tx_utxo_latest_block_height+1
-        # start_block_height: int = start_block_height
+        # resume after the last uploaded batch when a previous run of this range stopped part way
+        if tx_utxo_latest_block_height is not None and start_block_height <= tx_utxo_latest_block_height < end_block_height:
+            start_block_height = tx_utxo_latest_block_height+1
         print(f"start_block_height = {start_block_height}")
         # end_block_height: int = tx_latest_block_height
         # end_block_height: int = 11302209
         print(f"end block height = {end_block_height}")
-        # list to collect all transactions utxo data into a list of dict
-        tx_utxo_info_list: list[TransactionUTxO] = []
 
-        # chunk all of these into the while loop and limit each json batch file to 200 blocks
+        # chunk all of these into the while loop and limit each json batch file to 999 blocks
         batch_limit: int = 999
         curr: int = start_block_height
+        skipped_calls: int = 0
         while curr <= end_block_height:
             end_batch: int = min(curr+batch_limit-1, end_block_height)
 
-            block_ids: list[int] = [i for i in range(curr, end_batch+1)]
+            tx_hashes_by_block: dict[int, list[str]] = await self._read_tx_hashes_by_block(curr, end_batch)
+            print(f"Blocks: {len(tx_hashes_by_block)}, transactions: {sum(len(hashes) for hashes in tx_hashes_by_block.values())}")
 
-            # query database for transaction hash from cardano transactions
-            stmt: Select = (
-                select(cardano_transactions_table.c.hash)
-                .where(cardano_transactions_table.c.block_height.in_(block_ids))
+            # anti-join against cardano_tx_utxo, the utxo already ingested are not fetched again
+            ingested_hashes: set[str] = await self._ingested_hash_dao.read_ingested_hashes(
+                [tx_hash for hashes_in_block in tx_hashes_by_block.values() for tx_hash in hashes_in_block]
             )
+            batch_skipped_calls: int = 0
+            if ingested_hashes:
+                new_tx_hashes_by_block: dict[int, list[str]] = {}
+                for block_height, hashes_in_block in tx_hashes_by_block.items():
+                    new_hashes: list[str] = [tx_hash for tx_hash in hashes_in_block if tx_hash not in ingested_hashes]
+                    batch_skipped_calls += len(hashes_in_block)-len(new_hashes)
+                    if new_hashes:
+                        new_tx_hashes_by_block[block_height] = new_hashes
+                tx_hashes_by_block = new_tx_hashes_by_block
+            skipped_calls += batch_skipped_calls
+            print(f"Skipped {batch_skipped_calls} transactions whose utxo are already in cardano_tx_utxo")
 
-            async with self._engine.begin() as conn:
-                result = await conn.execute(stmt)
-                rows: list[list[str]] = result.scalars().all()
-                print(f"Rows: {rows}")
+            # fetch whole blocks concurrently and flush the results to the batch file one window of blocks at a time
+            block_heights: list[int] = list(tx_hashes_by_block)
+            if block_heights:
+                # a rerun of the range writes its new utxo to the next free part, the objects of the earlier
+                # runs are already in s3_processed_objects and are never overwritten
+                part: int = self._s3_explorer.next_height_range_part(
+                    height_range_prefix("transaction_utxo", "raw"), curr, end_batch
+                )
+                with self._s3_explorer.open_json_lines_writer(
+                    height_range_key("transaction_utxo", "raw", curr, end_batch, part=part, extension=compressed_extension("jsonl", self._codec))
+                ) as writer:
+                    for window_start in range(0, len(block_heights), self._blocks_per_flush):
+                        window: list[int] = block_heights[window_start:window_start+self._blocks_per_flush]
+                        block_results: list[list[dict[str, Any]]] = await gather_with_concurrency(
+                            self._max_concurrency,
+                            (self._extract_block(tx_hashes_by_block[block_height]) for block_height in window),
+                        )
+                        for block_tx_utxo_infos in block_results:
+                            writer.write_many(block_tx_utxo_infos)
+                        print(f"Flushed tx utxo for blocks {window[0]} to {window[-1]}")
+            else:
+                print(f"No new tx utxo for blocks {curr} to {end_batch}, nothing written")
 
-            # fetch and collect up to batch limit blocks
-            # for hashes_in_block in rows:
-            for tx_hash in rows:
-                tx_utxo_info: TransactionUTxO = await self._extractor.get_tx_utxo(tx_hash=tx_hash)
-                if tx_utxo_info is None:
-                    continue
-                tx_utxo_info_list.append(tx_utxo_info.model_dump())
+            updated_s3_import_status: ProviderToS3ImportStatusDTO = ProviderToS3ImportStatusDTO(
+                table=self._table,
+                block_height=end_batch,
+                created_at=datetime.utcnow()
+            )
+            await self._provider_to_s3_import_status_dao.insert_latest_import_status(
+                updated_s3_import_status
+            )
+            print(f"Uploaded batch ending at block: {end_batch}")
 
             curr = end_batch+1
+        print(f"Skipped {skipped_calls} Blockfrost calls for tx utxo already ingested")
 
-        # convert entire list to a json string and encode it to a bytesIO
-        combined_json_bytes = json.dumps(tx_utxo_info_list).encode('utf-8')
-        bytes_io = io.BytesIO(combined_json_bytes)
-
-        self._s3_explorer.upload_buffer(bytes_io, source_path=f"cardano/transaction_utxo/raw/{end_batch}/cardano_tx_utxo_{end_batch}.json")
+    async def _read_tx_hashes_by_block(self, start_block_height: int, end_block_height: int) -> dict[int, list[str]]:
+        """
+        the tx hashes of each block of the range with transactions, grouped by block in block order:
+        handed over by the transactions stage when it ran the range in this process, else read from the database
+        """
+        if self._tx_hash_handoff is not None:
+            handed_over: dict[int, list[str]] | None = self._tx_hash_handoff.take(start_block_height, end_block_height)
+            if handed_over is not None:
+                return handed_over
 
-        updated_s3_import_status: ProviderToS3ImportStatusDTO = ProviderToS3ImportStatusDTO(
-            table=self._table,
-            block_height=end_batch,
-            created_at=datetime.utcnow()
+        # query database for transaction hash from cardano transactions, grouped by block in block order
+        stmt: Select = (
+            select(cardano_transactions_table.c.block_height, cardano_transactions_table.c.hash)
+            .where(cardano_transactions_table.c.block_height.between(start_block_height, end_block_height))
+            .order_by(cardano_transactions_table.c.block_height, cardano_transactions_table.c.index)
         )
-        await self._provider_to_s3_import_status_dao.insert_latest_import_status(
-            updated_s3_import_status
+        async with self._engine.begin() as conn:
+            result = await conn.execute(stmt)
+            tx_hashes_by_block: dict[int, list[str]] = {}
+            for block_height, tx_hash in result.all():
+                tx_hashes_by_block.setdefault(block_height, []).append(tx_hash)
+        return tx_hashes_by_block
+
+    async def _extract_block(self, tx_hashes: list[str]) -> list[dict[str, Any]]:
+        """
+        fetches the utxo of every transaction in one block, returned in the block's transaction order
+        """
+        tx_utxo_infos: list[TransactionUTxO | None] = await gather(
+            *(self._extractor.get_tx_utxo(tx_hash=tx_hash) for tx_hash in tx_hashes)
         )
-        print(f"Uploaded batch ending at block: {end_batch}")
+        return [tx_utxo_info.model_dump() for tx_utxo_info in tx_utxo_infos if tx_utxo_info is not None]
 
 
 @click.command()
 @click.option("--start-block-height", type=int, required=True, help="First block.")
 @click.option("--end-block-height", type=int, required=True, help="Last block.")
-def run(start_block_height: int, end_block_height: int) -> None:
+@click.option(
+    "--max-concurrency",
+    type=click.IntRange(min=1),
+    default=10,
+    show_default=True,
+    help="Maximum number of blocks whose transaction utxos are fetched at once.",
+)
+@click.option(
+    "--codec",
+    type=click.Choice(CODEC_CHOICES),
+    default="none",
+    show_default=True,
+    help="Compress the raw json lines files written to S3, gzip or zstd (needs the zstandard package).",
+)
+def run(start_block_height: int, end_block_height: int, max_concurrency: int, codec: str) -> None:
     load_dotenv()
     client = boto3.client(
         "s3",
@@ -148,16 +234,25 @@ def run(start_block_height: int, end_block_height: int) -> None:
     s3_to_db_import_status_dao: S3ToDbImportStatusDAO = S3ToDbImportStatusDAO(
         connection_string=os.getenv("ASYNC_PG_CONNECTION_STRING", "")
     )
-    extractor: CardanoTxUtxoExtractor = CardanoTxUtxoExtractor()
+    session_provider: BlockfrostSessionProvider = BlockfrostSessionProvider()
+    extractor: CardanoTxUtxoExtractor = CardanoTxUtxoExtractor(session_provider=session_provider)
     cardano_tx_utxo_to_s3_etl_pipeline: CardanoTxUtxoToETLPipeline = CardanoTxUtxoToETLPipeline(
         provider_to_s3_import_status_dao=provider_to_s3_import_status_dao,
         s3_to_db_import_status_dao=s3_to_db_import_status_dao,
         table="cardano_transactions_utxo",
         s3_explorer=s3_explorer,
-        extractor=extractor
+        extractor=extractor,
+        max_concurrency=max_concurrency,
+        codec=parse_codec(codec),
     )
     event_loop: AbstractEventLoop = new_event_loop()
-    event_loop.run_until_complete(cardano_tx_utxo_to_s3_etl_pipeline.run(start_block_height, end_block_height))
+    try:
+        event_loop.run_until_complete(cardano_tx_utxo_to_s3_etl_pipeline.run(start_block_height, end_block_height))
+    finally:
+        event_loop.run_until_complete(session_provider.close())
+        s3_explorer.close()
+        get_default_engine_registry().log_pool_status()
+        event_loop.run_until_complete(get_default_engine_registry().dispose())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,111 @@
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, TypeVar
+
+import click
+import pandas as pd
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.dao.cardano_block_dao import CardanoBlockDAO
+from src.dao.cardano_block_transactions_dao import CardanoBlockTransactionsDAO
+from src.dao.cardano_transactions_dao import CardanoTransactionsDAO
+from src.dao.s3_processed_object_dao import S3ProcessedObjectDAO
+from src.dao.s3_to_db_import_status_dao import S3ToDbImportStatusDAO
+from src.dao.staging_utils import StagingMergeResult
+from src.file_explorer.background_uploader import BackgroundCsvUploader
+from src.file_explorer.s3_file_explorer import S3Explorer
+from src.models.database_transfer_objects.s3_processed_object_dto import S3ProcessedObjectDTO
+from src.models.database_transfer_objects.s3_to_db_import_status_dto import S3ToDBImportStatusDTO
+from src.models.file_info.file_info import FileInfo
+
+# transforms the raw file at an S3 path chunk by chunk, yielding each DataFrame with the number of raw records in it
+TransformRawFile = Callable[[str], Iterator[tuple[pd.DataFrame, int]]]
+# S3 path of part N of the transformed files of a raw file, given the raw file and its modified date
+TransformedPath = Callable[[FileInfo, int, datetime], str]
+# DAOs of the single table S3 to DB pipelines
+DirectLoadDAO = CardanoBlockDAO | CardanoBlockTransactionsDAO | CardanoTransactionsDAO
+
+CommandT = TypeVar("CommandT", bound=Callable[..., None])
+
+
+def direct_load_options(command: CommandT) -> CommandT:
+    """
+    adds the --direct-load and --upload-transformed options of the S3 to DB pipelines to a click command
+    """
+    command = click.option(
+        "--upload-transformed/--no-upload-transformed",
+        default=True,
+        show_default=True,
+        help="With --direct-load, still upload the transformed csv files to S3, in the background.",
+    )(command)
+    return click.option(
+        "--direct-load/--no-direct-load",
+        default=False,
+        show_default=True,
+        help="Copy transformed frames straight to the DB instead of reading them back from S3.",
+    )(command)
+
+
+class DirectLoader:
+    """
+    Responsible for the direct load mode of the single table S3 to DB pipelines: blocks, block_tx and transactions
+    - transforms each raw file and copies the frames to the DB in the same pass, on one connection, without listing or
+      downloading the transformed files back
+    - the transformed files are uploaded in the background, or not at all with upload_transformed=False; they keep
+      their S3 paths and ids, so a later run from the transformed files merges nothing new
+    - the raw and transformed files are recorded in the processed object ledger, and the import status moved to the
+      latest raw file, in the transaction that loads them, once the transformed files are complete
+    - a failure rolls the transaction back and cancels the uploads still in flight
+    """
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        s3_explorer: S3Explorer,
+        processed_object_dao: S3ProcessedObjectDAO,
+        s3_to_db_import_status_dao: S3ToDbImportStatusDAO,
+        table: str,
+        upload_transformed: bool = True,
+    ) -> None:
+        self._engine: AsyncEngine = engine
+        self._s3_explorer: S3Explorer = s3_explorer
+        self._processed_object_dao: S3ProcessedObjectDAO = processed_object_dao
+        self._s3_to_db_import_status_dao: S3ToDbImportStatusDAO = s3_to_db_import_status_dao
+        self._table: str = table
+        self._upload_transformed: bool = upload_transformed
+
+    async def run(
+        self,
+        raw_file_infos: Iterable[FileInfo],
+        dao: DirectLoadDAO,
+        transform_raw_file: TransformRawFile,
+        transformed_path: TransformedPath,
+        default_modified_date: datetime,
+    ) -> None:
+        uploader: BackgroundCsvUploader = BackgroundCsvUploader(self._s3_explorer, enabled=self._upload_transformed)
+        latest_raw_file_modified_date: datetime = default_modified_date
+        try:
+            async with self._engine.begin() as conn:
+                await dao.create_temp_table(async_connection=conn)
+                processed_objects: list[S3ProcessedObjectDTO] = []
+                for raw_file_info in raw_file_infos:
+                    file_modified_date: datetime = max(default_modified_date, raw_file_info.modified_date)
+                    latest_raw_file_modified_date = max(latest_raw_file_modified_date, file_modified_date)
+                    raw_rows: int = 0
+                    for part, (df, chunk_rows) in enumerate(transform_raw_file(raw_file_info.file_path)):
+                        path: str = transformed_path(raw_file_info, part, file_modified_date)
+                        await uploader.submit(df, path, dao.table)
+                        merge_result: StagingMergeResult = await dao.copy_df_to_db(async_connection=conn, df=df)
+                        print(f"{raw_file_info.file_path} part {part}: staged {merge_result.staged} rows, inserted {merge_result.inserted}, skipped {merge_result.skipped} already present")
+                        if self._upload_transformed:
+                            processed_objects.append(S3ProcessedObjectDTO.create_pending_object(path, merge_result.staged))
+                        raw_rows += chunk_rows
+                    processed_objects.append(S3ProcessedObjectDTO.create_processed_object(raw_file_info, raw_rows))
+                # the transformed files are complete before the import status moves past their raw files
+                await uploader.wait()
+                await self._processed_object_dao.insert_processed_objects(processed_objects, conn)
+                import_status = S3ToDBImportStatusDTO.create_import_status(
+                    table=self._table, file_modified_date=latest_raw_file_modified_date
+                )
+                await self._s3_to_db_import_status_dao.insert_latest_import_status(import_status, conn)
+        finally:
+            # nothing is left once wait() returned; after a failure, the uploads still in flight are dropped
+            await uploader.cancel()
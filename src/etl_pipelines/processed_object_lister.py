@@ -0,0 +1,46 @@
+from typing import Generator, Iterable
+
+from src.dao.s3_processed_object_dao import S3ProcessedObjectDAO
+from src.file_explorer.s3_file_explorer import S3Explorer
+from src.models.file_info.file_info import FileInfo
+
+
+class ProcessedObjectLister:
+    """
+    Responsible for listing the objects of a prefix that are not in the processed object ledger yet
+    - without a block range, S3 starts the listing after the prefix's watermark, the greatest key already loaded under
+      it, so a run pages through the new keys only, however many objects the prefix holds
+    - given a block range, only the objects of the height range key layout overlapping it are listed, S3 starting the
+      listing near start_height, so a windowed run pages through its window instead of the whole prefix
+    - either way the listed keys are looked up in the ledger; within a range this finds an object whatever its key
+      sorts after, e.g. a backfilled range written below keys already loaded, which a run without a range does not see,
+      so a backfill is loaded by a run over its block range
+    - files loaded before the ledger existed are not in it, the first run loads them once more,
+      which the ON CONFLICT DO NOTHING merges absorb, and records them
+    """
+    def __init__(self, s3_explorer: S3Explorer, processed_object_dao: S3ProcessedObjectDAO) -> None:
+        self._s3_explorer: S3Explorer = s3_explorer
+        self._processed_object_dao: S3ProcessedObjectDAO = processed_object_dao
+
+    async def list_new_files(
+        self, s3_path_prefix: str, start_height: int | None = None, end_height: int | None = None
+    ) -> Generator[FileInfo, None, None]:
+        """
+        lists the files of s3_path_prefix not in the ledger yet, within start_height to end_height when both are given
+        """
+        if start_height is None or end_height is None:
+            watermark: str | None = await self._processed_object_dao.read_max_processed_key(s3_path_prefix)
+            return await self.filter_new_files(self._s3_explorer.list_files_after(s3_path_prefix, watermark))
+        return await self.filter_new_files(
+            self._s3_explorer.list_files_in_height_range(s3_path_prefix, start_height, end_height)
+        )
+
+    async def filter_new_files(self, file_infos: Iterable[FileInfo]) -> Generator[FileInfo, None, None]:
+        """
+        keeps the listed files whose key is not in the ledger, in listing order
+        """
+        listed: list[FileInfo] = list(file_infos)
+        processed_keys: set[str] = await self._processed_object_dao.read_processed_keys(
+            [file_info.file_path for file_info in listed]
+        )
+        return (file_info for file_info in listed if file_info.file_path not in processed_keys)
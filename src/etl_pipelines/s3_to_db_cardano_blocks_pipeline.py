@@ -1,21 +1,35 @@
-import io
-from io import BytesIO
 from datetime import datetime, timezone
 import os
 
 import boto3
+import click
 import pandas as pd
 from dotenv import load_dotenv
 from asyncio import AbstractEventLoop, new_event_loop
-from typing import Generator
+from typing import Generator, Iterator
 
+from src.dao.engine_registry import EngineRegistry, get_default_engine_registry
 from src.models.file_info.file_info import FileInfo
 from src.dao.s3_to_db_import_status_dao import S3ToDbImportStatusDAO
 from src.dao.provider_to_s3_import_status_dao import ProviderToS3ImportStatusDAO
 from src.dao.cardano_block_dao import CardanoBlockDAO
 from src.file_explorer.s3_file_explorer import S3Explorer
+from src.file_explorer.compression import CODEC_CHOICES, parse_codec
+from src.file_explorer.transformed_files import (
+    CSV,
+    TRANSFORMED_FORMATS,
+    encode_transformed_file,
+    parse_transformed_format,
+    transformed_extension,
+)
+from src.file_explorer.key_layout import derived_key, height_range_prefix
+from src.dao.staging_utils import StagingMergeResult
+from src.dao.s3_processed_object_dao import S3ProcessedObjectDAO
+from src.etl_pipelines.processed_object_lister import ProcessedObjectLister
+from src.etl_pipelines.direct_load import DirectLoader, direct_load_options
+from src.models.database_transfer_objects.s3_processed_object_dto import S3ProcessedObjectDTO
 from src.extractors.get_block_from_s3 import CardanoBlockS3Extractor
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+from sqlalchemy.ext.asyncio import AsyncEngine
 from src.models.database_transfer_objects.s3_to_db_import_status_dto import S3ToDBImportStatusDTO
 from src.models.database_transfer_objects.cardano_blocks import CardanoBlocksDTO
 from src.transformer.transform_cardano_block_dto_to_df import TransformCardanoBlockDTOToDF
@@ -35,6 +49,11 @@ class S3ToDBCardanoBlocksETLPipeline:
              use s3_explorer.download_to_buffer()
              use cardano_block_dao.copy_blocks_to_db()
         5) Update import status into S3ToDBImportStatusDTO
+    Raw and transformed files not yet in the s3_processed_objects ledger are loaded, and recorded in it in the
+    transaction that loads them, so each file is loaded once whatever its key or modified date
+    Given a block range, run() lists and loads only the files of that range, e.g. one window of a full pipeline
+    With direct_load, steps 3 and 4 are replaced by copying each transformed DataFrame straight to the DB,
+    the transformed csv being uploaded in the background (or not at all with upload_transformed=False)
     """
     def __init__(
         self,
@@ -47,6 +66,12 @@ class S3ToDBCardanoBlocksETLPipeline:
         s3_transformed_blocks_path: str,
         cardano_block_dao: CardanoBlockDAO,
         s3_explorer: S3Explorer,
+        engine_registry: EngineRegistry | None = None,
+        processed_object_dao: S3ProcessedObjectDAO | None = None,
+        direct_load: bool = False,
+        upload_transformed: bool = True,
+        codec: str | None = None,
+        transformed_format: str = CSV,
     ) -> None:
         self._s3_to_db_import_status_dao: S3ToDbImportStatusDAO = s3_to_db_import_status_dao
         self._table: str = table
@@ -56,12 +81,30 @@ class S3ToDBCardanoBlocksETLPipeline:
         self._s3_transformed_blocks_path = s3_transformed_blocks_path
         self._provider_to_s3_import_status_dao: ProviderToS3ImportStatusDAO = provider_to_s3_import_status_dao
         self._s3_explorer: S3Explorer = s3_explorer
-        self._engine: AsyncEngine = create_async_engine(
+        self._engine: AsyncEngine = (engine_registry or get_default_engine_registry()).get_engine(
             os.getenv("ASYNC_PG_CONNECTION_STRING", "")
         )
         self._cardano_block_dao: CardanoBlockDAO = cardano_block_dao
+        # ledger of the raw and transformed files already loaded, the files listed are checked against it
+        self._processed_object_dao: S3ProcessedObjectDAO = processed_object_dao or S3ProcessedObjectDAO(
+            os.getenv("ASYNC_PG_CONNECTION_STRING", ""), engine_registry
+        )
+        self._lister: ProcessedObjectLister = ProcessedObjectLister(s3_explorer, self._processed_object_dao)
+        self._direct_load: bool = direct_load
+        self._upload_transformed: bool = upload_transformed
+        # the transformed files are written in transformed_format, csv ones with codec; the raw files are read whatever
+        # their codec
+        self._transformed_extension: str = transformed_extension(transformed_format, codec)
+        self._direct_loader: DirectLoader = DirectLoader(
+            engine=self._engine,
+            s3_explorer=s3_explorer,
+            processed_object_dao=self._processed_object_dao,
+            s3_to_db_import_status_dao=s3_to_db_import_status_dao,
+            table=table,
+            upload_transformed=upload_transformed,
+        )
 
-    async def run(self) -> None:
+    async def run(self, start_block_height: int | None = None, end_block_height: int | None = None) -> None:
         """
         async version to run the pipeline
         """
@@ -75,49 +118,62 @@ class S3ToDBCardanoBlocksETLPipeline:
         default_modified_date: datetime = latest_modified_date or datetime(
             year=2020, month=1, day=1
         )
+        if self._direct_load:
+            await self._direct_loader.run(
+                raw_file_infos=await self._lister.list_new_files(
+                    self._s3_raw_blocks_path, start_block_height, end_block_height
+                ),
+                dao=self._cardano_block_dao,
+                transform_raw_file=self._transform_raw_file,
+                transformed_path=self._transformed_path,
+                default_modified_date=default_modified_date,
+            )
+            return
         # list files from cardano/blocks/raw
-        s3_raw_blocks_file_info: Generator[FileInfo, None, None] = self._s3_explorer.list_files(
-            self._s3_raw_blocks_path, default_modified_date
+        s3_raw_blocks_file_info: Generator[FileInfo, None, None] = await self._lister.list_new_files(
+            self._s3_raw_blocks_path, start_block_height, end_block_height
         )
 
+        processed_objects: list[S3ProcessedObjectDTO] = []
         for raw_file_info in s3_raw_blocks_file_info:
+            raw_rows: int = 0
             latest_raw_blocks_file_modified_date = max(
                 default_modified_date, raw_file_info.modified_date
             )
             print(latest_raw_blocks_file_modified_date)
-            # get raw blocks json files from S3 and change it to CardanoBlocksDTO
-            block_dto_list: list[CardanoBlocksDTO] = self._extractor.get_block_from_s3(s3_path=raw_file_info.file_path)
-
-            # transform the dto list to a dataframe
-            df: pd.DataFrame = self._transformer.transform(block_dto_list)
-            # convert pandas dataframe into a csv bytesIO
-            csv_buffer: BytesIO = BytesIO()
-            df.to_csv(csv_buffer, index=False)
-            csv_buffer.seek(0)
-            # upload transformed CardanoblocksDTO in csv format to s3
-            self._s3_explorer.upload_buffer(bytes_io=csv_buffer, source_path=f"cardano/blocks/transformed/{latest_raw_blocks_file_modified_date}/cardano_blocks_transformed_{latest_raw_blocks_file_modified_date}.csv")
+            # stream raw blocks json files from S3 as chunks of CardanoBlocksDTO, one transformed file per chunk
+            for part, (df, chunk_rows) in enumerate(self._transform_raw_file(raw_file_info.file_path)):
+                raw_rows += chunk_rows
+                transformed_path: str = self._transformed_path(raw_file_info, part, latest_raw_blocks_file_modified_date)
+                # upload transformed CardanoblocksDTO to s3, in the transformed format of its key
+                self._s3_explorer.upload_buffer(
+                    bytes_io=encode_transformed_file(df, self._cardano_block_dao.table, transformed_path), source_path=transformed_path
+                )
+            processed_objects.append(S3ProcessedObjectDTO.create_processed_object(raw_file_info, raw_rows))
 
         # list files from cardano/blocks/transformed
-        s3_transformed_blocks_file_info: Generator[FileInfo, None, None] = self._s3_explorer.list_files(
-            self._s3_transformed_blocks_path, default_modified_date
+        s3_transformed_blocks_file_info: Generator[FileInfo, None, None] = await self._lister.list_new_files(
+            self._s3_transformed_blocks_path, start_block_height, end_block_height
         )
 
+        latest_transformed_blocks_file_modified_date: datetime = default_modified_date
         async with self._engine.begin() as conn:
             # create temp table
             await self._cardano_block_dao.create_temp_table(async_connection=conn)
             # step 2: get all files from S3 cardano/blocks/transformed path-
-            for transformed_file_info in s3_transformed_blocks_file_info:
+            # the next files download while the current one is copied
+            async for transformed_file_info, csv_bytes in self._s3_explorer.prefetch(s3_transformed_blocks_file_info):
                 latest_transformed_blocks_file_modified_date = max(
-                    default_modified_date, transformed_file_info.modified_date
+                    latest_transformed_blocks_file_modified_date, transformed_file_info.modified_date
                 )
-                # download CardanoBlocksDTO csv files from S3 to buffer and copy to DB
-                csv_bytes: io.BytesIO = self._s3_explorer.download_to_buffer(
-                    transformed_file_info.file_path
-                )
-                await self._cardano_block_dao.copy_blocks_to_db(
+                # copy the downloaded CardanoBlocksDTO csv file to DB
+                merge_result: StagingMergeResult = await self._cardano_block_dao.copy_blocks_to_db(
                     async_connection=conn, data_buffer=csv_bytes
                 )
+                print(f"{transformed_file_info.file_path}: staged {merge_result.staged} rows, inserted {merge_result.inserted}, skipped {merge_result.skipped} already present")
+                processed_objects.append(S3ProcessedObjectDTO.create_processed_object(transformed_file_info, merge_result.staged))
 
+            await self._processed_object_dao.insert_processed_objects(processed_objects, conn)
             # update import status - s3_to_db_import_status table
             import_status = S3ToDBImportStatusDTO.create_import_status(
                 table=self._table, file_modified_date=latest_transformed_blocks_file_modified_date
@@ -126,8 +182,39 @@ class S3ToDBCardanoBlocksETLPipeline:
                 import_status, conn
             )
 
+    def _transform_raw_file(self, s3_path: str) -> Iterator[tuple[pd.DataFrame, int]]:
+        """
+        streams the raw blocks json file at s3_path as chunks of CardanoBlocksDTO, yielding each chunk's DataFrame
+        with its number of blocks
+        """
+        for block_dto_list in self._extractor.iter_blocks_from_s3(s3_path=s3_path):
+            yield self._transformer.transform(block_dto_list), len(block_dto_list)
+
+    def _transformed_path(self, raw_file_info: FileInfo, part: int, file_modified_date: datetime) -> str:
+        return (
+            derived_key(raw_file_info.file_path, self._s3_transformed_blocks_path, part, self._transformed_extension)
+            # raw files written before the height range layout keep the modified date naming
+            or f"cardano/blocks/transformed/{file_modified_date}/cardano_blocks_transformed_{file_modified_date}_part{part}.{self._transformed_extension}"
+        )
+
 
-def run():
+@click.command()
+@direct_load_options
+@click.option(
+    "--codec",
+    type=click.Choice(CODEC_CHOICES),
+    default="none",
+    show_default=True,
+    help="Compress the transformed csv files written to S3, gzip or zstd (needs the zstandard package).",
+)
+@click.option(
+    "--transformed-format",
+    type=click.Choice(TRANSFORMED_FORMATS),
+    default="csv",
+    show_default=True,
+    help="Write the transformed files as csv, or as typed Parquet (needs the pyarrow package).",
+)
+def run(direct_load: bool, upload_transformed: bool, codec: str, transformed_format: str) -> None:
     """
     Responsible for running the ETLPipeline
     """
@@ -160,17 +247,26 @@ def run():
             s3_to_db_import_status_dao=s3_to_db_import_status_dao,
             provider_to_s3_import_status_dao=provider_to_s3_import_status_dao,
             table="cardano_blocks",
-            s3_raw_blocks_path="cardano/blocks/raw",
+            s3_raw_blocks_path=height_range_prefix("blocks", "raw"),
             extractor=extractor,
             transformer=transformer,
-            s3_transformed_blocks_path="cardano/blocks/transformed",
+            s3_transformed_blocks_path=height_range_prefix("blocks", "transformed"),
             cardano_block_dao=cardano_block_dao,
             s3_explorer=s3_explorer,
+            direct_load=direct_load,
+            upload_transformed=upload_transformed,
+            codec=parse_codec(codec),
+            transformed_format=parse_transformed_format(transformed_format),
         )
     )
 
     event_loop: AbstractEventLoop = new_event_loop()
-    event_loop.run_until_complete(s3_to_db_cardano_blocks_etl_pipeline.run())
+    try:
+        event_loop.run_until_complete(s3_to_db_cardano_blocks_etl_pipeline.run())
+    finally:
+        s3_explorer.close()
+        get_default_engine_registry().log_pool_status()
+        event_loop.run_until_complete(get_default_engine_registry().dispose())
 
 
 if __name__ == "__main__":
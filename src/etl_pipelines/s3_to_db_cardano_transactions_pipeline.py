@@ -1,19 +1,33 @@
-import io
-from io import BytesIO
 from datetime import datetime
 import os
 import boto3
+import click
 import pandas as pd
 from dotenv import load_dotenv
 from asyncio import AbstractEventLoop, new_event_loop
-from typing import Generator
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+from typing import Generator, Iterator
+from sqlalchemy.ext.asyncio import AsyncEngine
 
+from src.dao.engine_registry import EngineRegistry, get_default_engine_registry
 from src.models.file_info.file_info import FileInfo
 from src.dao.s3_to_db_import_status_dao import S3ToDbImportStatusDAO
 from src.models.database_transfer_objects.cardano_transactions import CardanoTransactionsDTO
 from src.extractors.get_transactions_from_s3 import CardanoTransactionsS3Extractor
 from src.file_explorer.s3_file_explorer import S3Explorer
+from src.file_explorer.compression import CODEC_CHOICES, parse_codec
+from src.file_explorer.transformed_files import (
+    CSV,
+    TRANSFORMED_FORMATS,
+    encode_transformed_file,
+    parse_transformed_format,
+    transformed_extension,
+)
+from src.file_explorer.key_layout import derived_key, height_range_prefix
+from src.dao.staging_utils import StagingMergeResult
+from src.dao.s3_processed_object_dao import S3ProcessedObjectDAO
+from src.etl_pipelines.processed_object_lister import ProcessedObjectLister
+from src.etl_pipelines.direct_load import DirectLoader, direct_load_options
+from src.models.database_transfer_objects.s3_processed_object_dto import S3ProcessedObjectDTO
 from src.models.database_transfer_objects.s3_to_db_import_status_dto import S3ToDBImportStatusDTO
 from src.transformer.transform_cardano_tx_dto_to_df import TransformCardanoTransactionsDTOToDf
 from src.dao.cardano_transactions_dao import CardanoTransactionsDAO
@@ -27,6 +41,11 @@ class S3ToDBCardanoTransactionsETLPipeline:
         Use s3_to_db_import_status_dao.read_latest_import_status()
     2) Transform Raw Cardano Transactions data to Cardano Transactions DTO in csv format
     3)
+    Raw and transformed files not yet in the s3_processed_objects ledger are loaded, and recorded in it in the
+    transaction that loads them, so each file is loaded once whatever its key or modified date
+    Given a block range, run() lists and loads only the files of that range, e.g. one window of a full pipeline
+    With direct_load, the transformed DataFrames are copied straight to the DB instead of being read back from S3,
+    the transformed csv being uploaded in the background (or not at all with upload_transformed=False)
     """
     def __init__(
             self,
@@ -37,7 +56,13 @@ class S3ToDBCardanoTransactionsETLPipeline:
             transformer: TransformCardanoTransactionsDTOToDf,
             s3_transformed_tx_path: str,
             s3_explorer: S3Explorer,
-            cardano_transactions_dao: CardanoTransactionsDAO
+            cardano_transactions_dao: CardanoTransactionsDAO,
+            engine_registry: EngineRegistry | None = None,
+            processed_object_dao: S3ProcessedObjectDAO | None = None,
+            direct_load: bool = False,
+            upload_transformed: bool = True,
+            codec: str | None = None,
+            transformed_format: str = CSV,
     ) ->  None:
         self._s3_to_db_import_status_dao: S3ToDbImportStatusDAO = s3_to_db_import_status_dao
         self._table: str = table
@@ -46,12 +71,30 @@ class S3ToDBCardanoTransactionsETLPipeline:
         self._s3_explorer = s3_explorer
         self._transformer = transformer
         self._s3_transformed_tx_path = s3_transformed_tx_path
-        self._engine: AsyncEngine = create_async_engine(
+        self._engine: AsyncEngine = (engine_registry or get_default_engine_registry()).get_engine(
             os.getenv("ASYNC_PG_CONNECTION_STRING", "")
         )
         self._cardano_tx_dao = cardano_transactions_dao
+        # ledger of the raw and transformed files already loaded, the files listed are checked against it
+        self._processed_object_dao: S3ProcessedObjectDAO = processed_object_dao or S3ProcessedObjectDAO(
+            os.getenv("ASYNC_PG_CONNECTION_STRING", ""), engine_registry
+        )
+        self._lister: ProcessedObjectLister = ProcessedObjectLister(s3_explorer, self._processed_object_dao)
+        self._direct_load: bool = direct_load
+        self._upload_transformed: bool = upload_transformed
+        # the transformed files are written in transformed_format, csv ones with codec; the raw files are read whatever
+        # their codec
+        self._transformed_extension: str = transformed_extension(transformed_format, codec)
+        self._direct_loader: DirectLoader = DirectLoader(
+            engine=self._engine,
+            s3_explorer=s3_explorer,
+            processed_object_dao=self._processed_object_dao,
+            s3_to_db_import_status_dao=s3_to_db_import_status_dao,
+            table=table,
+            upload_transformed=upload_transformed,
+        )
 
-    async def run(self) -> None:
+    async def run(self, start_block_height: int | None = None, end_block_height: int | None = None) -> None:
         latest_modified_date: datetime | None = (
             await self._s3_to_db_import_status_dao.read_latest_import_status(
                 self._table
@@ -62,48 +105,60 @@ class S3ToDBCardanoTransactionsETLPipeline:
         default_modified_date: datetime = latest_modified_date or datetime(
             year=2020, month=1, day=1
         )
-        s3_raw_tx_file_info: Generator[FileInfo, None, None] = self._s3_explorer.list_files(
-            self._s3_raw_tx_path, default_modified_date
+        if self._direct_load:
+            await self._direct_loader.run(
+                raw_file_infos=await self._lister.list_new_files(
+                    self._s3_raw_tx_path, start_block_height, end_block_height
+                ),
+                dao=self._cardano_tx_dao,
+                transform_raw_file=self._transform_raw_file,
+                transformed_path=self._transformed_path,
+                default_modified_date=default_modified_date,
+            )
+            return
+        s3_raw_tx_file_info: Generator[FileInfo, None, None] = await self._lister.list_new_files(
+            self._s3_raw_tx_path, start_block_height, end_block_height
         )
 
+        processed_objects: list[S3ProcessedObjectDTO] = []
         for raw_file_info in s3_raw_tx_file_info:
+            raw_rows: int = 0
             latest_raw_tx_file_modified_date = max(
                 default_modified_date, raw_file_info.modified_date
             )
-            # get raw tx json file from  S3 and change it to CardanoTransactionsDTO
-            tx_dto_list: list[CardanoTransactionsDTO] = self._extractor.get_tx_from_s3(
-                s3_path=raw_file_info.file_path
-            )
-            # transform the dto list to a dataframe
-            df: pd.DataFrame = self._transformer.transform(cardano_tx_dto_list=tx_dto_list)
-            # convert pandas DataFrame into a csv bytesIO
-            csv_buffer: BytesIO = BytesIO()
-            df.to_csv(csv_buffer, index=False)
-            csv_buffer.seek(0)
-            # upload transformed CardanoTxDTO in csv format to s3
-            self._s3_explorer.upload_buffer(bytes_io=csv_buffer, source_path=f"cardano/transactions/transformed/{latest_raw_tx_file_modified_date}/cardano_tx_transformed_{latest_raw_tx_file_modified_date}.csv")
+            # stream raw tx json file from S3 as chunks of CardanoTransactionsDTO, one transformed file per chunk
+            for part, (df, chunk_rows) in enumerate(self._transform_raw_file(raw_file_info.file_path)):
+                raw_rows += chunk_rows
+                transformed_path: str = self._transformed_path(raw_file_info, part, latest_raw_tx_file_modified_date)
+                # upload transformed CardanoTxDTO to s3, in the transformed format of its key
+                self._s3_explorer.upload_buffer(
+                    bytes_io=encode_transformed_file(df, self._cardano_tx_dao.table, transformed_path), source_path=transformed_path
+                )
+            processed_objects.append(S3ProcessedObjectDTO.create_processed_object(raw_file_info, raw_rows))
 
         # list files from cardano/transactions/transformed
-        s3_transformed_tx_file_info: Generator[FileInfo, None, None] = self._s3_explorer.list_files(
-            self._s3_transformed_tx_path, default_modified_date
+        s3_transformed_tx_file_info: Generator[FileInfo, None, None] = await self._lister.list_new_files(
+            self._s3_transformed_tx_path, start_block_height, end_block_height
         )
 
+        latest_transformed_tx_file_modified_date: datetime = default_modified_date
         async with self._engine.begin() as conn:
             # create temp table
             await self._cardano_tx_dao.create_temp_table(async_connection=conn)
             # get all files from s3 cardano/transactions/transformed path
-            for transformed_file_info in s3_transformed_tx_file_info:
+            # the next files download while the current one is copied
+            async for transformed_file_info, csv_bytes in self._s3_explorer.prefetch(s3_transformed_tx_file_info):
                 latest_transformed_tx_file_modified_date = max(
-                    default_modified_date, transformed_file_info.modified_date
+                    latest_transformed_tx_file_modified_date, transformed_file_info.modified_date
                 )
-                # download CardanoTransactionsDTO csv files from S3 to buffer and copy to DB
-                csv_bytes: io.BytesIO = self._s3_explorer.download_to_buffer(
-                    transformed_file_info.file_path
-                )
-                await self._cardano_tx_dao.copy_tx_to_db(
+                # copy the downloaded CardanoTransactionsDTO csv file to DB
+                merge_result: StagingMergeResult = await self._cardano_tx_dao.copy_tx_to_db(
                     async_connection=conn, data_buffer=csv_bytes
                 )
+                print(f"{transformed_file_info.file_path}: staged {merge_result.staged} rows, inserted {merge_result.inserted}, skipped {merge_result.skipped} already present")
+                processed_objects.append(S3ProcessedObjectDTO.create_processed_object(transformed_file_info, merge_result.staged))
 
+            await self._processed_object_dao.insert_processed_objects(processed_objects, conn)
             # update import status - s3_to_db_import_status table
             import_status = S3ToDBImportStatusDTO.create_import_status(
                 table=self._table, file_modified_date=latest_transformed_tx_file_modified_date
@@ -112,8 +167,39 @@ class S3ToDBCardanoTransactionsETLPipeline:
                 import_status, conn
             )
 
+    def _transform_raw_file(self, s3_path: str) -> Iterator[tuple[pd.DataFrame, int]]:
+        """
+        streams the raw tx json file at s3_path as chunks of CardanoTransactionsDTO, yielding each chunk's DataFrame
+        with its number of transactions
+        """
+        for tx_dto_list in self._extractor.iter_tx_from_s3(s3_path=s3_path):
+            yield self._transformer.transform(cardano_tx_dto_list=tx_dto_list), len(tx_dto_list)
+
+    def _transformed_path(self, raw_file_info: FileInfo, part: int, file_modified_date: datetime) -> str:
+        return (
+            derived_key(raw_file_info.file_path, self._s3_transformed_tx_path, part, self._transformed_extension)
+            # raw files written before the height range layout keep the modified date naming
+            or f"cardano/transactions/transformed/{file_modified_date}/cardano_tx_transformed_{file_modified_date}_part{part}.{self._transformed_extension}"
+        )
+
 
-def run():
+@click.command()
+@direct_load_options
+@click.option(
+    "--codec",
+    type=click.Choice(CODEC_CHOICES),
+    default="none",
+    show_default=True,
+    help="Compress the transformed csv files written to S3, gzip or zstd (needs the zstandard package).",
+)
+@click.option(
+    "--transformed-format",
+    type=click.Choice(TRANSFORMED_FORMATS),
+    default="csv",
+    show_default=True,
+    help="Write the transformed files as csv, or as typed Parquet (needs the pyarrow package).",
+)
+def run(direct_load: bool, upload_transformed: bool, codec: str, transformed_format: str) -> None:
     """
     Responsible for running ETLpipeline
     """
@@ -140,16 +226,25 @@ def run():
     s3_to_db_cardano_tx_etl_pipeline: S3ToDBCardanoTransactionsETLPipeline = S3ToDBCardanoTransactionsETLPipeline(
         s3_to_db_import_status_dao=s3_to_db_import_status_dao,
         table="cardano_transactions",
-        s3_raw_tx_path="cardano/transactions/raw",
+        s3_raw_tx_path=height_range_prefix("transactions", "raw"),
         extractor=extractor,
         transformer=transformer,
-        s3_transformed_tx_path="cardano/transactions/transformed",
+        s3_transformed_tx_path=height_range_prefix("transactions", "transformed"),
         s3_explorer=s3_explorer,
-        cardano_transactions_dao=cardano_tx_dao
+        cardano_transactions_dao=cardano_tx_dao,
+        direct_load=direct_load,
+        upload_transformed=upload_transformed,
+        codec=parse_codec(codec),
+        transformed_format=parse_transformed_format(transformed_format),
     )
 
     event_loop: AbstractEventLoop = new_event_loop()
-    event_loop.run_until_complete(s3_to_db_cardano_tx_etl_pipeline.run())
+    try:
+        event_loop.run_until_complete(s3_to_db_cardano_tx_etl_pipeline.run())
+    finally:
+        s3_explorer.close()
+        get_default_engine_registry().log_pool_status()
+        event_loop.run_until_complete(get_default_engine_registry().dispose())
 
 
 if __name__ == "__main__":
@@ -1,19 +1,39 @@
-import io
+import asyncio
 from io import BytesIO
 from datetime import datetime, timezone
 import os
 import boto3
+import click
 import pandas as pd
 from dotenv import load_dotenv
 from asyncio import AbstractEventLoop, new_event_loop
-from typing import Generator
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine
+from itertools import count
+from typing import Awaitable, Callable, Generator, Iterator
+from sqlalchemy import Table
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncConnection
 
+from src.dao.engine_registry import EngineRegistry, get_default_engine_registry
 from src.models.file_info.file_info import FileInfo
 from src.dao.s3_to_db_import_status_dao import S3ToDbImportStatusDAO
-from src.models.database_transfer_objects.cardano_transactions_utxo_dto import CardanoTransactionUtxoDTO
 from src.extractors.get_tx_utxo_from_s3 import CardanoTxUtxoS3Extractor
+from src.models.blockfrost_models.cardano_transaction_utxo import TransactionUTxO
 from src.file_explorer.s3_file_explorer import S3Explorer
+from src.file_explorer.background_uploader import BackgroundCsvUploader
+from src.file_explorer.compression import CODEC_CHOICES, parse_codec
+from src.file_explorer.transformed_files import (
+    CSV,
+    TRANSFORMED_FORMATS,
+    encode_transformed_file,
+    parse_transformed_format,
+    transformed_extension,
+)
+from src.file_explorer.key_layout import derived_key, height_range_prefix
+from src.dao.staging_utils import StagingMergeResult
+from src.dao.s3_processed_object_dao import S3ProcessedObjectDAO
+from src.etl_pipelines.processed_object_lister import ProcessedObjectLister
+from src.etl_pipelines.direct_load import direct_load_options
+from src.models.database_transfer_objects.s3_processed_object_dto import S3ProcessedObjectDTO
+from src.dao.table_load_scheduler import TableLoadScheduler, TableLoad
 from src.models.database_transfer_objects.s3_to_db_import_status_dto import S3ToDBImportStatusDTO
 from src.transformer.transform_cardano_tx_utxo_dto_to_df import TransformCardanoTxUtxoDTOToDf
 from src.dao.cardano_tx_utxo_dao import CardanoTxUtxoDAO
@@ -21,6 +41,17 @@ from src.dao.cardano_tx_utxo_sub_dao import CardanoTxUtxoSubDAO
 from src.dao.cardano_tx_utxo_input_amount_dao import CardanoTxUtxoInputAmtDAO
 from database_management.cardano.cardano_tables import cardano_tx_utxo_input_table, cardano_tx_utxo_input_amount_table, cardano_tx_utxo_output_table, cardano_tx_utxo_output_amount_table
 
+# chunks transformed ahead of the slowest table chain in direct load mode
+DIRECT_LOAD_QUEUE_SIZE: int = 2
+# frame name, transformed S3 directory and file name prefix of each table, for raw files predating the height range layout
+TRANSFORMED_FILES: list[tuple[str, str, str]] = [
+    ("cardano_tx_utxo", "utxo", "cardano_tx_utxo"),
+    ("cardano_tx_utxo_input", "utxo_input", "cardano_tx_utxo_input"),
+    ("cardano_tx_utxo_input_amt", "utxo_input_amount", "cardano_tx_utxo_input_amount"),
+    ("cardano_tx_utxo_output", "utxo_output", "cardano_tx_utxo_output"),
+    ("cardano_tx_utxo_output_amt", "utxo_output_amount", "cardano_tx_utxo_output_amount"),
+]
+
 
 class S3ToDBCardanoTxUtxoETLPipeline:
     """
@@ -29,6 +60,14 @@ class S3ToDBCardanoTxUtxoETLPipeline:
         Get latest modified date from s3_import_status table where table column = "cardano_transaction_utxo"
         Use s3_to_db_import_status_dao.read_latest_import_status()
     2) Transform Raw Cardano Transaction UTXO data to Cardano Transaction UTXO DTO
+    3) Load the transformed files with TableLoadScheduler: cardano_tx_utxo, input -> input_amount and
+        output -> output_amount are three chains loaded concurrently, the import status is committed once all have committed
+        (each chain is atomic, the batch is not: see TableLoadScheduler)
+    Raw and transformed files not yet in the s3_processed_objects ledger are loaded, and recorded in it in the
+    transaction that loads them, so each file is loaded once whatever its key or modified date
+    Given a block range, run() lists and loads only the files of that range, e.g. one window of a full pipeline
+    With direct_load, the chains take the transformed DataFrames straight from the transform instead of reading the
+    transformed files back from S3, which are uploaded in the background (or not at all with upload_transformed=False)
     """
     def __init__(
             self,
@@ -48,7 +87,13 @@ class S3ToDBCardanoTxUtxoETLPipeline:
             cardano_tx_utxo_output_amt_dao: CardanoTxUtxoSubDAO,
             cardano_tx_utxo_input_dao: CardanoTxUtxoSubDAO,
             cardano_tx_utxo_input_amt_dao: CardanoTxUtxoInputAmtDAO,
-
+            load_scheduler: TableLoadScheduler | None = None,
+            engine_registry: EngineRegistry | None = None,
+            processed_object_dao: S3ProcessedObjectDAO | None = None,
+            direct_load: bool = False,
+            upload_transformed: bool = True,
+            codec: str | None = None,
+            transformed_format: str = CSV,
     ) -> None:
         self._s3_to_db_import_status_dao: S3ToDbImportStatusDAO = s3_to_db_import_status_dao
         self._table: str = table
@@ -61,7 +106,15 @@ class S3ToDBCardanoTxUtxoETLPipeline:
         self._s3_transformed_tx_utxo_input_amt_path = s3_transformed_tx_utxo_input_amt_path
         self._s3_transformed_tx_utxo_output_path = s3_transformed_tx_utxo_output_path
         self._s3_transformed_tx_utxo_output_amt_path = s3_transformed_tx_utxo_output_amt_path
-        self._engine: AsyncEngine = create_async_engine(
+        # transformed prefix of each frame of transform_raw
+        self._s3_transformed_paths: dict[str, str] = {
+            "cardano_tx_utxo": s3_transformed_tx_utxo_path,
+            "cardano_tx_utxo_input": s3_transformed_tx_utxo_input_path,
+            "cardano_tx_utxo_input_amt": s3_transformed_tx_utxo_input_amt_path,
+            "cardano_tx_utxo_output": s3_transformed_tx_utxo_output_path,
+            "cardano_tx_utxo_output_amt": s3_transformed_tx_utxo_output_amt_path,
+        }
+        self._engine: AsyncEngine = (engine_registry or get_default_engine_registry()).get_engine(
             os.getenv("ASYNC_PG_CONNECTION_STRING", "")
         )
         self._cardano_tx_utxo_dao = cardano_tx_utxo_dao
@@ -69,8 +122,29 @@ class S3ToDBCardanoTxUtxoETLPipeline:
         self._cardano_tx_utxo_output_amt_dao = cardano_tx_utxo_output_amt_dao
         self._cardano_tx_utxo_input_dao = cardano_tx_utxo_input_dao
         self._cardano_tx_utxo_input_amt_dao = cardano_tx_utxo_input_amt_dao
+        # table of each frame of transform_raw, the schema of its Parquet files
+        self._transformed_tables: dict[str, Table] = {
+            "cardano_tx_utxo": cardano_tx_utxo_dao.table,
+            "cardano_tx_utxo_input": cardano_tx_utxo_input_dao.table,
+            "cardano_tx_utxo_input_amt": cardano_tx_utxo_input_amt_dao.table,
+            "cardano_tx_utxo_output": cardano_tx_utxo_output_dao.table,
+            "cardano_tx_utxo_output_amt": cardano_tx_utxo_output_amt_dao.table,
+        }
+        # loads the utxo, input and output table chains concurrently, each on its own pooled connection
+        self._load_scheduler: TableLoadScheduler = load_scheduler or TableLoadScheduler(self._engine)
+        # ledger of the raw and transformed files already loaded, the files listed under each of the six prefixes are
+        # checked against it
+        self._processed_object_dao: S3ProcessedObjectDAO = processed_object_dao or S3ProcessedObjectDAO(
+            os.getenv("ASYNC_PG_CONNECTION_STRING", ""), engine_registry
+        )
+        self._lister: ProcessedObjectLister = ProcessedObjectLister(s3_explorer, self._processed_object_dao)
+        self._direct_load: bool = direct_load
+        self._upload_transformed: bool = upload_transformed
+        # the transformed files are written in transformed_format, csv ones with codec; the raw files are read whatever
+        # their codec
+        self._transformed_extension: str = transformed_extension(transformed_format, codec)
 
-    async def run(self) -> None:
+    async def run(self, start_block_height: int | None = None, end_block_height: int | None = None) -> None:
         latest_modified_date: datetime | None = (
             await self._s3_to_db_import_status_dao.read_latest_import_status(
                 self._table
@@ -81,125 +155,101 @@ class S3ToDBCardanoTxUtxoETLPipeline:
         default_modified_date: datetime = latest_modified_date or datetime(
             year=2024, month=12, day=30
         )
-        s3_raw_tx_utxo_file_info: Generator[FileInfo, None, None] = self._s3_explorer.list_files(
-            self._s3_raw_tx_path, default_modified_date
+        if self._direct_load:
+            await self._run_direct(default_modified_date, start_block_height, end_block_height)
+            return
+        s3_raw_tx_utxo_file_info: Generator[FileInfo, None, None] = await self._lister.list_new_files(
+            self._s3_raw_tx_path, start_block_height, end_block_height
         )
 
+        raw_processed_objects: list[S3ProcessedObjectDTO] = []
         for raw_file_info in s3_raw_tx_utxo_file_info:
+            raw_rows: int = 0
             latest_raw_tx_utxo_file_modified_date = max(
                 default_modified_date, raw_file_info.modified_date
             )
-            # get raw tx json file from  S3 and change it to CardanoTransactionsDTO
-            tx_utxo_dto_list: list[CardanoTransactionUtxoDTO] = self._extractor.get_tx_utxo_from_s3(
+            # one ingestion timestamp for the whole file, shared by every chunk
+            created_at: datetime = datetime.utcnow()
+            # stream raw tx utxo json file from S3 as chunks of TransactionUTxO, one set of transformed files per chunk
+            for part, raw_tx_utxo_list in enumerate(self._extractor.iter_raw_tx_utxo_from_s3(
                 s3_path=raw_file_info.file_path
-            )
-            # transform the dto list to a dictionary of dataframes - tx_utxo, tx_utxo_input, tx_utxo_output
-            dfs: dict[str, pd.DataFrame] = self._transformer.transform(cardano_tx_utxo_dto_list=tx_utxo_dto_list)
-            cardano_tx_utxo_df: pd.DataFrame = dfs["cardano_tx_utxo"]
-            cardano_tx_utxo_input_df: pd.DataFrame = dfs["cardano_tx_utxo_input"]
-            cardano_tx_utxo_input_amt_df: pd.DataFrame = dfs["cardano_tx_utxo_input_amt"]
-            cardano_tx_utxo_output_df: pd.DataFrame = dfs["cardano_tx_utxo_output"]
-            cardano_tx_utxo_output_amt_df: pd.DataFrame = dfs["cardano_tx_utxo_output_amt"]
-
-            # convert the pandas DataFrames into csv bytesIO files
-            csv_buffer: BytesIO = BytesIO()
-            cardano_tx_utxo_df.to_csv(csv_buffer, index=False)
-            csv_buffer.seek(0)
-            self._s3_explorer.upload_buffer(bytes_io=csv_buffer, source_path=f"cardano/transaction_utxo/transformed/utxo/{latest_raw_tx_utxo_file_modified_date}/cardano_tx_utxo_transformed_{latest_raw_tx_utxo_file_modified_date}.csv")
-            csv_buffer: BytesIO = BytesIO()
-            cardano_tx_utxo_input_df.to_csv(csv_buffer, index=False)
-            csv_buffer.seek(0)
-            self._s3_explorer.upload_buffer(bytes_io=csv_buffer, source_path=f"cardano/transaction_utxo/transformed/utxo_input/{latest_raw_tx_utxo_file_modified_date}/cardano_tx_utxo_input_transformed_{latest_raw_tx_utxo_file_modified_date}.csv")
-            csv_buffer: BytesIO = BytesIO()
-            cardano_tx_utxo_input_amt_df.to_csv(csv_buffer, index=False)
-            csv_buffer.seek(0)
-            self._s3_explorer.upload_buffer(bytes_io=csv_buffer,source_path=f"cardano/transaction_utxo/transformed/utxo_input_amount/{latest_raw_tx_utxo_file_modified_date}/cardano_tx_utxo_input_amount_transformed_{latest_raw_tx_utxo_file_modified_date}.csv")
-            csv_buffer: BytesIO = BytesIO()
-            cardano_tx_utxo_output_df.to_csv(csv_buffer, index=False)
-            csv_buffer.seek(0)
-            self._s3_explorer.upload_buffer(bytes_io=csv_buffer, source_path=f"cardano/transaction_utxo/transformed/utxo_output/{latest_raw_tx_utxo_file_modified_date}/cardano_tx_utxo_output_transformed_{latest_raw_tx_utxo_file_modified_date}.csv")
-            csv_buffer: BytesIO = BytesIO()
-            cardano_tx_utxo_output_amt_df.to_csv(csv_buffer, index=False)
-            csv_buffer.seek(0)
-            self._s3_explorer.upload_buffer(bytes_io=csv_buffer, source_path=f"cardano/transaction_utxo/transformed/utxo_output_amount/{latest_raw_tx_utxo_file_modified_date}/cardano_tx_utxo_output_amount_transformed_{latest_raw_tx_utxo_file_modified_date}.csv")
+            )):
+                raw_rows += len(raw_tx_utxo_list)
+                # fill the columns of tx_utxo, tx_utxo_input, tx_utxo_output and their amounts straight from the raw models
+                dfs: dict[str, pd.DataFrame] = self._transformer.transform_raw(
+                    tx_utxo_list=raw_tx_utxo_list, created_at=created_at
+                )
+                # encode the five DataFrames in the transformed format of their keys and upload them at once
+                uploads: list[tuple[BytesIO, str]] = []
+                for name, transformed_dir, file_prefix in TRANSFORMED_FILES:
+                    transformed_path: str = (
+                        derived_key(raw_file_info.file_path, self._s3_transformed_paths[name], part, self._transformed_extension)
+                        # raw files written before the height range layout keep the modified date naming
+                        or f"cardano/transaction_utxo/transformed/{transformed_dir}/{latest_raw_tx_utxo_file_modified_date}/{file_prefix}_transformed_{latest_raw_tx_utxo_file_modified_date}_part{part}.{self._transformed_extension}"
+                    )
+                    uploads.append(
+                        (encode_transformed_file(dfs[name], self._transformed_tables[name], transformed_path), transformed_path)
+                    )
+                await asyncio.to_thread(self._s3_explorer.upload_many, uploads)
+            raw_processed_objects.append(S3ProcessedObjectDTO.create_processed_object(raw_file_info, raw_rows))
         # list files from cardano/transaction_utxo/transformed/utxo
-        s3_transformed_tx_utxo_file_info: Generator[FileInfo, None, None] = self._s3_explorer.list_files(
-            self._s3_transformed_tx_utxo_path, default_modified_date
+        s3_transformed_tx_utxo_file_info: Generator[FileInfo, None, None] = await self._lister.list_new_files(
+            self._s3_transformed_tx_utxo_path, start_block_height, end_block_height
         )
-        s3_transformed_tx_utxo_input_file_info: Generator[FileInfo, None, None] = self._s3_explorer.list_files(
-            self._s3_transformed_tx_utxo_input_path, default_modified_date
+        s3_transformed_tx_utxo_input_file_info: Generator[FileInfo, None, None] = await self._lister.list_new_files(
+            self._s3_transformed_tx_utxo_input_path, start_block_height, end_block_height
         )
-        s3_transformed_tx_utxo_input_amt_file_info: Generator[FileInfo, None, None] = self._s3_explorer.list_files(
-            self._s3_transformed_tx_utxo_input_amt_path, default_modified_date
+        s3_transformed_tx_utxo_input_amt_file_info: Generator[FileInfo, None, None] = await self._lister.list_new_files(
+            self._s3_transformed_tx_utxo_input_amt_path, start_block_height, end_block_height
         )
-        s3_transformed_tx_utxo_output_file_info: Generator[FileInfo, None, None] = self._s3_explorer.list_files(
-            self._s3_transformed_tx_utxo_output_path, default_modified_date
+        s3_transformed_tx_utxo_output_file_info: Generator[FileInfo, None, None] = await self._lister.list_new_files(
+            self._s3_transformed_tx_utxo_output_path, start_block_height, end_block_height
         )
-        s3_transformed_tx_utxo_output_amt_file_info: Generator[FileInfo, None, None] = self._s3_explorer.list_files(
-            self._s3_transformed_tx_utxo_output_amt_path, default_modified_date
+        s3_transformed_tx_utxo_output_amt_file_info: Generator[FileInfo, None, None] = await self._lister.list_new_files(
+            self._s3_transformed_tx_utxo_output_amt_path, start_block_height, end_block_height
         )
 
-        async with self._engine.begin() as conn:
-            # create temp table
+        latest_transformed_tx_utxo_file_modified_date: datetime = default_modified_date
+
+        async def load_tx_utxo(conn: AsyncConnection) -> None:
+            nonlocal latest_transformed_tx_utxo_file_modified_date
             await self._cardano_tx_utxo_dao.create_temp_table(async_connection=conn)
+            processed_objects: list[S3ProcessedObjectDTO] = []
             # get all files from s3 cardano/transaction_utxo/transformed path
-            for utxo_transformed_file_info in s3_transformed_tx_utxo_file_info:
+            # the next files download while the current one is copied
+            async for utxo_transformed_file_info, csv_bytes in self._s3_explorer.prefetch(s3_transformed_tx_utxo_file_info):
                 latest_transformed_tx_utxo_file_modified_date = max(
-                    default_modified_date, utxo_transformed_file_info.modified_date
+                    latest_transformed_tx_utxo_file_modified_date, utxo_transformed_file_info.modified_date
                 )
-                print(latest_transformed_tx_utxo_file_modified_date)
                 print("key fetched:", utxo_transformed_file_info.file_path)
-                # download CardanoTxUtxoDTO csv files from S3 to buffer and copy to DB
-                csv_bytes: io.BytesIO = self._s3_explorer.download_to_buffer(
-                    utxo_transformed_file_info.file_path
-                )
-                print("peek:", utxo_transformed_file_info.file_path,
-                      "→", csv_bytes.getvalue()[:120])
-                await self._cardano_tx_utxo_dao.copy_tx_utxo_to_db(
-                    async_connection=conn, data_buffer=csv_bytes
-                )
-                csv_bytes.seek(0)
-            await self._cardano_tx_utxo_input_dao.create_temp_table(async_connection=conn)
-            for utxo_input_transformed_file_info in s3_transformed_tx_utxo_input_file_info:
-                # download  csv files from S3 to buffer and copy to DB
-                csv_bytes: io.BytesIO = self._s3_explorer.download_to_buffer(
-                    utxo_input_transformed_file_info.file_path
-                )
-                await self._cardano_tx_utxo_input_dao.copy_tx_utxo_to_db(
-                    async_connection=conn, data_buffer=csv_bytes
-                )
-                csv_bytes.seek(0)
-            await self._cardano_tx_utxo_input_amt_dao.create_temp_table(async_connection=conn)
-            for utxo_input_amt_transformed_file_info in s3_transformed_tx_utxo_input_amt_file_info:
-                # download  csv files from S3 to buffer and copy to DB
-                csv_bytes: io.BytesIO = self._s3_explorer.download_to_buffer(
-                    utxo_input_amt_transformed_file_info.file_path
-                )
-                await self._cardano_tx_utxo_input_amt_dao.copy_tx_utxo_input_amt_to_db(
-                    async_connection=conn, data_buffer=csv_bytes
-                )
-                csv_bytes.seek(0)
-            await self._cardano_tx_utxo_output_dao.create_temp_table(async_connection=conn)
-            for utxo_output_transformed_file_info in s3_transformed_tx_utxo_output_file_info:
-                # download  csv files from S3 to buffer and copy to DB
-                csv_bytes: io.BytesIO = self._s3_explorer.download_to_buffer(
-                    utxo_output_transformed_file_info.file_path
-                )
-                await self._cardano_tx_utxo_output_dao.copy_tx_utxo_to_db(
-                    async_connection=conn, data_buffer=csv_bytes
-                )
-                csv_bytes.seek(0)
-            await self._cardano_tx_utxo_output_amt_dao.create_temp_table(async_connection=conn)
-            for utxo_output_amt_transformed_file_info in s3_transformed_tx_utxo_output_amt_file_info:
-                # download  csv files from S3 to buffer and copy to DB
-                csv_bytes: io.BytesIO = self._s3_explorer.download_to_buffer(
-                    utxo_output_amt_transformed_file_info.file_path
-                )
-                await self._cardano_tx_utxo_output_amt_dao.copy_tx_utxo_to_db(
+                # copy the downloaded CardanoTxUtxoDTO csv file to DB
+                merge_result: StagingMergeResult = await self._cardano_tx_utxo_dao.copy_tx_utxo_to_db(
                     async_connection=conn, data_buffer=csv_bytes
                 )
-                csv_bytes.seek(0)
+                print(f"{utxo_transformed_file_info.file_path}: staged {merge_result.staged} rows, inserted {merge_result.inserted}, skipped {merge_result.skipped} already present")
+                processed_objects.append(S3ProcessedObjectDTO.create_processed_object(utxo_transformed_file_info, merge_result.staged))
+            # recorded with the rows of the files, on the same connection
+            await self._processed_object_dao.insert_processed_objects(processed_objects, conn)
+
+        def load_files(
+            dao_copy: Callable[..., Awaitable[StagingMergeResult]],
+            create_temp_table: Callable[..., Awaitable[None]],
+            file_infos: Generator[FileInfo, None, None],
+        ) -> TableLoad:
+            async def load(conn: AsyncConnection) -> None:
+                await create_temp_table(async_connection=conn)
+                processed_objects: list[S3ProcessedObjectDTO] = []
+                # the next files download while the current one is copied
+                async for file_info, csv_bytes in self._s3_explorer.prefetch(file_infos):
+                    merge_result: StagingMergeResult = await dao_copy(async_connection=conn, data_buffer=csv_bytes)
+                    print(f"{file_info.file_path}: staged {merge_result.staged} rows, inserted {merge_result.inserted}, skipped {merge_result.skipped} already present")
+                    processed_objects.append(S3ProcessedObjectDTO.create_processed_object(file_info, merge_result.staged))
+                await self._processed_object_dao.insert_processed_objects(processed_objects, conn)
+            return load
 
+        async def write_import_status(conn: AsyncConnection) -> None:
+            # the raw files count as processed once all five tables hold their rows
+            await self._processed_object_dao.insert_processed_objects(raw_processed_objects, conn)
             # update import status - s3_to_db_import_status table
             import_status = S3ToDBImportStatusDTO.create_import_status(
                 table=self._table, file_modified_date=latest_transformed_tx_utxo_file_modified_date
@@ -208,8 +258,173 @@ class S3ToDBCardanoTxUtxoETLPipeline:
                 import_status, conn
             )
 
+        # the input and output chains do not reference each other, nor cardano_tx_utxo, so the three chains load
+        # concurrently; within a chain the amounts follow the rows their parent_id points to
+        await self._load_scheduler.run(
+            chains=[
+                [load_tx_utxo],
+                [
+                    load_files(self._cardano_tx_utxo_input_dao.copy_tx_utxo_to_db, self._cardano_tx_utxo_input_dao.create_temp_table, s3_transformed_tx_utxo_input_file_info),
+                    load_files(self._cardano_tx_utxo_input_amt_dao.copy_tx_utxo_input_amt_to_db, self._cardano_tx_utxo_input_amt_dao.create_temp_table, s3_transformed_tx_utxo_input_amt_file_info),
+                ],
+                [
+                    load_files(self._cardano_tx_utxo_output_dao.copy_tx_utxo_to_db, self._cardano_tx_utxo_output_dao.create_temp_table, s3_transformed_tx_utxo_output_file_info),
+                    load_files(self._cardano_tx_utxo_output_amt_dao.copy_tx_utxo_to_db, self._cardano_tx_utxo_output_amt_dao.create_temp_table, s3_transformed_tx_utxo_output_amt_file_info),
+                ],
+            ],
+            status_write=write_import_status,
+        )
+
+    async def _run_direct(
+        self, default_modified_date: datetime, start_block_height: int | None, end_block_height: int | None
+    ) -> None:
+        """
+        transforms the raw files while the three table chains load the frames, without listing or downloading the
+        transformed files back
+        - one producer transforms each chunk and puts its frames on a bounded queue per chain, so at most
+          DIRECT_LOAD_QUEUE_SIZE chunks wait in memory for the slowest chain
+        - the producer streams and transforms each chunk in a worker thread, so the event loop stays free for the copies
+        - within a chain the frames of a chunk are copied in order, the amounts after the rows their parent_id points to
+        - a failing producer hands its exception to every chain, so all of them roll back
+        - a failing chain cancels the producer and the uploads it left in flight
+        - the transformed csv files keep their S3 paths and ids, so a later run from the transformed files merges nothing new
+        """
+        uploader: BackgroundCsvUploader = BackgroundCsvUploader(self._s3_explorer, enabled=self._upload_transformed)
+        # each item holds the frames of a chunk and the S3 paths of their transformed files, by frame name
+        chain_queues: list[asyncio.Queue[tuple[dict[str, pd.DataFrame], dict[str, str]] | Exception | None]] = [
+            asyncio.Queue(maxsize=DIRECT_LOAD_QUEUE_SIZE) for _ in range(3)
+        ]
+        latest_raw_tx_utxo_file_modified_date: datetime = default_modified_date
+        raw_processed_objects: list[S3ProcessedObjectDTO] = []
+
+        def transform_next_chunk(
+            raw_chunks: Iterator[list[TransactionUTxO]], created_at: datetime
+        ) -> tuple[int, dict[str, pd.DataFrame]] | None:
+            raw_tx_utxo_list: list[TransactionUTxO] | None = next(raw_chunks, None)
+            if raw_tx_utxo_list is None:
+                return None
+            return len(raw_tx_utxo_list), self._transformer.transform_raw(
+                tx_utxo_list=raw_tx_utxo_list, created_at=created_at
+            )
+
+        async def produce() -> None:
+            nonlocal latest_raw_tx_utxo_file_modified_date
+            try:
+                for raw_file_info in await self._lister.list_new_files(self._s3_raw_tx_path, start_block_height, end_block_height):
+                    raw_rows: int = 0
+                    file_modified_date: datetime = max(default_modified_date, raw_file_info.modified_date)
+                    # one ingestion timestamp for the whole file, shared by every chunk
+                    created_at: datetime = datetime.utcnow()
+                    raw_chunks: Iterator[list[TransactionUTxO]] = self._extractor.iter_raw_tx_utxo_from_s3(
+                        s3_path=raw_file_info.file_path
+                    )
+                    for part in count():
+                        # reading, parsing and transforming a chunk block, so they run off the event loop and the
+                        # chains keep copying meanwhile
+                        chunk: tuple[int, dict[str, pd.DataFrame]] | None = await asyncio.to_thread(
+                            transform_next_chunk, raw_chunks, created_at
+                        )
+                        if chunk is None:
+                            break
+                        chunk_rows, dfs = chunk
+                        raw_rows += chunk_rows
+                        transformed_paths: dict[str, str] = {
+                            name: derived_key(raw_file_info.file_path, self._s3_transformed_paths[name], part, self._transformed_extension)
+                            # raw files written before the height range layout keep the modified date naming
+                            or f"cardano/transaction_utxo/transformed/{transformed_dir}/{file_modified_date}/{file_prefix}_transformed_{file_modified_date}_part{part}.{self._transformed_extension}"
+                            for name, transformed_dir, file_prefix in TRANSFORMED_FILES
+                        }
+                        for name, transformed_path in transformed_paths.items():
+                            await uploader.submit(dfs[name], transformed_path, self._transformed_tables[name])
+                        for chain_queue in chain_queues:
+                            await chain_queue.put((dfs, transformed_paths))
+                    raw_processed_objects.append(S3ProcessedObjectDTO.create_processed_object(raw_file_info, raw_rows))
+                    latest_raw_tx_utxo_file_modified_date = max(latest_raw_tx_utxo_file_modified_date, file_modified_date)
+                # the transformed files are complete before the import status moves past their raw files
+                await uploader.wait()
+            except Exception as e:
+                for chain_queue in chain_queues:
+                    # the chain is failing anyway, drop what it has not loaded yet to make room for the error
+                    while not chain_queue.empty():
+                        chain_queue.get_nowait()
+                    chain_queue.put_nowait(e)
+                return
+            for chain_queue in chain_queues:
+                await chain_queue.put(None)
+
+        def load_frames(
+            chain_queue: asyncio.Queue[tuple[dict[str, pd.DataFrame], dict[str, str]] | Exception | None],
+            steps: list[tuple[str, CardanoTxUtxoDAO | CardanoTxUtxoSubDAO | CardanoTxUtxoInputAmtDAO]],
+        ) -> TableLoad:
+            async def load(conn: AsyncConnection) -> None:
+                for _, dao in steps:
+                    await dao.create_temp_table(async_connection=conn)
+                processed_objects: list[S3ProcessedObjectDTO] = []
+                while True:
+                    item = await chain_queue.get()
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    dfs, transformed_paths = item
+                    for name, dao in steps:
+                        merge_result: StagingMergeResult = await dao.copy_df_to_db(async_connection=conn, df=dfs[name])
+                        print(f"{transformed_paths[name]}: staged {merge_result.staged} rows, inserted {merge_result.inserted}, skipped {merge_result.skipped} already present")
+                        if self._upload_transformed:
+                            processed_objects.append(
+                                S3ProcessedObjectDTO.create_pending_object(transformed_paths[name], merge_result.staged)
+                            )
+                await self._processed_object_dao.insert_processed_objects(processed_objects, conn)
+            return load
+
+        async def write_import_status(conn: AsyncConnection) -> None:
+            await self._processed_object_dao.insert_processed_objects(raw_processed_objects, conn)
+            import_status = S3ToDBImportStatusDTO.create_import_status(
+                table=self._table, file_modified_date=latest_raw_tx_utxo_file_modified_date
+            )
+            await self._s3_to_db_import_status_dao.insert_latest_import_status(
+                import_status, conn
+            )
+
+        producer: asyncio.Task[None] = asyncio.create_task(produce())
+        try:
+            await self._load_scheduler.run(
+                chains=[
+                    [load_frames(chain_queues[0], [("cardano_tx_utxo", self._cardano_tx_utxo_dao)])],
+                    [load_frames(chain_queues[1], [
+                        ("cardano_tx_utxo_input", self._cardano_tx_utxo_input_dao),
+                        ("cardano_tx_utxo_input_amt", self._cardano_tx_utxo_input_amt_dao),
+                    ])],
+                    [load_frames(chain_queues[2], [
+                        ("cardano_tx_utxo_output", self._cardano_tx_utxo_output_dao),
+                        ("cardano_tx_utxo_output_amt", self._cardano_tx_utxo_output_amt_dao),
+                    ])],
+                ],
+                status_write=write_import_status,
+            )
+        finally:
+            # a failing chain leaves the producer waiting on its full queue, and its uploads in flight
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+            await uploader.cancel()
 
-def run():
+@click.command()
+@direct_load_options
+@click.option(
+    "--codec",
+    type=click.Choice(CODEC_CHOICES),
+    default="none",
+    show_default=True,
+    help="Compress the transformed csv files written to S3, gzip or zstd (needs the zstandard package).",
+)
+@click.option(
+    "--transformed-format",
+    type=click.Choice(TRANSFORMED_FORMATS),
+    default="csv",
+    show_default=True,
+    help="Write the transformed files as csv, or as typed Parquet (needs the pyarrow package).",
+)
+def run(direct_load: bool, upload_transformed: bool, codec: str, transformed_format: str) -> None:
     """
     Responsible for running ETLpipeline
     """
@@ -252,24 +467,33 @@ def run():
     s3_to_db_cardano_tx_utxo_etl_pipeline: S3ToDBCardanoTxUtxoETLPipeline = S3ToDBCardanoTxUtxoETLPipeline(
         s3_to_db_import_status_dao=s3_to_db_import_status_dao,
         table="cardano_tx_utxo",
-        s3_raw_tx_path="cardano/transaction_utxo/raw",
+        s3_raw_tx_path=height_range_prefix("transaction_utxo", "raw"),
         extractor=extractor,
         transformer=transformer,
         s3_explorer=s3_explorer,
-        s3_transformed_tx_utxo_path="cardano/transaction_utxo/transformed/utxo/",
-        s3_transformed_tx_utxo_input_path="cardano/transaction_utxo/transformed/utxo_input/",
-        s3_transformed_tx_utxo_input_amt_path="cardano/transaction_utxo/transformed/utxo_input_amount/",
-        s3_transformed_tx_utxo_output_path="cardano/transaction_utxo/transformed/utxo_output/",
-        s3_transformed_tx_utxo_output_amt_path="cardano/transaction_utxo/transformed/utxo_output_amount/",
+        s3_transformed_tx_utxo_path=height_range_prefix("transaction_utxo", "transformed/utxo"),
+        s3_transformed_tx_utxo_input_path=height_range_prefix("transaction_utxo", "transformed/utxo_input"),
+        s3_transformed_tx_utxo_input_amt_path=height_range_prefix("transaction_utxo", "transformed/utxo_input_amount"),
+        s3_transformed_tx_utxo_output_path=height_range_prefix("transaction_utxo", "transformed/utxo_output"),
+        s3_transformed_tx_utxo_output_amt_path=height_range_prefix("transaction_utxo", "transformed/utxo_output_amount"),
         cardano_tx_utxo_dao=cardano_tx_utxo_dao,
         cardano_tx_utxo_output_dao=cardano_tx_utxo_output_dao,
         cardano_tx_utxo_output_amt_dao=cardano_tx_utxo_output_amt_dao,
         cardano_tx_utxo_input_dao=cardano_tx_utxo_input_dao,
         cardano_tx_utxo_input_amt_dao=cardano_tx_utxo_input_amt_dao,
+        direct_load=direct_load,
+        upload_transformed=upload_transformed,
+        codec=parse_codec(codec),
+        transformed_format=parse_transformed_format(transformed_format),
     )
 
     event_loop: AbstractEventLoop = new_event_loop()
-    event_loop.run_until_complete(s3_to_db_cardano_tx_utxo_etl_pipeline.run())
+    try:
+        event_loop.run_until_complete(s3_to_db_cardano_tx_utxo_etl_pipeline.run())
+    finally:
+        s3_explorer.close()
+        get_default_engine_registry().log_pool_status()
+        event_loop.run_until_complete(get_default_engine_registry().dispose())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,38 @@
+class TxHashHandoff:
+    """
+    Responsible for handing the tx hashes of each block from one stage to the next when both run in the same process,
+    instead of the next stage reading them back from the DB
+    - the upstream stage publishes the {block height: [tx hash]} map of a block range once the range is in S3
+    - the downstream stage takes the map of its range, and falls back to its DB query when the range was not
+      published as a whole, as in a standalone or resumed run
+    - a taken range and the heights before it are dropped, so only the windows in flight are held in memory
+    """
+    def __init__(self) -> None:
+        self._published_heights: set[int] = set()
+        self._tx_hashes_by_block: dict[int, list[str]] = {}
+
+    def publish(self, start_block_height: int, end_block_height: int, tx_hashes_by_block: dict[int, list[str]]) -> None:
+        """
+        records the tx hashes of every block from start_block_height to end_block_height, in each block's order;
+        blocks without transactions are left out of tx_hashes_by_block
+        """
+        self._published_heights.update(range(start_block_height, end_block_height+1))
+        self._tx_hashes_by_block.update(tx_hashes_by_block)
+
+    def take(self, start_block_height: int, end_block_height: int) -> dict[int, list[str]] | None:
+        """
+        returns the tx hashes of the blocks from start_block_height to end_block_height with transactions,
+        in block order, or None when part of the range was not published
+        """
+        if not self._published_heights.issuperset(range(start_block_height, end_block_height+1)):
+            return None
+        tx_hashes_by_block: dict[int, list[str]] = {
+            height: self._tx_hashes_by_block[height]
+            for height in range(start_block_height, end_block_height+1)
+            if height in self._tx_hashes_by_block
+        }
+        self._published_heights = {height for height in self._published_heights if height > end_block_height}
+        self._tx_hashes_by_block = {
+            height: tx_hashes for height, tx_hashes in self._tx_hashes_by_block.items() if height > end_block_height
+        }
+        return tx_hashes_by_block
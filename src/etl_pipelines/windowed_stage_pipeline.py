@@ -0,0 +1,98 @@
+import asyncio
+from typing import Awaitable, Callable, Generator
+
+# runs one stage for the blocks start_block_height to end_block_height of a window
+WindowStageRun = Callable[[int, int], Awaitable[None]]
+
+# a stage may finish one window ahead of the stages depending on it, enough to keep them all busy
+DEFAULT_WINDOWS_AHEAD: int = 1
+
+
+def block_windows(start_block_height: int, end_block_height: int, window_size: int) -> Generator[tuple[int, int], None, None]:
+    """
+    e.g. block_windows(1, 2500, 1000) yields (1, 1000), (1001, 2000), (2001, 2500)
+    """
+    if window_size < 1:
+        raise ValueError(f"window_size must be at least 1, got {window_size}")
+    while start_block_height <= end_block_height:
+        window_end: int = min(start_block_height+window_size-1, end_block_height)
+        yield start_block_height, window_end
+        start_block_height = window_end+1
+
+
+class WindowStage:
+    """
+    one stage of a WindowedStagePipeline, run for a window once the stages named in depends_on are done with it
+    """
+    def __init__(self, name: str, run: WindowStageRun, depends_on: list[str] | None = None) -> None:
+        self.name: str = name
+        self.run: WindowStageRun = run
+        self.depends_on: list[str] = depends_on or []
+
+
+class WindowedStagePipeline:
+    """
+    Responsible for running a DAG of stages over consecutive block windows, the stages overlapping each other
+    - every stage runs in its own task and goes through the windows in order
+    - a stage takes a window only once every stage it depends on is done with the window, so a stage reading the
+      rows loaded by another (e.g. utxo reading the tx hashes of its window) always finds them
+    - stages not depending on each other run at the same time, e.g. the blocks and block_tx fetches of a window,
+      and a stage works on window N+1 while the stages depending on it work on window N
+    - at most windows_ahead windows done by a stage wait for each stage depending on it, bounding the files in S3
+    - the first error cancels every stage and is raised; the import statuses let a rerun resume where it stopped
+    Concurrent stages call Blockfrost through the same process wide rate limiter, so they share its quota.
+    """
+    def __init__(self, stages: list[WindowStage], window_size: int, windows_ahead: int = DEFAULT_WINDOWS_AHEAD) -> None:
+        if not stages:
+            raise ValueError("a pipeline needs at least one stage")
+        if windows_ahead < 1:
+            raise ValueError(f"windows_ahead must be at least 1, got {windows_ahead}")
+        declared: set[str] = set()
+        for stage in stages:
+            if stage.name in declared:
+                raise ValueError(f"stage {stage.name!r} is declared twice")
+            # stages come after the stages they depend on, which also rules out cycles
+            missing: list[str] = [name for name in stage.depends_on if name not in declared]
+            if missing:
+                raise ValueError(f"stage {stage.name!r} depends on {missing}, which must be declared before it")
+            declared.add(stage.name)
+        self._stages: list[WindowStage] = stages
+        self._window_size: int = window_size
+        self._windows_ahead: int = windows_ahead
+
+    async def run(self, start_block_height: int, end_block_height: int) -> None:
+        # one queue per dependency edge, holding the windows done by the dependency and not yet taken by the dependent
+        edges: dict[tuple[str, str], asyncio.Queue[tuple[int, int]]] = {
+            (dependency, stage.name): asyncio.Queue(maxsize=self._windows_ahead)
+            for stage in self._stages
+            for dependency in stage.depends_on
+        }
+        try:
+            async with asyncio.TaskGroup() as task_group:
+                for stage in self._stages:
+                    task_group.create_task(
+                        self._run_stage(
+                            stage=stage,
+                            windows=list(block_windows(start_block_height, end_block_height, self._window_size)),
+                            inputs=[edges[(dependency, stage.name)] for dependency in stage.depends_on],
+                            outputs=[queue for (dependency, _), queue in edges.items() if dependency == stage.name],
+                        )
+                    )
+        except ExceptionGroup as group:
+            # surface the failing stage's own error, as a sequential run would have raised it
+            raise group.exceptions[0]
+
+    @staticmethod
+    async def _run_stage(
+        stage: WindowStage,
+        windows: list[tuple[int, int]],
+        inputs: list[asyncio.Queue[tuple[int, int]]],
+        outputs: list[asyncio.Queue[tuple[int, int]]],
+    ) -> None:
+        for window in windows:
+            # every stage goes through the same windows in the same order, so each input hands over this window
+            for queue in inputs:
+                await queue.get()
+            await stage.run(*window)
+            for queue in outputs:
+                await queue.put(window)
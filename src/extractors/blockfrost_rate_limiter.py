@@ -0,0 +1,154 @@
+import asyncio
+import functools
+import os
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, ParamSpec, TypeVar
+
+from tenacity import AsyncRetrying, RetryCallState
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+# attempts of one Blockfrost request in total, 429s included
+MAX_ATTEMPTS: int = 20
+# attempts of one Blockfrost request that may fail with something other than a 429, e.g. a 5xx or a dropped connection
+MAX_FAILED_ATTEMPTS: int = 5
+
+
+class BlockfrostRateLimitError(Exception):
+    """
+    Raised when Blockfrost rejects a request with status code 429
+    retry_after is the pause, in seconds, that Blockfrost asked for
+    """
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"Received status code 429, retrying after {retry_after}s")
+        self.retry_after: float = retry_after
+
+
+class BlockfrostRateLimiter:
+    """
+    Responsible for keeping every Blockfrost extractor within the plan's quota using a token bucket
+    - the bucket holds up to `burst` tokens and refills at `rate_per_second`
+    - acquire() waits until a token is available, so callers run at the maximum allowed throughput
+    - pause() is called on a 429 and blocks every caller, not only the one that got rejected
+    The limiter holds no asyncio primitives, so one instance can be shared across event loops
+    """
+    def __init__(self, rate_per_second: float, burst: int) -> None:
+        if rate_per_second <= 0 or burst < 1:
+            raise ValueError(f"invalid rate limit: rate_per_second={rate_per_second}, burst={burst}")
+        self._rate_per_second: float = rate_per_second
+        self._burst: int = burst
+        self._tokens: float = float(burst)
+        self._last_refill: float = time.monotonic()
+        self._paused_until: float = 0.0
+
+    @staticmethod
+    def from_env() -> "BlockfrostRateLimiter":
+        """
+        defaults follow Blockfrost's published limits: 10 requests per second with a burst of 500
+        """
+        return BlockfrostRateLimiter(
+            rate_per_second=float(os.getenv("BLOCKFROST_RATE_PER_SECOND", "10")),
+            burst=int(os.getenv("BLOCKFROST_BURST", "500")),
+        )
+
+    async def acquire(self) -> None:
+        while True:
+            now: float = time.monotonic()
+            if now < self._paused_until:
+                await asyncio.sleep(self._paused_until - now)
+                continue
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self._rate_per_second)
+
+    def pause(self, seconds: float) -> None:
+        """
+        stop handing out tokens for `seconds`, and empty the bucket so callers ramp back up at the sustained rate
+        """
+        now: float = time.monotonic()
+        self._paused_until = max(self._paused_until, now + seconds)
+        self._tokens = 0.0
+        self._last_refill = self._paused_until
+
+    def rate_limited(self, retry_after: str | None) -> BlockfrostRateLimitError:
+        """
+        called on a 429 with its Retry-After header: pauses every caller sharing this limiter, not just the rejected one,
+        and returns the error for the caller to raise
+        """
+        seconds: float = self.parse_retry_after(retry_after)
+        self.pause(seconds)
+        return BlockfrostRateLimitError(seconds)
+
+    def _refill(self, now: float) -> None:
+        elapsed: float = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(float(self._burst), self._tokens + elapsed * self._rate_per_second)
+            self._last_refill = now
+
+    @staticmethod
+    def parse_retry_after(retry_after: str | None, default: float = 1.0) -> float:
+        """
+        Retry-After is either a number of seconds or an HTTP date
+        """
+        if not retry_after:
+            return default
+        try:
+            return max(float(retry_after), 0.0)
+        except ValueError:
+            pass
+        try:
+            retry_at: datetime = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return default
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def blockfrost_retry(func: Callable[P, Awaitable[T]]) -> Callable[P, Awaitable[T]]:
+    """
+    Responsible for retrying a Blockfrost request for at most MAX_ATTEMPTS attempts in total
+    - a 429 is retried straight away; the wait happens in rate_limiter.acquire() after rate_limited() paused it
+    - any other failure is retried after 10ms, and gives up once MAX_FAILED_ATTEMPTS attempts have failed that way
+    The last error is re-raised when the request gives up
+    """
+    @functools.wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+        failed_attempts: int = 0
+
+        def is_rate_limited(retry_state: RetryCallState) -> bool:
+            return retry_state.outcome is not None and isinstance(
+                retry_state.outcome.exception(), BlockfrostRateLimitError
+            )
+
+        def stop(retry_state: RetryCallState) -> bool:
+            nonlocal failed_attempts
+            if not is_rate_limited(retry_state):
+                failed_attempts += 1
+            return retry_state.attempt_number >= MAX_ATTEMPTS or failed_attempts >= MAX_FAILED_ATTEMPTS
+
+        def wait(retry_state: RetryCallState) -> float:
+            return 0.0 if is_rate_limited(retry_state) else 0.01
+
+        async for attempt in AsyncRetrying(stop=stop, wait=wait, reraise=True):
+            with attempt:
+                return await func(*args, **kwargs)
+        raise AssertionError("unreachable: AsyncRetrying either returns or re-raises")
+
+    return wrapper
+
+
+_default_rate_limiter: BlockfrostRateLimiter | None = None
+
+
+def get_default_rate_limiter() -> BlockfrostRateLimiter:
+    """
+    returns the process-wide limiter shared by every extractor that is not given one explicitly
+    """
+    global _default_rate_limiter
+    if _default_rate_limiter is None:
+        _default_rate_limiter = BlockfrostRateLimiter.from_env()
+    return _default_rate_limiter
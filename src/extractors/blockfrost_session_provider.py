@@ -0,0 +1,48 @@
+import aiohttp
+
+
+class BlockfrostSessionProvider:
+    """
+    Responsible for owning one long-lived aiohttp.ClientSession that every Blockfrost extractor shares
+    - keep-alive connections are reused across requests, so only the first request to a host pays the TCP + TLS handshake
+    - limit_per_host caps the number of open connections to Blockfrost
+    - resolved DNS entries are cached for ttl_dns_cache seconds
+    The session is created lazily inside the running event loop; close() must be awaited once the pipeline finishes
+    """
+    def __init__(
+        self,
+        limit_per_host: int = 50,
+        ttl_dns_cache: int = 300,
+        keepalive_timeout: float = 30.0,
+        request_timeout: float = 60.0,
+    ) -> None:
+        self._limit_per_host: int = limit_per_host
+        self._ttl_dns_cache: int = ttl_dns_cache
+        self._keepalive_timeout: float = keepalive_timeout
+        self._request_timeout: float = request_timeout
+        self._session: aiohttp.ClientSession | None = None
+
+    def get_session(self) -> aiohttp.ClientSession:
+        """
+        returns the shared session, creating it (and its connector) on first use
+        must be called from within a coroutine so that the session binds to the running event loop
+        """
+        if self._session is None or self._session.closed:
+            connector: aiohttp.TCPConnector = aiohttp.TCPConnector(
+                limit_per_host=self._limit_per_host,
+                ttl_dns_cache=self._ttl_dns_cache,
+                keepalive_timeout=self._keepalive_timeout,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self._request_timeout),
+            )
+        return self._session
+
+    async def close(self) -> None:
+        """
+        closes the shared session and its pooled connections
+        """
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
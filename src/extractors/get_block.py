@@ -5,18 +5,22 @@ import os
 from typing import Any
 from dotenv import load_dotenv
 
-from tenacity import retry, wait_fixed, stop_after_attempt
+from src.extractors.blockfrost_session_provider import BlockfrostSessionProvider
+from src.extractors.blockfrost_rate_limiter import BlockfrostRateLimiter, blockfrost_retry, get_default_rate_limiter
 from src.models.blockfrost_models.raw_cardano_blocks import RawBlockfrostCardanoBlockInfo
 
 
 class CardanoBlockExtractor:
-    @staticmethod
-    @retry(
-        wait=wait_fixed(0.01),
-        stop=stop_after_attempt(5),
-        reraise=True,
-    )
-    async def get_block(block_number: str) -> RawBlockfrostCardanoBlockInfo:
+    def __init__(
+        self,
+        session_provider: BlockfrostSessionProvider,
+        rate_limiter: BlockfrostRateLimiter | None = None,
+    ) -> None:
+        self._session_provider: BlockfrostSessionProvider = session_provider
+        self._rate_limiter: BlockfrostRateLimiter = rate_limiter or get_default_rate_limiter()
+
+    @blockfrost_retry
+    async def get_block(self, block_number: str) -> RawBlockfrostCardanoBlockInfo:
         """
         note that Blockfrost allows block_hash to be passed instead of block_number as well
         but we will go with block number
@@ -25,23 +29,28 @@ class CardanoBlockExtractor:
 
         headers: dict[str, str] = {"Project_id": os.getenv("BLOCKFROST_PROJECT_ID")}
 
-        async with aiohttp.ClientSession() as client:
-            async with client.get(url=url, headers=headers) as response:
-                if response.status == 200:
-                    data: dict[str, Any] = await response.json()
-                    cardano_block_info: RawBlockfrostCardanoBlockInfo = (
-                        RawBlockfrostCardanoBlockInfo.model_validate(data)
-                    )
-                    return cardano_block_info
-
-                else:
-                    raise Exception(f"Received non-status code 200: {response.status}")
+        await self._rate_limiter.acquire()
+        session: aiohttp.ClientSession = self._session_provider.get_session()
+        async with session.get(url=url, headers=headers) as response:
+            if response.status == 200:
+                data: dict[str, Any] = await response.json()
+                cardano_block_info: RawBlockfrostCardanoBlockInfo = (
+                    RawBlockfrostCardanoBlockInfo.model_validate(data)
+                )
+                return cardano_block_info
+            elif response.status == 429:
+                raise self._rate_limiter.rate_limited(response.headers.get("Retry-After"))
+            else:
+                raise Exception(f"Received non-status code 200: {response.status}")
 
 
 if __name__ == "__main__":
     load_dotenv()
+    session_provider: BlockfrostSessionProvider = BlockfrostSessionProvider()
+    extractor: CardanoBlockExtractor = CardanoBlockExtractor(session_provider=session_provider)
     event_loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
     result: RawBlockfrostCardanoBlockInfo = event_loop.run_until_complete(
-        CardanoBlockExtractor.get_block("4865265")
+        extractor.get_block("4865265")
     )
+    event_loop.run_until_complete(session_provider.close())
     pprint(result)
@@ -1,8 +1,9 @@
 import io
 import asyncio
-import json
 import os
-from typing import Any
+from contextlib import closing
+from datetime import datetime
+from typing import Any, Generator
 import boto3
 from dotenv import load_dotenv
 from pprint import pprint
@@ -11,6 +12,10 @@ from retry import retry
 from src.models.blockfrost_models.raw_cardano_blocks import RawBlockfrostCardanoBlockInfo
 from src.models.database_transfer_objects.cardano_blocks import CardanoBlocksDTO
 from src.file_explorer.s3_file_explorer import S3Explorer
+from src.extractors.s3_stream import open_s3_stream
+from src.file_explorer.json_lines import DEFAULT_CHUNK_SIZE, load_json_records, iter_json_records
+from src.utils.iter_utils import batched
+
 
 class CardanoBlockS3Extractor:
     def __init__(
@@ -36,18 +41,35 @@ class CardanoBlockS3Extractor:
         # download the JSON file into a BytesIO buffer
         buffer: io.BytesIO = self._s3_explorer.download_to_buffer(s3_path)
         # buffer: io.BytesIO = self._s3_explorer.download_to_buffer(s3_path=f"cardano/blocks/{end_block_height}/cardano_blocks_{end_block_height}.json")
-        # load the JSON content into a list of dict
-        block_data: list[dict[str, Any]] = json.load(buffer)
+        # load the JSON lines or JSON array content into a list of dict
+        block_data: list[dict[str, Any]] = load_json_records(buffer, s3_path)
 
+        # one ingestion timestamp for the whole file, the raw models are validated so the DTOs are built without revalidation
+        created_at: datetime = datetime.utcnow()
         dtos: list[CardanoBlocksDTO] = []
         records_to_insert = []
         for record in block_data:
             raw_block: RawBlockfrostCardanoBlockInfo = RawBlockfrostCardanoBlockInfo(**record)
-            dto: CardanoBlocksDTO = CardanoBlocksDTO.from_raw_cardano_blocks(raw_block)
+            dto: CardanoBlocksDTO = CardanoBlocksDTO.construct_from_raw_cardano_blocks(raw_block, created_at)
             dtos.append(dto)
 
         return dtos
 
+    def iter_blocks_from_s3(self, s3_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Generator[list[CardanoBlocksDTO], None, None]:
+        """
+        - stream the specified json or json lines file from s3 using S3Explorer.open_stream, retrying the open
+        - yield CardanoBlocksDTO in lists of up to chunk_size, parsing the file while it is read
+        so memory is bounded by one chunk rather than the file size
+        """
+        # one ingestion timestamp for the whole file
+        created_at: datetime = datetime.utcnow()
+        with closing(open_s3_stream(self._s3_explorer, s3_path)) as stream:
+            for record_batch in batched(iter_json_records(stream, s3_path), chunk_size):
+                yield [
+                    CardanoBlocksDTO.construct_from_raw_cardano_blocks(RawBlockfrostCardanoBlockInfo(**record), created_at)
+                    for record in record_batch
+                ]
+
 
 if __name__ == "__main__":
     load_dotenv()
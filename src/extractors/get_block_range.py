@@ -0,0 +1,138 @@
+import asyncio
+import aiohttp
+from pprint import pprint
+import os
+from typing import Any
+from dotenv import load_dotenv
+
+from src.extractors.get_block import CardanoBlockExtractor
+from src.extractors.blockfrost_session_provider import BlockfrostSessionProvider
+from src.extractors.blockfrost_rate_limiter import BlockfrostRateLimiter, blockfrost_retry, get_default_rate_limiter
+from src.models.blockfrost_models.raw_cardano_blocks import RawBlockfrostCardanoBlockInfo
+from src.utils.concurrency_utils import gather_with_concurrency
+
+# Blockfrost caps /blocks/{hash_or_number}/next at 100 blocks per call
+MAX_BLOCKS_PER_PAGE: int = 100
+
+
+class CardanoBlockRangeExtractor:
+    """
+    Responsible for:
+    - extracting a [start, end] block height range from Blockfrost in pages of up to 100 blocks
+      via /blocks/{hash_or_number}/next, anchored on the block before each page
+    - falling back to per-block calls (CardanoBlockExtractor) for heights missing from a page
+    - validating that the returned range is contiguous: every height present once, each block
+      pointing at the hash of the block before it
+    """
+
+    def __init__(
+        self,
+        session_provider: BlockfrostSessionProvider,
+        block_extractor: CardanoBlockExtractor | None = None,
+        rate_limiter: BlockfrostRateLimiter | None = None,
+        max_concurrency: int = 1,
+    ) -> None:
+        self._session_provider: BlockfrostSessionProvider = session_provider
+        self._rate_limiter: BlockfrostRateLimiter = rate_limiter or get_default_rate_limiter()
+        self._block_extractor: CardanoBlockExtractor = block_extractor or CardanoBlockExtractor(
+            session_provider=self._session_provider, rate_limiter=self._rate_limiter
+        )
+        self._max_concurrency: int = max_concurrency
+
+    @blockfrost_retry
+    async def get_next_blocks(self, block_number: str, count: int = MAX_BLOCKS_PER_PAGE) -> list[RawBlockfrostCardanoBlockInfo]:
+        """
+        returns up to count blocks following block_number, in ascending height order
+        """
+        url: str = f"https://cardano-mainnet.blockfrost.io/api/v0/blocks/{block_number}/next?count={count}"
+
+        headers: dict[str, str] = {"Project_id": os.getenv("BLOCKFROST_PROJECT_ID")}
+
+        await self._rate_limiter.acquire()
+        session: aiohttp.ClientSession = self._session_provider.get_session()
+        async with session.get(url=url, headers=headers) as response:
+            if response.status == 200:
+                data: list[dict[str, Any]] = await response.json()
+                return [RawBlockfrostCardanoBlockInfo.model_validate(block) for block in data]
+            elif response.status == 429:
+                raise self._rate_limiter.rate_limited(response.headers.get("Retry-After"))
+            else:
+                raise Exception(f"Received non-status code 200: {response.status}")
+
+    async def get_block_range(self, start_block_height: int, end_block_height: int) -> list[RawBlockfrostCardanoBlockInfo]:
+        """
+        returns the blocks from start_block_height to end_block_height (both inclusive) in height order
+        """
+        if start_block_height > end_block_height:
+            return []
+
+        page_starts: range = range(start_block_height, end_block_height + 1, MAX_BLOCKS_PER_PAGE)
+        pages: list[list[RawBlockfrostCardanoBlockInfo]] = await gather_with_concurrency(
+            self._max_concurrency,
+            (
+                self._get_page(page_start, min(MAX_BLOCKS_PER_PAGE, end_block_height - page_start + 1))
+                for page_start in page_starts
+            ),
+        )
+
+        blocks_by_height: dict[int, RawBlockfrostCardanoBlockInfo] = {
+            block.height: block
+            for page in pages
+            for block in page
+            if start_block_height <= block.height <= end_block_height
+        }
+        missing_heights: list[int] = [
+            height for height in range(start_block_height, end_block_height + 1) if height not in blocks_by_height
+        ]
+        if missing_heights:
+            print(f"falling back to per-block requests for {len(missing_heights)} block heights")
+            fallback_blocks: list[RawBlockfrostCardanoBlockInfo] = await gather_with_concurrency(
+                self._max_concurrency,
+                (self._block_extractor.get_block(str(height)) for height in missing_heights),
+            )
+            for block in fallback_blocks:
+                blocks_by_height[block.height] = block
+
+        block_infos: list[RawBlockfrostCardanoBlockInfo] = [
+            blocks_by_height[height] for height in range(start_block_height, end_block_height + 1)
+            if height in blocks_by_height
+        ]
+        self._validate_contiguous(block_infos, start_block_height, end_block_height)
+        return block_infos
+
+    async def _get_page(self, page_start: int, count: int) -> list[RawBlockfrostCardanoBlockInfo]:
+        """
+        /next excludes the anchor block itself, so each page is anchored on the block before it;
+        there is no block before the first one, so a page starting at height 0 or below is left to the fallback
+        """
+        if page_start <= 0:
+            return []
+        return await self.get_next_blocks(str(page_start - 1), count)
+
+    @staticmethod
+    def _validate_contiguous(
+        block_infos: list[RawBlockfrostCardanoBlockInfo], start_block_height: int, end_block_height: int
+    ) -> None:
+        expected_heights: list[int] = list(range(start_block_height, end_block_height + 1))
+        heights: list[int] = [block.height for block in block_infos]
+        if heights != expected_heights:
+            missing: list[int] = sorted(set(expected_heights) - set(heights))
+            raise ValueError(f"Block range {start_block_height}-{end_block_height} is not contiguous, missing heights: {missing}")
+        for previous_block, block in zip(block_infos, block_infos[1:]):
+            if block.previous_block != previous_block.hash:
+                raise ValueError(
+                    f"Block {block.height} does not follow block {previous_block.height}: "
+                    f"previous_block {block.previous_block} != {previous_block.hash}"
+                )
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    session_provider: BlockfrostSessionProvider = BlockfrostSessionProvider()
+    extractor: CardanoBlockRangeExtractor = CardanoBlockRangeExtractor(session_provider=session_provider)
+    event_loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+    result: list[RawBlockfrostCardanoBlockInfo] = event_loop.run_until_complete(
+        extractor.get_block_range(4865265, 4865465)
+    )
+    event_loop.run_until_complete(session_provider.close())
+    pprint([block.height for block in result])
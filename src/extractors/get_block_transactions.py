@@ -4,18 +4,22 @@ from pprint import pprint
 import os
 from dotenv import load_dotenv
 
-from tenacity import retry, wait_fixed, stop_after_attempt
+from src.extractors.blockfrost_session_provider import BlockfrostSessionProvider
+from src.extractors.blockfrost_rate_limiter import BlockfrostRateLimiter, blockfrost_retry, get_default_rate_limiter
 from src.models.blockfrost_models.cardano_block_transactions import CardanoBlockTransactions
 
 
 class CardanoBlockTransactionsExtractor:
-    @staticmethod
-    @retry(
-        wait=wait_fixed(0.01),
-        stop=stop_after_attempt(5),
-        reraise=True,
-    )
-    async def get_block_transactions(block_height: str) -> CardanoBlockTransactions:
+    def __init__(
+        self,
+        session_provider: BlockfrostSessionProvider,
+        rate_limiter: BlockfrostRateLimiter | None = None,
+    ) -> None:
+        self._session_provider: BlockfrostSessionProvider = session_provider
+        self._rate_limiter: BlockfrostRateLimiter = rate_limiter or get_default_rate_limiter()
+
+    @blockfrost_retry
+    async def get_block_transactions(self, block_height: str) -> CardanoBlockTransactions:
         """
         Responsible for getting transaction hashes by parsing in the block number
         Blockfrost allows block hash to be passed instead of block number, but we will be sticking to only block number
@@ -24,26 +28,30 @@ class CardanoBlockTransactionsExtractor:
 
         headers: dict[str:str] = {"Project_id": os.getenv("BLOCKFROST_PROJECT_ID")}
 
-        async with aiohttp.ClientSession() as client:
-            async with client.get(url=url, headers=headers) as response:
-                if response.status == 200:
-                    data: list[str] = await response.json()
-                    cardano_block_transaction: CardanoBlockTransactions = CardanoBlockTransactions.from_json(
-                        block_height=block_height,
-                        input=data
-                    )
-                    return cardano_block_transaction
-
-                else:
-                    raise Exception(f"Received non-status code 200: {response.status}")
+        await self._rate_limiter.acquire()
+        session: aiohttp.ClientSession = self._session_provider.get_session()
+        async with session.get(url=url, headers=headers) as response:
+            if response.status == 200:
+                data: list[str] = await response.json()
+                cardano_block_transaction: CardanoBlockTransactions = CardanoBlockTransactions.from_json(
+                    block_height=block_height,
+                    input=data
+                )
+                return cardano_block_transaction
+            elif response.status == 429:
+                raise self._rate_limiter.rate_limited(response.headers.get("Retry-After"))
+            else:
+                raise Exception(f"Received non-status code 200: {response.status}")
 
 
 if __name__ == "__main__":
     load_dotenv()
     block_number: str = "4873401"
+    session_provider: BlockfrostSessionProvider = BlockfrostSessionProvider()
+    extractor: CardanoBlockTransactionsExtractor = CardanoBlockTransactionsExtractor(session_provider=session_provider)
     event_loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
     result: CardanoBlockTransactions = event_loop.run_until_complete(
-        CardanoBlockTransactionsExtractor.get_block_transactions(block_height=block_number)
+        extractor.get_block_transactions(block_height=block_number)
     )
+    event_loop.run_until_complete(session_provider.close())
     pprint(result)
-
@@ -1,8 +1,8 @@
 import io
 import asyncio
-import json
 import os
-from typing import Any
+from contextlib import closing
+from typing import Any, Generator
 import boto3
 from dotenv import load_dotenv
 from pprint import pprint
@@ -11,6 +11,9 @@ from retry import retry
 from src.models.blockfrost_models.cardano_block_transactions import CardanoBlockTransactions
 from src.models.database_transfer_objects.cardano_block_transactions import CardanoBlocksTransactionsDTO
 from src.file_explorer.s3_file_explorer import S3Explorer
+from src.extractors.s3_stream import open_s3_stream
+from src.file_explorer.json_lines import DEFAULT_CHUNK_SIZE, load_json_records, iter_json_records
+from src.utils.iter_utils import batched
 
 
 class CardanoBlockTransactionsS3Extractor:
@@ -34,8 +37,8 @@ class CardanoBlockTransactionsS3Extractor:
         """
         # download JSON file into a BytesIO buffer
         buffer: io.BytesIO = self._s3_explorer.download_to_buffer(s3_path=s3_path)
-        # load JSON content into a list of dict
-        block_tx_data: list[dict[str, Any]] = json.load(buffer)
+        # load the JSON lines or JSON array content into a list of dict
+        block_tx_data: list[dict[str, Any]] = load_json_records(buffer, s3_path)
 
         dtos: list[CardanoBlocksTransactionsDTO] = []
         for record in block_tx_data:
@@ -45,6 +48,19 @@ class CardanoBlockTransactionsS3Extractor:
 
         return dtos
 
+    def iter_block_transactions_from_s3(self, s3_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Generator[list[CardanoBlocksTransactionsDTO], None, None]:
+        """
+        - stream the specified json or json lines file from s3 using S3Explorer.open_stream, retrying the open
+        - yield CardanoBlocksTransactionsDTO in lists of up to chunk_size, parsing the file while it is read
+        so memory is bounded by one chunk rather than the file size
+        """
+        with closing(open_s3_stream(self._s3_explorer, s3_path)) as stream:
+            for record_batch in batched(iter_json_records(stream, s3_path), chunk_size):
+                yield [
+                    CardanoBlocksTransactionsDTO.from_raw_cardano_blocks_tx(input=CardanoBlockTransactions(**record))
+                    for record in record_batch
+                ]
+
 
 if __name__ == "__main__":
     load_dotenv()
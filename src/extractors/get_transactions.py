@@ -5,18 +5,22 @@ import os
 from typing import Any
 from dotenv import load_dotenv
 
-from tenacity import retry, wait_fixed, stop_after_attempt
+from src.extractors.blockfrost_session_provider import BlockfrostSessionProvider
+from src.extractors.blockfrost_rate_limiter import BlockfrostRateLimiter, blockfrost_retry, get_default_rate_limiter
 from src.models.blockfrost_models.raw_cardano_transactions import CardanoTransactions
 
 
 class CardanoTransactionsExtractor:
-    @staticmethod
-    @retry(
-        wait=wait_fixed(0.01),
-        stop=stop_after_attempt(5),
-        reraise=True,
-    )
-    async def get_transaction(tx_hash: str) -> CardanoTransactions:
+    def __init__(
+        self,
+        session_provider: BlockfrostSessionProvider,
+        rate_limiter: BlockfrostRateLimiter | None = None,
+    ) -> None:
+        self._session_provider: BlockfrostSessionProvider = session_provider
+        self._rate_limiter: BlockfrostRateLimiter = rate_limiter or get_default_rate_limiter()
+
+    @blockfrost_retry
+    async def get_transaction(self, tx_hash: str) -> CardanoTransactions:
         """
         Responsible for getting tx details, but only the total output amount transacted
         source: https://docs.blockfrost.io/#tag/cardano--transactions
@@ -26,14 +30,17 @@ class CardanoTransactionsExtractor:
 
         headers: dict[str, str] = {"Project_id": os.getenv("BLOCKFROST_PROJECT_ID")}
 
-        async with aiohttp.ClientSession() as client:
-            async with client.get(url=url, headers=headers) as response:
-                if response.status == 200:
-                    data: dict[str, Any] = await response.json()
-                    cardano_transaction_info: CardanoTransactions = CardanoTransactions.model_validate(data)
-                    return cardano_transaction_info
-                else:
-                    raise Exception(f"Received non-status code 200: {response.status}")
+        await self._rate_limiter.acquire()
+        session: aiohttp.ClientSession = self._session_provider.get_session()
+        async with session.get(url=url, headers=headers) as response:
+            if response.status == 200:
+                data: dict[str, Any] = await response.json()
+                cardano_transaction_info: CardanoTransactions = CardanoTransactions.model_validate(data)
+                return cardano_transaction_info
+            elif response.status == 429:
+                raise self._rate_limiter.rate_limited(response.headers.get("Retry-After"))
+            else:
+                raise Exception(f"Received non-status code 200: {response.status}")
 
 
 if __name__ == "__main__":
@@ -41,8 +48,11 @@ if __name__ == "__main__":
     # sample tx_hash= "f11922f09b7d282a4b368c5bb66cee3c98d75d584783b0252f3074c26befaa52"
     # "8788591983aa73981fc92d6cddbbe643959f5a784e84b8bee0db15823f575a5b"
     tx_hash: str = "f11922f09b7d282a4b368c5bb66cee3c98d75d584783b0252f3074c26befaa52"
+    session_provider: BlockfrostSessionProvider = BlockfrostSessionProvider()
+    extractor: CardanoTransactionsExtractor = CardanoTransactionsExtractor(session_provider=session_provider)
     event_loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
     tx_details: CardanoTransactions = event_loop.run_until_complete(
-        CardanoTransactionsExtractor.get_transaction(tx_hash=tx_hash)
+        extractor.get_transaction(tx_hash=tx_hash)
     )
-    pprint(tx_details)
\ No newline at end of file
+    event_loop.run_until_complete(session_provider.close())
+    pprint(tx_details)
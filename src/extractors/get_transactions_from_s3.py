@@ -1,7 +1,8 @@
 import io
-import json
 import os
-from typing import Any
+from contextlib import closing
+from datetime import datetime
+from typing import Any, Generator
 import boto3
 from dotenv import load_dotenv
 from pprint import pprint
@@ -11,6 +12,9 @@ from src.models.blockfrost_models.raw_cardano_transactions import CardanoTransac
 from src.models.database_transfer_objects.cardano_transactions import CardanoTransactionsDTO
 from src.models.database_transfer_objects.cardano_transactions_output_amount import CardanoTransactionsOutputAmountDTO
 from src.file_explorer.s3_file_explorer import S3Explorer
+from src.extractors.s3_stream import open_s3_stream
+from src.file_explorer.json_lines import DEFAULT_CHUNK_SIZE, load_json_records, iter_json_records
+from src.utils.iter_utils import batched
 
 
 class CardanoTransactionsS3Extractor:
@@ -31,17 +35,34 @@ class CardanoTransactionsS3Extractor:
         """
         # download JSON file into a BytesIO buffer
         buffer: io.BytesIO = self._s3_explorer.download_to_buffer(s3_path=s3_path)
-        # load JSON content into a list of dict
-        tx_data: list[dict[str, Any]] = json.load(buffer)
+        # load the JSON lines or JSON array content into a list of dict
+        tx_data: list[dict[str, Any]] = load_json_records(buffer, s3_path)
 
+        # one ingestion timestamp for the whole file, the raw models are validated so the DTOs are built without revalidation
+        created_at: datetime = datetime.utcnow()
         dtos: list[CardanoTransactionsDTO] = []
         for record in tx_data:
             raw_tx: CardanoTransactions = CardanoTransactions(**record)
-            dto: CardanoTransactionsDTO = CardanoTransactionsDTO.from_raw_cardano_tx(hash=raw_tx.hash,input=raw_tx)
+            dto: CardanoTransactionsDTO = CardanoTransactionsDTO.construct_from_raw_cardano_tx(hash=raw_tx.hash, input=raw_tx, created_at=created_at)
             dtos.append(dto)
 
         return dtos
 
+    def iter_tx_from_s3(self, s3_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Generator[list[CardanoTransactionsDTO], None, None]:
+        """
+        - stream the specified json or json lines file from s3 using S3Explorer.open_stream, retrying the open
+        - yield CardanoTransactionsDTO in lists of up to chunk_size, parsing the file while it is read
+        so memory is bounded by one chunk rather than the file size
+        """
+        # one ingestion timestamp for the whole file
+        created_at: datetime = datetime.utcnow()
+        with closing(open_s3_stream(self._s3_explorer, s3_path)) as stream:
+            for record_batch in batched(iter_json_records(stream, s3_path), chunk_size):
+                yield [
+                    CardanoTransactionsDTO.construct_from_raw_cardano_tx(hash=raw_tx.hash, input=raw_tx, created_at=created_at)
+                    for raw_tx in (CardanoTransactions(**record) for record in record_batch)
+                ]
+
     @retry(
         tries=5,
         delay=0.1,
@@ -56,8 +77,8 @@ class CardanoTransactionsS3Extractor:
         """
         # download JSON file into a BytesIO buffer
         buffer: io.BytesIO = self._s3_explorer.download_to_buffer(s3_path=s3_path)
-        # load JSON content into a list of dict
-        tx_data: list[dict[str, Any]] = json.load(buffer)
+        # load the JSON lines or JSON array content into a list of dict
+        tx_data: list[dict[str, Any]] = load_json_records(buffer, s3_path)
 
         dtos: list[CardanoTransactionsOutputAmountDTO] = []
         for record in tx_data:
@@ -1,7 +1,7 @@
 import io
-import json
 import os
-from typing import Any
+from contextlib import closing
+from typing import Any, Generator
 import boto3
 from dotenv import load_dotenv
 from pprint import pprint
@@ -10,6 +10,9 @@ from retry import retry
 from src.models.blockfrost_models.cardano_transaction_utxo import TransactionUTxO
 from src.models.database_transfer_objects.cardano_transactions_utxo_dto import CardanoTransactionUtxoDTO
 from src.file_explorer.s3_file_explorer import S3Explorer
+from src.extractors.s3_stream import open_s3_stream
+from src.file_explorer.json_lines import DEFAULT_CHUNK_SIZE, load_json_records, iter_json_records
+from src.utils.iter_utils import batched
 
 
 class CardanoTxUtxoS3Extractor:
@@ -30,8 +33,8 @@ class CardanoTxUtxoS3Extractor:
         """
         # download JSON file into a BytesIO buffer
         buffer: io.BytesIO = self._s3_explorer.download_to_buffer(s3_path=s3_path)
-        # load JSON content into a list of dict
-        tx_utxo_data: list[dict[str, Any]] = json.load(buffer)
+        # load the JSON lines or JSON array content into a list of dict
+        tx_utxo_data: list[dict[str, Any]] = load_json_records(buffer, s3_path)
 
         dtos: list[CardanoTransactionUtxoDTO] = []
         for record in tx_utxo_data:
@@ -44,6 +47,29 @@ class CardanoTxUtxoS3Extractor:
 
         return dtos
 
+    def iter_tx_utxo_from_s3(self, s3_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Generator[list[CardanoTransactionUtxoDTO], None, None]:
+        """
+        - stream the specified json or json lines file from s3 using S3Explorer.open_stream, retrying the open
+        - yield CardanoTransactionUtxoDTO in lists of up to chunk_size, parsing the file while it is read
+        so memory is bounded by one chunk rather than the file size
+        """
+        with closing(open_s3_stream(self._s3_explorer, s3_path)) as stream:
+            for record_batch in batched(iter_json_records(stream, s3_path), chunk_size):
+                yield [
+                    CardanoTransactionUtxoDTO.from_raw_cardano_tx_utxo(hash=raw_tx_utxo.hash, input=raw_tx_utxo)
+                    for raw_tx_utxo in (TransactionUTxO(**record) for record in record_batch)
+                ]
+
+    def iter_raw_tx_utxo_from_s3(self, s3_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Generator[list[TransactionUTxO], None, None]:
+        """
+        - stream the specified json or json lines file from s3 using S3Explorer.open_stream, retrying the open
+        - yield validated TransactionUTxO in lists of up to chunk_size, for transformers which build
+        their output straight from the raw models instead of going through CardanoTransactionUtxoDTO
+        """
+        with closing(open_s3_stream(self._s3_explorer, s3_path)) as stream:
+            for record_batch in batched(iter_json_records(stream, s3_path), chunk_size):
+                yield [TransactionUTxO(**record) for record in record_batch]
+
 
 if __name__ == "__main__":
     load_dotenv()
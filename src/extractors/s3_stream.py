@@ -0,0 +1,20 @@
+from typing import BinaryIO
+from retry import retry
+
+from src.file_explorer.s3_file_explorer import S3Explorer
+
+
+@retry(
+    tries=5,
+    delay=0.1,
+    max_delay=0.3375,
+    backoff=1.5,
+    jitter=(-0.01, 0.01),
+)
+def open_s3_stream(s3_explorer: S3Explorer, s3_path: str) -> BinaryIO:
+    """
+    opens s3_path for streaming with S3Explorer.open_stream, retried as the get_*_from_s3 downloads are
+    - only opening the stream is retried: the iter_*_from_s3 readers yield chunks while the stream is read and the
+    caller may have loaded them already, so an error partway through the stream is raised, not replayed from the start
+    """
+    return s3_explorer.open_stream(s3_path)
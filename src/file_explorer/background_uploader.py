@@ -0,0 +1,65 @@
+import asyncio
+from io import BytesIO
+
+import pandas as pd
+from sqlalchemy import Table
+
+from src.file_explorer.transformed_files import encode_transformed_file
+from src.file_explorer.s3_file_explorer import S3Explorer
+
+DEFAULT_MAX_PENDING: int = 4
+
+
+class BackgroundCsvUploader:
+    """
+    Responsible for uploading transformed DataFrames to S3 off the critical path
+    - submit() hands the encoding, CSV or Parquet after the extension of the S3 path, and the upload to a worker thread
+      and returns, so the caller can load the same frame into the DB meanwhile
+    - at most max_pending uploads are in flight, submit() waits for one to finish beyond that, bounding memory
+    - wait() waits for every upload and raises the first error, call it before recording that a batch is done
+    - cancel() drops the uploads still in flight once the load has failed, so none is left unawaited
+    - when disabled, nothing is uploaded
+    """
+    def __init__(self, s3_explorer: S3Explorer, enabled: bool = True, max_pending: int = DEFAULT_MAX_PENDING) -> None:
+        if max_pending < 1:
+            raise ValueError(f"max_pending must be at least 1, got {max_pending}")
+        self._s3_explorer: S3Explorer = s3_explorer
+        self._enabled: bool = enabled
+        self._semaphore: asyncio.Semaphore = asyncio.Semaphore(max_pending)
+        self._tasks: list[asyncio.Task[None]] = []
+
+    async def submit(self, df: pd.DataFrame, s3_path: str, table: Table | None = None) -> None:
+        """
+        table is the one the frame is loaded into, it gives the schema of Parquet files
+        """
+        if not self._enabled:
+            return
+        await self._semaphore.acquire()
+        self._tasks.append(asyncio.create_task(self._upload(df, s3_path, table)))
+
+    async def wait(self) -> None:
+        try:
+            await asyncio.gather(*self._tasks)
+        finally:
+            # a failed upload, or a cancelled wait, drops the other uploads
+            await self.cancel()
+
+    async def cancel(self) -> None:
+        """
+        cancels the uploads not done yet and waits for them to end; an upload already handed to its thread still
+        completes in the background
+        """
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _upload(self, df: pd.DataFrame, s3_path: str, table: Table | None) -> None:
+        try:
+            await asyncio.to_thread(self._upload_file, df, s3_path, table)
+        finally:
+            self._semaphore.release()
+
+    def _upload_file(self, df: pd.DataFrame, s3_path: str, table: Table | None) -> None:
+        buffer: BytesIO = encode_transformed_file(df, table, s3_path)
+        self._s3_explorer.upload_buffer(bytes_io=buffer, source_path=s3_path)
@@ -0,0 +1,148 @@
+"""
+Compression codecs for the S3 objects
+
+The codec of an object is given by the suffix of its key (.gz, .zst), so compressed and plain objects sit side by side
+and every reader decodes them the same way. gzip needs only the standard library, zstd needs the zstandard package,
+a declared dependency; without it zstd is not offered as a CLI choice, and reading a zstd object raises.
+"""
+import gzip
+import io
+import zlib
+from typing import Any, BinaryIO, Protocol
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # type: ignore[assignment]
+
+GZIP: str = "gzip"
+ZSTD: str = "zstd"
+# the key suffix of each codec, objects are compressed or decoded according to the suffix of their key
+CODEC_SUFFIXES: dict[str, str] = {GZIP: ".gz", ZSTD: ".zst"}
+# zstd is only offered when zstandard is installed, so the CLI rejects it up front instead of failing mid run
+CODEC_CHOICES: list[str] = ["none", GZIP, ZSTD] if zstandard is not None else ["none", GZIP]
+# zstd level 3 and gzip level 6 are the default of each library, fast enough to keep up with S3 transfers
+ZSTD_LEVEL: int = 3
+GZIP_LEVEL: int = 6
+
+
+class Compressor(Protocol):
+    def compress(self, data: bytes) -> bytes: ...
+
+    def flush(self) -> bytes: ...
+
+
+def parse_codec(codec: str | None) -> str | None:
+    """
+    returns the codec named by a CLI option, None for "none", raising for an unknown codec or an uninstalled zstandard
+    """
+    if codec is None or codec == "none":
+        return None
+    if codec not in CODEC_SUFFIXES:
+        raise ValueError(f"unknown codec {codec!r}, expected one of {CODEC_CHOICES}")
+    if codec == ZSTD:
+        _require_zstandard()
+    return codec
+
+
+def compressed_extension(extension: str, codec: str | None) -> str:
+    """
+    e.g. compressed_extension("jsonl", "gzip") -> "jsonl.gz", compressed_extension("csv", None) -> "csv"
+    """
+    if codec is None:
+        return extension
+    return f"{extension}{CODEC_SUFFIXES[codec]}"
+
+
+def codec_from_key(key: str, content_encoding: str | None = None) -> str | None:
+    """
+    the codec of an object, from the suffix of its key, else from its Content-Encoding; None for a plain object
+    """
+    for codec, suffix in CODEC_SUFFIXES.items():
+        if key.endswith(suffix):
+            return codec
+    if content_encoding in CODEC_SUFFIXES:
+        return content_encoding
+    return None
+
+
+def strip_codec_suffix(key: str) -> str:
+    """
+    the key without its codec suffix, e.g. to tell a .jsonl.gz file from a .json.gz file
+    """
+    codec: str | None = codec_from_key(key)
+    if codec is None:
+        return key
+    return key[: -len(CODEC_SUFFIXES[codec])]
+
+
+def create_compressor(codec: str) -> Compressor:
+    """
+    an incremental compressor, so records can be compressed as they are written
+    """
+    if codec == GZIP:
+        # wbits 31 writes the gzip header and trailer, readable by gzip.decompress and the gzip command
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return _require_zstandard().ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+
+
+def compress_bytes(data: bytes, codec: str | None) -> bytes:
+    if codec is None:
+        return data
+    compressor: Compressor = create_compressor(codec)
+    return compressor.compress(data) + compressor.flush()
+
+
+def decompress_bytes(data: bytes, codec: str | None) -> bytes:
+    if codec is None:
+        return data
+    if codec == GZIP:
+        return gzip.decompress(data)
+    # stream_reader does not need the content size in the frame header, which streamed frames lack
+    with _require_zstandard().ZstdDecompressor().stream_reader(io.BytesIO(data)) as reader:
+        return reader.read()
+
+
+def open_decompressed_stream(stream: BinaryIO, codec: str | None) -> BinaryIO:
+    """
+    wraps stream so that reads return decoded bytes, decoding while reading; closing the result closes stream
+    """
+    if codec is None:
+        return stream
+    if codec == GZIP:
+        return _DecodedStream(gzip.GzipFile(fileobj=stream, mode="rb"), stream)
+    return _DecodedStream(_require_zstandard().ZstdDecompressor().stream_reader(stream), stream)
+
+
+class _DecodedStream(io.RawIOBase):
+    """
+    reads from a decoder and closes the underlying stream with it, GzipFile leaving a given fileobj open
+    """
+    def __init__(self, decoder: Any, source: BinaryIO) -> None:
+        self._decoder: Any = decoder
+        self._source: BinaryIO = source
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        return self._decoder.read(size)
+
+    def readinto(self, buffer: Any) -> int:
+        data: bytes = self._decoder.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            try:
+                self._decoder.close()
+            finally:
+                self._source.close()
+        super().close()
+
+
+def _require_zstandard() -> Any:
+    if zstandard is None:
+        raise RuntimeError("the zstd codec needs the zstandard package, install it or use gzip")
+    return zstandard
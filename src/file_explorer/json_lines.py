@@ -0,0 +1,201 @@
+import codecs
+import io
+import json
+from types import TracebackType
+from typing import Any, BinaryIO, Generator, Iterable
+from mypy_boto3_s3.client import S3Client
+from mypy_boto3_s3.type_defs import CompletedPartTypeDef
+
+from src.file_explorer.compression import Compressor, create_compressor, strip_codec_suffix
+from src.utils import json_codec
+
+# S3 rejects multipart parts smaller than 5 MiB, except for the last one
+MIN_PART_SIZE: int = 5 * 1024 * 1024
+DEFAULT_PART_SIZE: int = 8 * 1024 * 1024
+DEFAULT_READ_SIZE: int = 1024 * 1024
+# number of records per chunk when the S3 extractors stream a file
+DEFAULT_CHUNK_SIZE: int = 10000
+JSON_LINES_SUFFIX: str = ".jsonl"
+
+
+class S3JsonLinesWriter:
+    """
+    Responsible for:
+    - encoding records one JSON document per line (JSONL) as they are written
+    - pushing the encoded lines to S3 as multipart upload parts of part_size bytes,
+      so at most one part is held in memory whatever the number of records
+    - completing the upload on close, or aborting it if the writer exits with an error
+    - falling back to a single put_object when the whole file fits in one part
+    - compressing the lines as they are written when a codec is given, parts being counted in compressed bytes
+    """
+
+    def __init__(
+        self,
+        client: S3Client,
+        bucket_name: str,
+        s3_path: str,
+        part_size: int = DEFAULT_PART_SIZE,
+        codec: str | None = None,
+    ) -> None:
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"part_size must be at least {MIN_PART_SIZE} bytes, got {part_size}")
+        self._client: S3Client = client
+        self._bucket_name: str = bucket_name
+        self._s3_path: str = s3_path
+        self._part_size: int = part_size
+        self._buffer: bytearray = bytearray()
+        self._upload_id: str | None = None
+        self._parts: list[CompletedPartTypeDef] = []
+        self._compressor: Compressor | None = create_compressor(codec) if codec else None
+        self.records_written: int = 0
+
+    def write(self, record: dict[str, Any]) -> None:
+        line: bytes = json_codec.dumps(record) + b"\n"
+        self._buffer += self._compressor.compress(line) if self._compressor else line
+        self.records_written += 1
+        if len(self._buffer) >= self._part_size:
+            self._upload_part()
+
+    def write_many(self, records: Iterable[dict[str, Any]]) -> None:
+        for record in records:
+            self.write(record)
+
+    def close(self) -> None:
+        if self._compressor is not None:
+            self._buffer += self._compressor.flush()
+        if self._upload_id is None:
+            # everything fit in one part, a plain put is one request instead of three
+            self._client.put_object(Bucket=self._bucket_name, Key=self._s3_path, Body=bytes(self._buffer))
+        else:
+            if self._buffer:
+                self._upload_part()
+            self._client.complete_multipart_upload(
+                Bucket=self._bucket_name,
+                Key=self._s3_path,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts},
+            )
+        self._buffer = bytearray()
+
+    def abort(self) -> None:
+        if self._upload_id is not None:
+            self._client.abort_multipart_upload(Bucket=self._bucket_name, Key=self._s3_path, UploadId=self._upload_id)
+            self._upload_id = None
+        self._buffer = bytearray()
+
+    def __enter__(self) -> "S3JsonLinesWriter":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # leave nothing behind for a half-written file, parts of an abandoned upload are billed until aborted
+            self.abort()
+
+    def _upload_part(self) -> None:
+        if self._upload_id is None:
+            self._upload_id = self._client.create_multipart_upload(Bucket=self._bucket_name, Key=self._s3_path)["UploadId"]
+        part_number: int = len(self._parts) + 1
+        response = self._client.upload_part(
+            Bucket=self._bucket_name,
+            Key=self._s3_path,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=bytes(self._buffer),
+        )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+        self._buffer = bytearray()
+
+
+def load_json_records(buffer: io.BytesIO, s3_path: str) -> list[dict[str, Any]]:
+    """
+    loads the records of a raw file, one per line for .jsonl files and a JSON array for the older .json files,
+    whichever codec suffix follows
+    """
+    if strip_codec_suffix(s3_path).endswith(JSON_LINES_SUFFIX):
+        return [json_codec.loads(line) for line in buffer if line.strip()]
+    return json_codec.load(buffer)
+
+
+def iter_json_records(
+    stream: BinaryIO, s3_path: str, read_size: int = DEFAULT_READ_SIZE
+) -> Generator[dict[str, Any], None, None]:
+    """
+    yields the records of a raw file while it is being read, holding about read_size bytes plus one record in memory
+    - .jsonl files are split by line
+    - the older .json files hold one JSON array, parsed element by element
+    stream yields decoded bytes, see S3Explorer.open_stream
+    """
+    if strip_codec_suffix(s3_path).endswith(JSON_LINES_SUFFIX):
+        yield from _iter_json_lines(stream, read_size)
+    else:
+        yield from _iter_json_array(stream, read_size)
+
+
+def _iter_json_lines(stream: BinaryIO, read_size: int) -> Generator[dict[str, Any], None, None]:
+    remainder: bytes = b""
+    while chunk := stream.read(read_size):
+        lines: list[bytes] = (remainder + chunk).split(b"\n")
+        # the last piece may be a line cut in half by the read, it is completed by the next chunk
+        remainder = lines.pop()
+        for line in lines:
+            if line.strip():
+                yield json_codec.loads(line)
+    if remainder.strip():
+        yield json_codec.loads(remainder)
+
+
+def _iter_json_array(stream: BinaryIO, read_size: int) -> Generator[dict[str, Any], None, None]:
+    decoder: json.JSONDecoder = json.JSONDecoder()
+    utf8_decoder: codecs.IncrementalDecoder = codecs.getincrementaldecoder("utf-8")()
+    text: str = ""
+    position: int = 0
+    eof: bool = False
+    opened: bool = False
+
+    def read_more() -> bool:
+        nonlocal text, position, eof
+        chunk: bytes = stream.read(read_size)
+        eof = not chunk
+        # drop what has been parsed already, so the window never holds more than one read and one record
+        text = text[position:] + utf8_decoder.decode(chunk, final=eof)
+        position = 0
+        return not eof
+
+    while True:
+        # skip whitespace and the separators between elements
+        while position < len(text) and text[position] in " \t\r\n,":
+            position += 1
+        if position == len(text):
+            if eof:
+                raise ValueError("Unexpected end of JSON array")
+            read_more()
+            continue
+        if not opened:
+            if text[position] != "[":
+                raise ValueError(f"Expected a JSON array, found {text[position]!r}")
+            opened = True
+            position += 1
+            continue
+        if text[position] == "]":
+            return
+        try:
+            record, end = decoder.raw_decode(text, position)
+        except json.JSONDecodeError:
+            # the record is cut by the end of the window, read on and decode it again
+            if eof:
+                raise
+            read_more()
+            continue
+        if end == len(text) and not eof:
+            # a scalar at the end of the window may continue in the next read
+            read_more()
+            continue
+        position = end
+        yield record
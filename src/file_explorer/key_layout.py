@@ -0,0 +1,98 @@
+import re
+
+# the widest block range one object may cover, which bounds how far before a requested range listing has to start
+MAX_HEIGHT_RANGE_WIDTH: int = 10_000
+# wide enough for any block height, so keys sort in height order
+HEIGHT_DIGITS: int = 10
+PART_DIGITS: int = 5
+
+_HEIGHT_RANGE_PATTERN: re.Pattern[str] = re.compile(r"/height=(\d+)-(\d+)/")
+_PART_PATTERN: re.Pattern[str] = re.compile(r"/height=\d+-\d+/part-(\d+)[-.]")
+
+
+def height_range_prefix(dataset: str, stage: str) -> str:
+    """
+    e.g. height_range_prefix("transaction_utxo", "transformed/utxo_input") -> "cardano/transaction_utxo/transformed/utxo_input/"
+    """
+    return f"cardano/{dataset}/{stage}/"
+
+
+def height_range_key(
+    dataset: str, stage: str, start_height: int, end_height: int, part: int = 0, extension: str = "jsonl"
+) -> str:
+    """
+    key of part N of the objects holding blocks start_height to end_height, both included
+    e.g. cardano/blocks/raw/height=0011292700-0011293699/part-00000.jsonl
+    The heights and part are zero padded, so keys sort by start height, then part, and S3 can start a listing at a height
+    """
+    return _height_range_key_under(height_range_prefix(dataset, stage), start_height, end_height, part, extension)
+
+
+def height_range_start_after(s3_path_prefix: str, start_height: int) -> str:
+    """
+    the StartAfter key from which a listing of s3_path_prefix reaches every object that can hold start_height or later
+    """
+    lowest_start: int = max(start_height - MAX_HEIGHT_RANGE_WIDTH + 1, 0)
+    # a key starting at lowest_start is longer than this string, hence sorts after it
+    return f"{s3_path_prefix.rstrip('/')}/height={lowest_start:0{HEIGHT_DIGITS}d}"
+
+
+def parse_height_range(key: str) -> tuple[int, int] | None:
+    """
+    returns the block range of a key in the height range layout, None for keys written before it
+    """
+    match: re.Match[str] | None = _HEIGHT_RANGE_PATTERN.search(key)
+    if match is None:
+        return None
+    return int(match.group(1)), int(match.group(2))
+
+
+def height_range_dir(s3_path_prefix: str, start_height: int, end_height: int) -> str:
+    """
+    the prefix every part of the objects holding blocks start_height to end_height shares
+    e.g. cardano/blocks/raw/height=0011292700-0011293699/
+    """
+    _validate_height_range(start_height, end_height)
+    return f"{s3_path_prefix.rstrip('/')}/height={start_height:0{HEIGHT_DIGITS}d}-{end_height:0{HEIGHT_DIGITS}d}/"
+
+
+def parse_part(key: str) -> int | None:
+    """
+    returns the part number of a key in the height range layout, None for keys written before it
+    """
+    match: re.Match[str] | None = _PART_PATTERN.search(key)
+    if match is None:
+        return None
+    return int(match.group(1))
+
+
+def derived_key(source_key: str, s3_path_prefix: str, part: int, extension: str) -> str | None:
+    """
+    key of part N of an object under s3_path_prefix derived from source_key over the same block range, e.g. a transformed
+    file from a raw file; None when source_key predates the height range layout
+    - a source part other than 0, e.g. the subset written by a rerun of the range, prefixes the part, so the objects
+    derived from different parts of the same range never share a key
+    """
+    height_range: tuple[int, int] | None = parse_height_range(source_key)
+    if height_range is None:
+        return None
+    source_part: int = parse_part(source_key) or 0
+    if source_part == 0:
+        return _height_range_key_under(s3_path_prefix, height_range[0], height_range[1], part, extension)
+    return (
+        f"{height_range_dir(s3_path_prefix, height_range[0], height_range[1])}"
+        f"part-{source_part:0{PART_DIGITS}d}-{part:0{PART_DIGITS}d}.{extension}"
+    )
+
+
+def _height_range_key_under(s3_path_prefix: str, start_height: int, end_height: int, part: int, extension: str) -> str:
+    return f"{height_range_dir(s3_path_prefix, start_height, end_height)}part-{part:0{PART_DIGITS}d}.{extension}"
+
+
+def _validate_height_range(start_height: int, end_height: int) -> None:
+    if start_height < 0 or end_height < start_height:
+        raise ValueError(f"invalid height range {start_height}-{end_height}")
+    if end_height - start_height + 1 > MAX_HEIGHT_RANGE_WIDTH:
+        raise ValueError(
+            f"height range {start_height}-{end_height} is wider than {MAX_HEIGHT_RANGE_WIDTH} blocks, split it"
+        )
@@ -1,5 +1,9 @@
+import asyncio
 import io
-from typing import Generator
+from collections import deque
+from contextlib import closing
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncGenerator, BinaryIO, Generator, Iterable, Iterator
 from datetime import datetime, timezone
 import boto3
 from dotenv import load_dotenv
@@ -7,26 +11,127 @@ import os
 from mypy_boto3_s3.client import S3Client
 from mypy_boto3_s3.paginator import ListObjectsV2Paginator
 
+from src.file_explorer.compression import codec_from_key, compress_bytes, decompress_bytes, open_decompressed_stream
+from src.file_explorer.json_lines import S3JsonLinesWriter, DEFAULT_PART_SIZE
+from src.file_explorer.key_layout import height_range_dir, height_range_start_after, parse_height_range, parse_part
 from src.models.file_info.file_info import FileInfo
 
 
+# boto3 keeps 10 connections per client by default, the workers stay below that
+DEFAULT_MAX_WORKERS: int = 8
+DEFAULT_READ_AHEAD: int = 4
+
+
 class S3Explorer:
-    def __init__(self, bucket_name: str, client: S3Client) -> None:
+    """
+    Responsible for reading and writing the objects of one bucket
+    - the *_many methods and prefetch() run the boto3 calls on a thread pool, boto3 clients being thread safe,
+      so several objects transfer at once and async callers keep the event loop free
+    - objects whose key ends with a codec suffix (.gz, .zst) are compressed on upload and decoded on download,
+      callers always see the plain bytes
+    """
+    def __init__(self, bucket_name: str, client: S3Client, max_workers: int = DEFAULT_MAX_WORKERS) -> None:
         self.bucket_name: str = bucket_name
         self._client: S3Client = client
+        self._max_workers: int = max_workers
+        self._executor: ThreadPoolExecutor | None = None
 
     def upload_buffer(self, bytes_io: io.BytesIO, source_path: str) -> None:
         bytes_io.seek(0)
+        codec: str | None = codec_from_key(source_path)
+        if codec is not None:
+            bytes_io = io.BytesIO(compress_bytes(bytes_io.getvalue(), codec))
         self._client.upload_fileobj(bytes_io, self.bucket_name, source_path)
 
+    def open_json_lines_writer(self, s3_path: str, part_size: int = DEFAULT_PART_SIZE) -> S3JsonLinesWriter:
+        """
+        returns a writer streaming records to s3_path as JSON lines through multipart upload,
+        to be used as a context manager so the upload is completed or aborted; compressed per the suffix of s3_path
+        """
+        return S3JsonLinesWriter(
+            client=self._client,
+            bucket_name=self.bucket_name,
+            s3_path=s3_path,
+            part_size=part_size,
+            codec=codec_from_key(s3_path),
+        )
+
     def download_to_buffer(self, s3_path: str) -> io.BytesIO:
         """
         downloads file from s3_path into a file buffer
+        - decoded per the suffix of s3_path or else the object's Content-Encoding, as open_stream does
+        - one GET request, whose response carries the Content-Encoding, rather than a HEAD request besides the download
         """
-        buffer: io.BytesIO = io.BytesIO()
-        self._client.download_fileobj(self.bucket_name, s3_path, buffer)
-        buffer.seek(0)
-        return buffer
+        response = self._client.get_object(Bucket=self.bucket_name, Key=s3_path)
+        with closing(response["Body"]) as body:
+            data: bytes = body.read()
+        return io.BytesIO(decompress_bytes(data, codec_from_key(s3_path, response.get("ContentEncoding"))))
+
+    def upload_many(self, uploads: Iterable[tuple[io.BytesIO, str]]) -> None:
+        """
+        uploads (buffer, s3 path) pairs concurrently, raising the first error once all uploads have ended
+        """
+        futures = [
+            self._get_executor().submit(self.upload_buffer, bytes_io, source_path) for bytes_io, source_path in uploads
+        ]
+        for future in futures:
+            future.result()
+
+    async def prefetch(
+        self, file_infos: Iterable[FileInfo], read_ahead: int = DEFAULT_READ_AHEAD
+    ) -> AsyncGenerator[tuple[FileInfo, io.BytesIO], None]:
+        """
+        yields each file with its downloaded buffer in listing order, while the next read_ahead files download in
+        the background, so the caller transforms or copies one file as the following ones arrive
+        """
+        if read_ahead < 1:
+            raise ValueError(f"read_ahead must be at least 1, got {read_ahead}")
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        remaining: Iterator[FileInfo] = iter(file_infos)
+        pending: deque[tuple[FileInfo, asyncio.Future[io.BytesIO]]] = deque()
+
+        def download_next() -> None:
+            file_info: FileInfo | None = next(remaining, None)
+            if file_info is not None:
+                pending.append(
+                    (file_info, loop.run_in_executor(self._get_executor(), self.download_to_buffer, file_info.file_path))
+                )
+
+        try:
+            for _ in range(read_ahead):
+                download_next()
+            while pending:
+                file_info, download = pending.popleft()
+                buffer: io.BytesIO = await download
+                download_next()
+                yield file_info, buffer
+        finally:
+            # the caller stopped early or failed, the downloads not started yet are dropped
+            for _, download in pending:
+                download.cancel()
+
+    def close(self) -> None:
+        """
+        stops the transfer threads, for the end of a run
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="s3-transfer")
+        return self._executor
+
+    def open_stream(self, s3_path: str) -> BinaryIO:
+        """
+        opens s3_path for reading without downloading it first, the caller reads it in chunks and closes it
+        - reads return decoded bytes, the codec coming from the suffix of s3_path or else the object's Content-Encoding
+        """
+        response = self._client.get_object(Bucket=self.bucket_name, Key=s3_path)
+        return open_decompressed_stream(
+            response["Body"], codec_from_key(s3_path, response.get("ContentEncoding"))
+        )
 
     def list_files(
         self, s3_path_prefix: str, last_modified_date: datetime
@@ -47,9 +152,79 @@ class S3Explorer:
                     )
                     if converted_modified_date>last_modified_date:
                         yield FileInfo(
-                            file_path=obj["Key"], modified_date=converted_modified_date
+                            file_path=obj["Key"],
+                            modified_date=converted_modified_date,
+                            etag=obj["ETag"].strip('"'),
+                            size=obj["Size"],
                         )
 
+    def list_files_after(
+        self, s3_path_prefix: str, start_after: str | None
+    ) -> Generator[FileInfo, None, None]:
+        """
+        list the files under a given s3 path prefix whose key sorts after start_after, S3 skipping the earlier keys
+        itself, so listing only pages through new files as long as keys are written in sort order
+        """
+        paginator: ListObjectsV2Paginator = self._client.get_paginator(
+            "list_objects_v2"
+        )
+        pages = (
+            paginator.paginate(Bucket=self.bucket_name, Prefix=s3_path_prefix, StartAfter=start_after)
+            if start_after
+            else paginator.paginate(Bucket=self.bucket_name, Prefix=s3_path_prefix)
+        )
+        for page in pages:
+            for obj in page.get("Contents", []):
+                yield FileInfo(
+                    file_path=obj["Key"],
+                    modified_date=obj["LastModified"].astimezone(timezone.utc).replace(tzinfo=None),
+                    etag=obj["ETag"].strip('"'),
+                    size=obj["Size"],
+                )
+
+    def list_files_in_height_range(
+        self, s3_path_prefix: str, start_height: int, end_height: int
+    ) -> Generator[FileInfo, None, None]:
+        """
+        list the files of a prefix in the height range key layout whose block range overlaps start_height to end_height
+        - S3 starts the listing MAX_HEIGHT_RANGE_WIDTH blocks before start_height, the widest range an object may cover
+        - the listing stops at the first object starting after end_height, keys being sorted by start height
+        """
+        height_prefix: str = f"{s3_path_prefix.rstrip('/')}/height="
+        paginator: ListObjectsV2Paginator = self._client.get_paginator(
+            "list_objects_v2"
+        )
+        for page in paginator.paginate(
+            Bucket=self.bucket_name,
+            Prefix=height_prefix,
+            StartAfter=height_range_start_after(s3_path_prefix, start_height),
+        ):
+            for obj in page.get("Contents", []):
+                height_range: tuple[int, int] | None = parse_height_range(obj["Key"])
+                if height_range is None:
+                    continue
+                if height_range[0] > end_height:
+                    return
+                if height_range[1] >= start_height:
+                    yield FileInfo(
+                        file_path=obj["Key"],
+                        modified_date=obj["LastModified"].astimezone(timezone.utc).replace(tzinfo=None),
+                        etag=obj["ETag"].strip('"'),
+                        size=obj["Size"],
+                    )
+
+    def next_height_range_part(self, s3_path_prefix: str, start_height: int, end_height: int) -> int:
+        """
+        the first part number no object holding start_height to end_height under s3_path_prefix uses yet,
+        so a rerun of a range adds a part next to the objects of the earlier runs instead of overwriting them
+        """
+        parts: list[int] = [
+            part
+            for file_info in self.list_files_after(height_range_dir(s3_path_prefix, start_height, end_height), None)
+            if (part := parse_part(file_info.file_path)) is not None
+        ]
+        return max(parts, default=-1) + 1
+
 
 if __name__ == "__main__":
     load_dotenv()
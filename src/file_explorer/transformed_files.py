@@ -0,0 +1,154 @@
+"""
+Files of the transformed S3 layer, csv or Parquet
+
+A transformed file is written as Parquet when its key ends with .parquet, as CSV otherwise. The Parquet schema is
+derived from the SQLAlchemy table the file is loaded into, so the files keep their types (lists, Decimal quantities,
+timestamps) instead of being re-parsed from text, and readers can load only the columns they need.
+
+pyarrow is an optional dependency, the parquet extra: without it the transformed layer stays CSV, and reading or
+writing a Parquet file raises.
+"""
+import io
+from decimal import Decimal
+from typing import Any
+
+import pandas as pd
+from sqlalchemy import Table, Boolean, DateTime, Integer, Numeric, UUID
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from src.file_explorer.compression import compressed_extension, strip_codec_suffix
+from src.utils.typed_records import df_to_copy_records
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None  # type: ignore[assignment]
+
+CSV: str = "csv"
+PARQUET: str = "parquet"
+TRANSFORMED_FORMATS: list[str] = [CSV, PARQUET]
+# every Parquet file starts with these 4 bytes
+PARQUET_MAGIC: bytes = b"PAR1"
+# Parquet compresses each column itself, the codec of the S3 key does not apply
+PARQUET_COMPRESSION: str = "zstd"
+
+
+def parse_transformed_format(transformed_format: str) -> str:
+    """
+    returns the format named by a CLI option, raising for an unknown format or Parquet without pyarrow
+    """
+    if transformed_format not in TRANSFORMED_FORMATS:
+        raise ValueError(f"unknown transformed format {transformed_format!r}, expected one of {TRANSFORMED_FORMATS}")
+    if transformed_format == PARQUET:
+        _require_pyarrow()
+    return transformed_format
+
+
+def transformed_extension(transformed_format: str, codec: str | None) -> str:
+    """
+    e.g. transformed_extension("csv", "gzip") -> "csv.gz", transformed_extension("parquet", "gzip") -> "parquet"
+    """
+    if transformed_format == PARQUET:
+        return PARQUET
+    return compressed_extension(CSV, codec)
+
+
+def arrow_schema(table: Table) -> Any:
+    """
+    the Parquet schema of table's columns, in the table's order
+    - UUID columns are stored as their canonical string, which every Parquet reader understands
+    - Numeric columns keep their precision and scale as decimals
+    """
+    return _require_pyarrow().schema(
+        [pyarrow.field(column.name, _arrow_type(column.type), nullable=column.nullable) for column in table.columns]
+    )
+
+
+def df_to_parquet_buffer(df: pd.DataFrame, table: Table) -> io.BytesIO:
+    """
+    encodes a transformed DataFrame holding table's columns as a Parquet file
+    the values are coerced after the column types first, like for a binary COPY
+    """
+    schema = arrow_schema(table)
+    records: list[tuple[Any, ...]] = df_to_copy_records(df, table)
+    columns: list[list[Any]] = [list(values) for values in zip(*records)] if records else [[] for _ in table.columns]
+    arrays: list[Any] = [
+        pyarrow.array(_to_arrow_values(values, field.type), type=field.type)
+        for values, field in zip(columns, schema)
+    ]
+    buffer: io.BytesIO = io.BytesIO()
+    pyarrow.parquet.write_table(
+        pyarrow.Table.from_arrays(arrays, schema=schema), buffer, compression=PARQUET_COMPRESSION
+    )
+    buffer.seek(0)
+    return buffer
+
+
+def encode_transformed_file(df: pd.DataFrame, table: Table | None, s3_path: str) -> io.BytesIO:
+    """
+    encodes a transformed DataFrame in the format given by the extension of s3_path, Parquet or CSV
+    the Parquet schema comes from table, CSV files need none
+    """
+    if strip_codec_suffix(s3_path).endswith(f".{PARQUET}"):
+        if table is None:
+            raise ValueError(f"{s3_path} is a Parquet file, its table is needed for the schema")
+        return df_to_parquet_buffer(df, table)
+    csv_buffer: io.BytesIO = io.BytesIO()
+    df.to_csv(csv_buffer, index=False)
+    csv_buffer.seek(0)
+    return csv_buffer
+
+
+def is_parquet(data_buffer: io.BytesIO) -> bool:
+    return bytes(data_buffer.getbuffer()[:len(PARQUET_MAGIC)]) == PARQUET_MAGIC
+
+
+def read_parquet_columns(data_buffer: io.BytesIO, columns: list[str]) -> list[list[Any]]:
+    """
+    reads the given columns of a transformed Parquet file, and no other, as one list of Python values per column
+    """
+    data_buffer.seek(0)
+    arrow_table = _require_pyarrow().parquet.read_table(data_buffer, columns=columns)
+    return [arrow_table.column(name).to_pylist() for name in columns]
+
+
+def read_parquet_df(data_buffer: io.BytesIO, columns: list[str] | None = None) -> pd.DataFrame:
+    """
+    reads a transformed Parquet file into a DataFrame, only the given columns when columns is set
+    """
+    data_buffer.seek(0)
+    return _require_pyarrow().parquet.read_table(data_buffer, columns=columns).to_pandas()
+
+
+def _arrow_type(column_type: Any) -> Any:
+    if isinstance(column_type, UUID):
+        return pyarrow.string()
+    if isinstance(column_type, Numeric):
+        return pyarrow.decimal128(column_type.precision or 38, column_type.scale or 0)
+    if isinstance(column_type, Integer):
+        return pyarrow.int64()
+    if isinstance(column_type, Boolean):
+        return pyarrow.bool_()
+    if isinstance(column_type, DateTime):
+        return pyarrow.timestamp("us")
+    if isinstance(column_type, ARRAY):
+        return pyarrow.list_(pyarrow.string())
+    return pyarrow.string()
+
+
+def _to_arrow_values(values: list[Any], arrow_type: Any) -> list[Any]:
+    if pyarrow.types.is_string(arrow_type):
+        # UUIDs, the only non-str values of string columns
+        return [None if value is None else str(value) for value in values]
+    if pyarrow.types.is_decimal(arrow_type):
+        # quantize to the column's scale, pyarrow rejects a Decimal with more digits after the point
+        exponent: Decimal = Decimal(1).scaleb(-arrow_type.scale)
+        return [None if value is None else value.quantize(exponent) for value in values]
+    return values
+
+
+def _require_pyarrow() -> Any:
+    if pyarrow is None:
+        raise RuntimeError("Parquet files need the pyarrow package, install it or keep the csv transformed format")
+    return pyarrow
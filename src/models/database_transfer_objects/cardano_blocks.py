@@ -51,4 +51,33 @@ class CardanoBlocksDTO(BaseModel):
             next_block=input.next_block,
             confirmations=input.confirmations,
             created_at=datetime.utcnow(),
-        )
\ No newline at end of file
+        )
+
+    @staticmethod
+    def construct_from_raw_cardano_blocks(
+            input: RawBlockfrostCardanoBlockInfo, created_at: datetime | None = None
+    ) -> "CardanoBlocksDTO":
+        """
+        builds the same DTO as from_raw_cardano_blocks with model_construct, without validating it again,
+        input must already be a validated RawBlockfrostCardanoBlockInfo; pass one created_at for a whole batch
+        """
+        return CardanoBlocksDTO.model_construct(
+            time=datetime.utcfromtimestamp(input.time),
+            height=input.height,
+            hash=input.hash,
+            slot=input.slot,
+            epoch=input.epoch,
+            epoch_slot=input.epoch_slot,
+            slot_leader=input.slot_leader,
+            size=input.size,
+            tx_count=input.tx_count,
+            output=input.output,
+            fees=input.fees,
+            block_vrf=input.block_vrf,
+            op_cert=input.op_cert,
+            op_cert_counter=input.op_cert_counter,
+            previous_block=input.previous_block,
+            next_block=input.next_block,
+            confirmations=input.confirmations,
+            created_at=created_at or datetime.utcnow(),
+        )
@@ -59,4 +59,37 @@ class CardanoTransactionsDTO(BaseModel):
             withdrawal_count=input.withdrawal_count,
             asset_mint_or_burn_count=input.asset_mint_or_burn_count,
             created_at=datetime.utcnow()
-        )
\ No newline at end of file
+        )
+
+    @staticmethod
+    def construct_from_raw_cardano_tx(
+        hash: str, input: CardanoTransactions, created_at: datetime | None = None
+    ) -> "CardanoTransactionsDTO":
+        """
+        builds the same DTO as from_raw_cardano_tx with model_construct, without validating it again,
+        input must already be a validated CardanoTransactions; pass one created_at for a whole batch
+        """
+        return CardanoTransactionsDTO.model_construct(
+            hash=input.hash,
+            block=input.block,
+            block_height=input.block_height,
+            block_time=datetime.utcfromtimestamp(input.block_time),
+            delegation_count=input.delegation_count,
+            deposit=input.deposit,
+            fees=input.fees,
+            index=input.index,
+            invalid_before=input.invalid_before,
+            invalid_hereafter=input.invalid_hereafter,
+            mir_cert_count=input.mir_cert_count,
+            pool_retire_count=input.pool_retire_count,
+            pool_update_count=input.pool_update_count,
+            redeemer_count=input.redeemer_count,
+            size=input.size,
+            slot=input.slot,
+            stake_cert_count=input.stake_cert_count,
+            utxo_count=input.utxo_count,
+            valid_contract=input.valid_contract,
+            withdrawal_count=input.withdrawal_count,
+            asset_mint_or_burn_count=input.asset_mint_or_burn_count,
+            created_at=created_at or datetime.utcnow(),
+        )
@@ -0,0 +1,29 @@
+from datetime import datetime
+from pydantic import BaseModel
+
+from src.models.file_info.file_info import FileInfo
+
+
+class S3ProcessedObjectDTO(BaseModel):
+    key: str
+    etag: str | None
+    size: int | None
+    rows: int
+    loaded_at: datetime
+
+    @staticmethod
+    def create_processed_object(file_info: FileInfo, rows: int) -> "S3ProcessedObjectDTO":
+        return S3ProcessedObjectDTO(
+            key=file_info.file_path,
+            etag=file_info.etag,
+            size=file_info.size,
+            rows=rows,
+            loaded_at=datetime.utcnow(),
+        )
+
+    @staticmethod
+    def create_pending_object(key: str, rows: int) -> "S3ProcessedObjectDTO":
+        """
+        a transformed file loaded from memory while it is still uploading, so without etag or size yet
+        """
+        return S3ProcessedObjectDTO(key=key, etag=None, size=None, rows=rows, loaded_at=datetime.utcnow())
@@ -5,8 +5,10 @@ from pydantic import BaseModel
 
 class FileInfo(BaseModel):
     """
-    Represents a S3 file with its path and modified date
+    Represents a S3 file with its path and modified date, and its etag and size in bytes when listed from S3
     """
 
     file_path: str
     modified_date: datetime
+    etag: str | None = None
+    size: int | None = None
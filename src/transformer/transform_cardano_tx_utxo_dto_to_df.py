@@ -1,101 +1,142 @@
 import pandas as pd
 import logging
 from typing import Any
+import uuid
 from uuid import UUID
 from datetime import datetime
+from decimal import Decimal
 from pprint import pprint
 from src.utils.logging_utils import setup_logging
 from pathlib import Path
+from src.models.blockfrost_models.cardano_transaction_utxo import TransactionUTxO
 from src.models.database_transfer_objects.cardano_transactions_utxo_dto import CardanoTransactionUtxoDTO, CardanoTxUtxoInputDTO, CardanoTxUtxoOutputDTO, TxAmountDTO
 
 logger = logging.getLogger(__name__)
 setup_logging(logger)
 
 
+# column order of the five frames, matching the cardano_tx_utxo* tables
+UTXO_COLUMNS: tuple[str, ...] = ("hash", "created_at")
+INPUT_COLUMNS: tuple[str, ...] = (
+    "id", "hash", "address", "tx_utxo_hash", "output_index", "data_hash", "inline_datum",
+    "reference_script_hash", "collateral", "reference", "created_at",
+)
+OUTPUT_COLUMNS: tuple[str, ...] = (
+    "id", "hash", "address", "output_index", "data_hash", "inline_datum",
+    "reference_script_hash", "collateral", "consumed_by_tx", "created_at",
+)
+AMOUNT_COLUMNS: tuple[str, ...] = ("id", "parent_id", "unit", "quantity", "created_at")
+
+
 class TransformCardanoTxUtxoDTOToDf:
     """
     Responsible for transforming a list of cardano_tx_utxo_dto into a pandas DataFrame
     , so that it can be converted to BytesIO outside of this class
+    - values are appended column by column, one list per column, instead of building a dict per row
+    - transform_raw fills the same columns straight from validated TransactionUTxO models, skipping the DTOs
     """
     @staticmethod
     def transform(cardano_tx_utxo_dto_list: list[CardanoTransactionUtxoDTO]) -> dict[str, pd.DataFrame]:
-        utxo_list: list[dict[str, Any]] = []
-        input_list: list[dict[str, Any]] = []
-        input_amount_list: list[dict[str, Any]] = []
-        output_list: list[dict[str, Any]] = []
-        output_amount_list: list[dict[str, Any]] = []
+        utxo = _Columns(UTXO_COLUMNS)
+        inputs = _Columns(INPUT_COLUMNS)
+        input_amounts = _Columns(AMOUNT_COLUMNS)
+        outputs = _Columns(OUTPUT_COLUMNS)
+        output_amounts = _Columns(AMOUNT_COLUMNS)
 
         for dto in cardano_tx_utxo_dto_list:
-            utxo_list.append(
-                {"hash": dto.hash, "created_at": dto.created_at}
-            )
+            utxo.append(dto.hash, dto.created_at)
             for inp in dto.inputs:
-                input_list.append(
-                    {
-                        "id": inp.id,
-                        "hash": inp.hash,
-                        "address": inp.address,
-                        "tx_utxo_hash": inp.tx_utxo_hash,
-                        "output_index": inp.output_index,
-                        "data_hash": inp.data_hash,
-                        "inline_datum": inp.inline_datum,
-                        "reference_script_hash": inp.reference_script_hash,
-                        "collateral": inp.collateral,
-                        "reference": inp.reference,
-                        "created_at": inp.created_at,
-                    }
+                inputs.append(
+                    inp.id, inp.hash, inp.address, inp.tx_utxo_hash, inp.output_index, inp.data_hash,
+                    inp.inline_datum, inp.reference_script_hash, inp.collateral, inp.reference, inp.created_at,
                 )
                 for amt in inp.amounts:
-                    input_amount_list.append(
-                        {
-                            "id": amt.id,
-                            "parent_id": inp.id,
-                            "unit": amt.unit,
-                            "quantity": amt.quantity,
-                            "created_at": amt.created_at,
-                        }
-                    )
+                    input_amounts.append(amt.id, inp.id, amt.unit, amt.quantity, amt.created_at)
 
             for out in dto.outputs:
-                output_list.append(
-                    {
-                        "id": out.id,
-                        "hash": out.hash,
-                        "address": out.address,
-                        "output_index": out.output_index,
-                        "data_hash": out.data_hash,
-                        "inline_datum": out.inline_datum,
-                        "reference_script_hash": out.reference_script_hash,
-                        "collateral": out.collateral,
-                        "consumed_by_tx": out.consumed_by_tx,
-                        "created_at": out.created_at,
-                    }
+                outputs.append(
+                    out.id, out.hash, out.address, out.output_index, out.data_hash, out.inline_datum,
+                    out.reference_script_hash, out.collateral, out.consumed_by_tx, out.created_at,
                 )
                 for amt in out.amounts:
-                    output_amount_list.append(
-                        {
-                            "id": amt.id,
-                            "parent_id": out.id,
-                            "unit": amt.unit,
-                            "quantity": amt.quantity,
-                            "created_at": amt.created_at,
-                        }
-                    )
-
-        dfs = {
-            "cardano_tx_utxo": pd.DataFrame.from_records(utxo_list),
-            "cardano_tx_utxo_input": pd.DataFrame.from_records(input_list),
-            "cardano_tx_utxo_input_amt": pd.DataFrame.from_records(input_amount_list),
-            "cardano_tx_utxo_output": pd.DataFrame.from_records(output_list),
-            "cardano_tx_utxo_output_amt": pd.DataFrame.from_records(output_amount_list),
-        }
-
-        for name, df in dfs.items():
-            if not df.empty:
-                df["created_at"] = pd.to_datetime(df["created_at"], utc=True)
-            logger.info("%s → %d rows", name, len(df))
-
-        return dfs
+                    output_amounts.append(amt.id, out.id, amt.unit, amt.quantity, amt.created_at)
+
+        return _to_frames(utxo, inputs, input_amounts, outputs, output_amounts)
+
+    @staticmethod
+    def transform_raw(tx_utxo_list: list[TransactionUTxO], created_at: datetime | None = None) -> dict[str, pd.DataFrame]:
+        """
+        returns the same frames as transform(from_raw_cardano_tx_utxo(...) for each tx utxo) with one created_at,
+        generating ids in the same order, without building the intermediate DTOs
+        """
+        created_at = created_at or datetime.utcnow()
+        utxo = _Columns(UTXO_COLUMNS)
+        inputs = _Columns(INPUT_COLUMNS)
+        input_amounts = _Columns(AMOUNT_COLUMNS)
+        outputs = _Columns(OUTPUT_COLUMNS)
+        output_amounts = _Columns(AMOUNT_COLUMNS)
+
+        for tx_utxo in tx_utxo_list:
+            tx_hash: str = tx_utxo.hash
+            utxo.append(tx_hash, created_at)
+            for inp in tx_utxo.inputs:
+                input_id: uuid.UUID = uuid.uuid4()
+                inputs.append(
+                    input_id, tx_hash, inp.address, inp.tx_hash, inp.output_index, inp.data_hash,
+                    inp.inline_datum, inp.reference_script_hash, inp.collateral, None, created_at,
+                )
+                for amt in inp.amount:
+                    input_amounts.append(uuid.uuid4(), input_id, amt.unit, Decimal(amt.quantity), created_at)
+
+            for out in tx_utxo.outputs:
+                output_id: uuid.UUID = uuid.uuid4()
+                outputs.append(
+                    output_id, tx_hash, out.address, out.output_index, out.data_hash, out.inline_datum,
+                    out.reference_script_hash, out.collateral, out.consumed_by_tx, created_at,
+                )
+                for amt in out.amount:
+                    output_amounts.append(uuid.uuid4(), output_id, amt.unit, Decimal(amt.quantity), created_at)
+
+        return _to_frames(utxo, inputs, input_amounts, outputs, output_amounts)
+
+
+class _Columns:
+    """
+    one list per column, filled a row at a time in column order
+    """
+    def __init__(self, names: tuple[str, ...]) -> None:
+        self.names: tuple[str, ...] = names
+        self.values: list[list[Any]] = [[] for _ in names]
+        self._appenders = [column.append for column in self.values]
+
+    def append(self, *row: Any) -> None:
+        for append, value in zip(self._appenders, row):
+            append(value)
+
+    def to_frame(self) -> pd.DataFrame:
+        if not self.values[0]:
+            # no rows and no columns, as the row based version returned
+            return pd.DataFrame.from_records([])
+        return pd.DataFrame(dict(zip(self.names, self.values)))
+
+
+def _to_frames(
+    utxo: _Columns, inputs: _Columns, input_amounts: _Columns, outputs: _Columns, output_amounts: _Columns
+) -> dict[str, pd.DataFrame]:
+    dfs = {
+        "cardano_tx_utxo": utxo.to_frame(),
+        "cardano_tx_utxo_input": inputs.to_frame(),
+        "cardano_tx_utxo_input_amt": input_amounts.to_frame(),
+        "cardano_tx_utxo_output": outputs.to_frame(),
+        "cardano_tx_utxo_output_amt": output_amounts.to_frame(),
+    }
+
+    for name, df in dfs.items():
+        if not df.empty:
+            df["created_at"] = pd.to_datetime(df["created_at"], utc=True)
+        logger.info("%s → %d rows", name, len(df))
+
+    return dfs
 
 
 if __name__ == "__main__":
@@ -0,0 +1,21 @@
+import asyncio
+from typing import Awaitable, Iterable, TypeVar
+
+T = TypeVar("T")
+
+
+async def gather_with_concurrency(limit: int, awaitables: Iterable[Awaitable[T]]) -> list[T]:
+    """
+    Responsible for awaiting every awaitable with at most `limit` of them in flight at any one time
+    - results are returned in the same order as the input, exactly like asyncio.gather
+    - the first exception raised is propagated to the caller
+    """
+    if limit < 1:
+        raise ValueError(f"limit must be at least 1, got {limit}")
+    semaphore: asyncio.Semaphore = asyncio.Semaphore(limit)
+
+    async def run_with_semaphore(awaitable: Awaitable[T]) -> T:
+        async with semaphore:
+            return await awaitable
+
+    return await asyncio.gather(*(run_with_semaphore(awaitable) for awaitable in awaitables))
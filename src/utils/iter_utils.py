@@ -0,0 +1,15 @@
+from itertools import islice
+from typing import Generator, Iterable, TypeVar
+
+T = TypeVar("T")
+
+
+def batched(iterable: Iterable[T], size: int) -> Generator[list[T], None, None]:
+    """
+    yields lists of up to size items from iterable, pulling only one list's worth at a time
+    """
+    if size < 1:
+        raise ValueError(f"size must be at least 1, got {size}")
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
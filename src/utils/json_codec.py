@@ -0,0 +1,55 @@
+"""
+JSON codec for the raw provider payloads
+
+orjson is a declared dependency; the stdlib json module stays as a fallback for environments without it. The
+stdlib encoder is configured to match orjson's output (compact separators, UTF-8 instead of \\u escapes), so both
+produce the same bytes for the same records and a file can be written by either and read by either.
+
+The output differs from the plain json.dumps the provider pipelines used before, e.g. [{"a":1,"b":"é"}] instead of
+[{"a": 1, "b": "\\u00e9"}]. Files already in S3 keep their bytes and decode to the same records; only newly written
+files change.
+"""
+import io
+import json
+import re
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+
+CODEC_NAME: str = "orjson" if orjson is not None else "json"
+
+# any integer outside orjson's 64 bit range has at least 20 digits; runs inside strings only cost the faster path
+_WIDE_INTEGER_PATTERN = re.compile(rb"\d{20}")
+
+
+def dumps(obj: Any) -> bytes:
+    """
+    encodes obj to compact UTF-8 JSON bytes
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            # orjson rejects integers wider than 64 bits, which the stdlib encodes as is
+            pass
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def loads(data: bytes | str) -> Any:
+    """
+    decodes JSON bytes or text
+    - orjson silently turns integers wider than 64 bits into floats, so payloads that may hold one are decoded
+    with the stdlib, which keeps them exact
+    """
+    if orjson is not None:
+        raw: bytes = data.encode("utf-8") if isinstance(data, str) else data
+        if _WIDE_INTEGER_PATTERN.search(raw) is None:
+            return orjson.loads(raw)
+    return json.loads(data)
+
+
+def load(buffer: io.BytesIO) -> Any:
+    return loads(buffer.read())
@@ -0,0 +1,138 @@
+"""
+Rows converted to Python values typed after the SQLAlchemy column types of a table
+
+Shared by the binary COPY of the DAOs, which streams the values to Postgres without any text to parse, and by the
+Parquet files of the transformed S3 layer, whose typed columns come from the same values.
+"""
+import ast
+import math
+import uuid
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Callable, Iterable, Sequence
+
+import pandas as pd
+from sqlalchemy import Table, Boolean, DateTime, Integer, Numeric, UUID
+from sqlalchemy.dialects.postgresql import ARRAY
+
+Converter = Callable[[Any], Any]
+
+_TRUE_VALUES: frozenset[str] = frozenset({"true", "t", "1", "yes", "y"})
+
+
+def _is_null(value: Any) -> bool:
+    if value is None or value is pd.NaT:
+        return True
+    if isinstance(value, str):
+        # the transformed CSV files write None as an empty field, which a text COPY loads as NULL
+        return value == ""
+    return isinstance(value, float) and math.isnan(value)
+
+
+def _to_uuid(value: Any) -> uuid.UUID:
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def _to_decimal(value: Any) -> Decimal:
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def _to_int(value: Any) -> int:
+    if isinstance(value, str):
+        # an integer column holding nulls is written by pandas as floats, e.g. "5.0"
+        return int(Decimal(value))
+    return int(value)
+
+
+def _to_bool(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.strip().lower() in _TRUE_VALUES
+    return bool(value)
+
+
+def _to_datetime(value: Any) -> datetime:
+    """
+    timestamps are stored without time zone: aware values are converted to UTC, and the offset dropped,
+    like Postgres does when it reads '2025-05-02 00:00:00+00:00' into a timestamp column
+    """
+    if isinstance(value, pd.Timestamp):
+        value = value.to_pydatetime()
+    elif isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            value = pd.Timestamp(value).to_pydatetime()
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _to_text_array(value: Any) -> list[str]:
+    if isinstance(value, str):
+        if value.startswith("{"):
+            # Postgres array literal
+            return [item for item in value.strip("{}").split(",") if item]
+        # a list written to CSV by pandas is its Python repr, e.g. "['a', 'b']"
+        return list(ast.literal_eval(value))
+    return list(value)
+
+
+def _to_str(value: Any) -> str:
+    return value if isinstance(value, str) else str(value)
+
+
+def _converter_for(column_type: Any) -> Converter:
+    if isinstance(column_type, UUID):
+        return _to_uuid
+    if isinstance(column_type, Numeric):
+        return _to_decimal
+    if isinstance(column_type, Integer):
+        return _to_int
+    if isinstance(column_type, Boolean):
+        return _to_bool
+    if isinstance(column_type, DateTime):
+        return _to_datetime
+    if isinstance(column_type, ARRAY):
+        return _to_text_array
+    return _to_str
+
+
+def column_converters(table: Table) -> list[Converter]:
+    """
+    one converter per column of table, in the table's column order
+    """
+    return [_converter_for(column.type) for column in table.columns]
+
+
+def to_copy_records(rows: Iterable[Sequence[Any]], table: Table) -> list[tuple[Any, ...]]:
+    """
+    converts rows holding the table's columns in order into records typed for a binary COPY
+    - null-like values (None, NaN, NaT, empty strings) become None
+    - other values are coerced after the column type: UUID, Decimal, int, bool, naive UTC datetime, list of str, str
+    """
+    converters: list[Converter] = column_converters(table)
+    return [
+        tuple(None if _is_null(value) else convert(value) for convert, value in zip(converters, row))
+        for row in rows
+    ]
+
+
+def df_to_copy_records(df: pd.DataFrame, table: Table) -> list[tuple[Any, ...]]:
+    """
+    converts a transformed DataFrame to binary COPY records, selecting the columns in the table's order
+    """
+    missing: set[str] = {column.name for column in table.columns} - set(df.columns)
+    if missing:
+        raise ValueError(f"DataFrame is missing required column(s): {', '.join(sorted(missing))}")
+    columns: list[str] = [column.name for column in table.columns]
+    return to_copy_records(df[columns].itertuples(index=False, name=None), table)
+
+
+def columns_to_copy_records(columns: dict[str, Sequence[Any]], table: Table) -> list[tuple[Any, ...]]:
+    """
+    converts column arrays, one sequence per column name, to binary COPY records
+    """
+    missing: set[str] = {column.name for column in table.columns} - set(columns)
+    if missing:
+        raise ValueError(f"Columns are missing required column(s): {', '.join(sorted(missing))}")
+    return to_copy_records(zip(*(columns[column.name] for column in table.columns)), table)
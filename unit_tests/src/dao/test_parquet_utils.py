@@ -0,0 +1,91 @@
+import io
+import uuid
+import pytest
+import pandas as pd
+from datetime import datetime
+from decimal import Decimal
+
+from database_management.cardano.cardano_tables import (
+    cardano_block_transactions_table,
+    cardano_tx_utxo_output_amount_table,
+)
+from src.dao.parquet_utils import transformed_file_to_copy_records
+from src.file_explorer import transformed_files
+from src.file_explorer.transformed_files import (
+    encode_transformed_file,
+    is_parquet,
+    parse_transformed_format,
+    transformed_extension,
+)
+from src.utils.typed_records import df_to_copy_records
+
+
+class TestParquetUtils:
+    @pytest.fixture
+    def block_tx_df(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            "block": ["100", "101"],
+            "tx_hash": [["a", "b"], []],
+            "created_at": [datetime(2025, 5, 2), datetime(2025, 5, 2, 0, 0, 1)],
+        })
+
+    @pytest.fixture
+    def amounts_df(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            "id": [uuid.UUID(int=5)],
+            "parent_id": [uuid.UUID(int=6)],
+            "unit": ["lovelace"],
+            "quantity": [Decimal("45000000000000000000")],
+            "created_at": [datetime(2025, 5, 2)],
+        })
+
+    def test_csv_keys(self, block_tx_df: pd.DataFrame) -> None:
+        """
+        GIVEN a transformed DataFrame and a csv key
+        WHEN it is encoded and read back as COPY records
+        THEN I expect a csv file whose records match the DataFrame's
+        """
+        buffer: io.BytesIO = encode_transformed_file(block_tx_df, None, "transformed/part-00000.csv.gz")
+
+        assert not is_parquet(buffer)
+        assert buffer.getvalue().startswith(b"block,tx_hash,created_at\n")
+        assert transformed_file_to_copy_records(buffer, cardano_block_transactions_table) == df_to_copy_records(
+            block_tx_df, cardano_block_transactions_table
+        )
+        assert transformed_extension("csv", "gzip") == "csv.gz"
+        assert transformed_extension("parquet", "gzip") == "parquet"
+
+    def test_parquet_round_trip(self, block_tx_df: pd.DataFrame, amounts_df: pd.DataFrame) -> None:
+        """
+        GIVEN transformed DataFrames with lists, UUIDs, 20 digit quantities and timestamps
+        WHEN they are encoded under a .parquet key and read back as COPY records
+        THEN I expect Parquet files holding typed columns, and the same records as the DataFrames'
+        """
+        pyarrow = pytest.importorskip("pyarrow")
+        for df, table in [
+            (block_tx_df, cardano_block_transactions_table),
+            (amounts_df, cardano_tx_utxo_output_amount_table),
+        ]:
+            buffer: io.BytesIO = encode_transformed_file(df, table, "transformed/part-00000.parquet")
+
+            assert is_parquet(buffer)
+            assert transformed_file_to_copy_records(buffer, table) == df_to_copy_records(df, table)
+
+        schema = transformed_files.arrow_schema(cardano_tx_utxo_output_amount_table)
+        assert schema.field("quantity").type == pyarrow.decimal128(38, 0)
+        assert schema.field("id").type == pyarrow.string()
+        assert transformed_files.read_parquet_df(buffer, columns=["unit"]).to_dict("list") == {"unit": ["lovelace"]}
+
+    def test_parquet_without_pyarrow(self, monkeypatch: pytest.MonkeyPatch, block_tx_df: pd.DataFrame) -> None:
+        """
+        GIVEN pyarrow is not installed
+        WHEN the parquet format is selected, or a DataFrame encoded under a .parquet key
+        THEN I expect an error naming the missing package
+        """
+        monkeypatch.setattr(transformed_files, "pyarrow", None)
+
+        with pytest.raises(RuntimeError, match="pyarrow"):
+            parse_transformed_format("parquet")
+        with pytest.raises(RuntimeError, match="pyarrow"):
+            encode_transformed_file(block_tx_df, cardano_block_transactions_table, "transformed/part-00000.parquet")
+        assert parse_transformed_format("csv") == "csv"
@@ -0,0 +1,121 @@
+import asyncio
+import pytest
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+from src.dao.table_load_scheduler import TableLoadScheduler
+
+
+class FakeConnection:
+    def __init__(self, name: str) -> None:
+        self.name: str = name
+
+
+class FakeEngine:
+    """
+    hands out one named connection per begin(), and records when each transaction commits or rolls back
+    """
+    def __init__(self, failing_commit: str | None = None) -> None:
+        self.events: list[str] = []
+        self._opened: int = 0
+        self._failing_commit: str | None = failing_commit
+
+    @asynccontextmanager
+    async def begin(self) -> AsyncIterator[FakeConnection]:
+        connection: FakeConnection = FakeConnection(f"conn{self._opened}")
+        self._opened += 1
+        try:
+            yield connection
+        except BaseException:
+            self.events.append(f"rollback {connection.name}")
+            raise
+        if connection.name == self._failing_commit:
+            self.events.append(f"rollback {connection.name}")
+            raise ConnectionError(f"commit of {connection.name} failed")
+        self.events.append(f"commit {connection.name}")
+
+
+class TestTableLoadScheduler:
+    @pytest.mark.asyncio
+    async def test_chains_load_concurrently_and_commit_before_the_status(self) -> None:
+        """
+        GIVEN two chains whose first loads each wait for the other chain to have started
+        WHEN the scheduler runs them
+        THEN the chains run concurrently on their own connections, loads of a chain keep their order,
+        and the status is written and committed after every chain has committed
+        """
+        engine: FakeEngine = FakeEngine()
+        scheduler: TableLoadScheduler = TableLoadScheduler(engine)  # type: ignore[arg-type]
+        started: dict[str, asyncio.Event] = {"input": asyncio.Event(), "output": asyncio.Event()}
+        loads: list[tuple[str, str]] = []
+
+        def load(table: str, wait_for: str | None = None) -> Any:
+            async def run(connection: FakeConnection) -> None:
+                if table in started:
+                    started[table].set()
+                if wait_for is not None:
+                    # deadlocks, and times out, if the chains run one after the other
+                    await asyncio.wait_for(started[wait_for].wait(), timeout=1)
+                loads.append((table, connection.name))
+            return run
+
+        await scheduler.run(
+            chains=[
+                [load("input", wait_for="output"), load("input_amount")],
+                [load("output", wait_for="input"), load("output_amount")],
+            ],
+            status_write=load("status"),
+        )
+
+        assert loads.index(("input", "conn1")) < loads.index(("input_amount", "conn1"))
+        assert loads.index(("output", "conn2")) < loads.index(("output_amount", "conn2"))
+        assert loads[-1] == ("status", "conn0")
+        assert engine.events == ["commit conn2", "commit conn1", "commit conn0"]
+
+    @pytest.mark.asyncio
+    async def test_failing_chain_rolls_back_every_chain(self) -> None:
+        """
+        GIVEN a chain whose load raises while another chain is still loading
+        WHEN the scheduler runs them
+        THEN the other chain is cancelled, every transaction is rolled back, the status is not written
+        and the original error is raised
+        """
+        engine: FakeEngine = FakeEngine()
+        scheduler: TableLoadScheduler = TableLoadScheduler(engine)  # type: ignore[arg-type]
+        status_written: list[bool] = []
+
+        async def failing_load(connection: FakeConnection) -> None:
+            raise ValueError("CSV is missing required column(s): id")
+
+        async def slow_load(connection: FakeConnection) -> None:
+            await asyncio.sleep(10)
+
+        async def status_write(connection: FakeConnection) -> None:
+            status_written.append(True)
+
+        with pytest.raises(ValueError, match="missing required column"):
+            await asyncio.wait_for(
+                scheduler.run(chains=[[failing_load], [slow_load]], status_write=status_write), timeout=1
+            )
+
+        assert not status_written
+        assert sorted(engine.events) == ["rollback conn0", "rollback conn1", "rollback conn2"]
+
+    @pytest.mark.asyncio
+    async def test_failing_commit_keeps_earlier_chains_and_rolls_back_the_status(self) -> None:
+        """
+        GIVEN two chains that load, and a commit failing for the chain committed second
+        WHEN the scheduler runs them
+        THEN the chain committed first stays committed, as the chains do not share a commit,
+        while the status is rolled back so the next run loads the batch again
+        """
+        engine: FakeEngine = FakeEngine(failing_commit="conn1")
+        scheduler: TableLoadScheduler = TableLoadScheduler(engine)  # type: ignore[arg-type]
+
+        async def load(connection: FakeConnection) -> None:
+            pass
+
+        with pytest.raises(ConnectionError, match="commit of conn1 failed"):
+            await scheduler.run(chains=[[load], [load]], status_write=load)
+
+        assert engine.events == ["commit conn2", "rollback conn1", "rollback conn0"]
@@ -0,0 +1,82 @@
+from typing import Generator
+from unittest.mock import MagicMock
+
+import boto3
+import pytest
+from moto import mock_aws
+from mypy_boto3_s3 import Client
+
+from src.file_explorer.key_layout import height_range_key, height_range_prefix
+from src.etl_pipelines.processed_object_lister import ProcessedObjectLister
+from src.file_explorer.s3_file_explorer import S3Explorer
+
+
+class FakeProcessedObjectDAO:
+    def __init__(self, processed_keys: set[str]) -> None:
+        self._processed_keys: set[str] = processed_keys
+
+    async def read_processed_keys(self, keys: list[str]) -> set[str]:
+        return {key for key in keys if key in self._processed_keys}
+
+    async def read_max_processed_key(self, key_prefix: str) -> str | None:
+        return max((key for key in self._processed_keys if key.startswith(key_prefix)), default=None)
+
+
+class TestProcessedObjectLister:
+    @pytest.fixture
+    def s3_explorer(self) -> Generator[S3Explorer, None, None]:
+        with mock_aws():
+            client: Client = boto3.client("s3", region_name="us-east-1")
+            client.create_bucket(Bucket="cardano")
+            for key in ["raw/1/a.jsonl", "raw/2/a.jsonl", "raw/3/a.jsonl"]:
+                client.put_object(Bucket="cardano", Key=key, Body=b"{}")
+            yield S3Explorer(bucket_name="cardano", client=client)
+
+    @pytest.mark.asyncio
+    async def test_lists_files_after_watermark(self, s3_explorer: S3Explorer) -> None:
+        """
+        GIVEN a prefix whose second file is the greatest key in the ledger
+        WHEN the new files are listed without a block range
+        THEN S3 starts the listing after that key, and only the third file is returned
+        """
+        lister: ProcessedObjectLister = ProcessedObjectLister(s3_explorer, FakeProcessedObjectDAO({"raw/2/a.jsonl"}))  # type: ignore[arg-type]
+        list_files_after: MagicMock = MagicMock(wraps=s3_explorer.list_files_after)
+        s3_explorer.list_files_after = list_files_after  # type: ignore[method-assign]
+
+        file_infos = await lister.list_new_files("raw/")
+
+        assert [file_info.file_path for file_info in file_infos] == ["raw/3/a.jsonl"]
+        list_files_after.assert_called_once_with("raw/", "raw/2/a.jsonl")
+
+    @pytest.mark.asyncio
+    async def test_lists_everything_without_ledger(self, s3_explorer: S3Explorer) -> None:
+        """
+        GIVEN a prefix with nothing in the ledger
+        WHEN the new files are listed
+        THEN every file of the prefix is returned
+        """
+        lister: ProcessedObjectLister = ProcessedObjectLister(s3_explorer, FakeProcessedObjectDAO(set()))  # type: ignore[arg-type]
+
+        assert len(list(await lister.list_new_files("raw/"))) == 3
+
+    @pytest.mark.asyncio
+    async def test_lists_new_files_of_height_range(self) -> None:
+        """
+        GIVEN raw files for blocks 0-999, 1000-1999 and 2000-2999, the second one in the ledger and the first one
+        backfilled after it was loaded
+        WHEN the new files of blocks 0 to 1999 are listed
+        THEN only the backfilled file is returned, the loaded one and the one past the range being left out
+        """
+        with mock_aws():
+            client: Client = boto3.client("s3", region_name="us-east-1")
+            client.create_bucket(Bucket="cardano")
+            keys: list[str] = [height_range_key("blocks", "raw", start, start+999) for start in [0, 1000, 2000]]
+            for key in keys:
+                client.put_object(Bucket="cardano", Key=key, Body=b"{}")
+            lister: ProcessedObjectLister = ProcessedObjectLister(
+                S3Explorer(bucket_name="cardano", client=client), FakeProcessedObjectDAO({keys[1]})  # type: ignore[arg-type]
+            )
+
+            file_infos = await lister.list_new_files(height_range_prefix("blocks", "raw"), 0, 1999)
+
+            assert [file_info.file_path for file_info in file_infos] == [keys[0]]
@@ -0,0 +1,119 @@
+import asyncio
+import pytest
+
+from src.etl_pipelines.windowed_stage_pipeline import WindowStage, WindowedStagePipeline, block_windows
+
+
+class TestWindowedStagePipeline:
+    @pytest.mark.asyncio
+    async def test_stages_overlap_and_keep_window_order(self) -> None:
+        """
+        GIVEN a provider stage and a DB stage, the DB stage waiting until the provider has started the next window
+        WHEN the pipeline runs 3 windows
+        THEN I expect the provider to fetch window N+1 while the DB loads window N,
+        and every window to be loaded only after it was fetched, in window order
+        """
+        events: list[str] = []
+        provider_started: dict[int, asyncio.Event] = {start: asyncio.Event() for start in [1, 11, 21, 31]}
+
+        async def provider(start_block_height: int, end_block_height: int) -> None:
+            provider_started[start_block_height].set()
+            events.append(f"fetch {start_block_height}-{end_block_height}")
+
+        async def db_load(start_block_height: int, end_block_height: int) -> None:
+            if start_block_height < 21:
+                # would never return if the stages ran one after another
+                await asyncio.wait_for(provider_started[start_block_height+10].wait(), timeout=1)
+            events.append(f"load {start_block_height}-{end_block_height}")
+
+        await WindowedStagePipeline(
+            stages=[WindowStage("provider", provider), WindowStage("db_load", db_load, depends_on=["provider"])],
+            window_size=10,
+        ).run(1, 25)
+
+        assert [event for event in events if event.startswith("load")] == ["load 1-10", "load 11-20", "load 21-25"]
+        for start, end in [(1, 10), (11, 20), (21, 25)]:
+            assert events.index(f"fetch {start}-{end}") < events.index(f"load {start}-{end}")
+        assert list(block_windows(1, 25, 10)) == [(1, 10), (11, 20), (21, 25)]
+
+    @pytest.mark.asyncio
+    async def test_error_cancels_the_other_stages(self) -> None:
+        """
+        GIVEN a DB stage failing on its first window
+        WHEN the pipeline runs
+        THEN I expect the stage's error to be raised, and the provider to stop within windows_ahead windows
+        """
+        fetched: list[int] = []
+
+        async def provider(start_block_height: int, end_block_height: int) -> None:
+            fetched.append(start_block_height)
+            await asyncio.sleep(0)
+
+        async def db_load(start_block_height: int, end_block_height: int) -> None:
+            await asyncio.sleep(0.01)
+            raise RuntimeError("copy failed")
+
+        with pytest.raises(RuntimeError, match="copy failed"):
+            await WindowedStagePipeline(
+                stages=[WindowStage("provider", provider), WindowStage("db_load", db_load, depends_on=["provider"])],
+                window_size=10,
+                windows_ahead=1,
+            ).run(1, 1000)
+
+        assert len(fetched) <= 3
+
+    @pytest.mark.asyncio
+    async def test_independent_stages_run_concurrently(self) -> None:
+        """
+        GIVEN blocks and block_tx fetches taking 50ms a window, each followed by a load depending only on it
+        WHEN the pipeline runs 2 windows
+        THEN I expect both fetches of a window to run at the same time, finishing in about half the sequential time,
+        and every load to follow its own fetch
+        """
+        events: list[str] = []
+        in_flight: int = 0
+        peak_in_flight: int = 0
+
+        def stage(name: str, duration: float):
+            async def run(start_block_height: int, end_block_height: int) -> None:
+                nonlocal in_flight, peak_in_flight
+                in_flight += 1
+                peak_in_flight = max(peak_in_flight, in_flight)
+                await asyncio.sleep(duration)
+                in_flight -= 1
+                events.append(f"{name} {start_block_height}")
+            return run
+
+        loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        started: float = loop.time()
+        await WindowedStagePipeline(
+            stages=[
+                WindowStage("blocks_to_s3", stage("blocks_to_s3", 0.05)),
+                WindowStage("blocks_s3_to_db", stage("blocks_s3_to_db", 0), depends_on=["blocks_to_s3"]),
+                WindowStage("block_tx_to_s3", stage("block_tx_to_s3", 0.05)),
+                WindowStage("block_tx_s3_to_db", stage("block_tx_s3_to_db", 0), depends_on=["block_tx_to_s3"]),
+            ],
+            window_size=10,
+        ).run(1, 20)
+
+        assert loop.time()-started < 0.18
+        assert peak_in_flight >= 2
+        for fetch, load in [("blocks_to_s3", "blocks_s3_to_db"), ("block_tx_to_s3", "block_tx_s3_to_db")]:
+            for start in [1, 11]:
+                assert events.index(f"{fetch} {start}") < events.index(f"{load} {start}")
+
+    def test_dependencies_are_declared_first(self) -> None:
+        """
+        GIVEN a stage depending on a stage declared after it, or on itself
+        WHEN the pipeline is created
+        THEN I expect an error naming the missing dependency
+        """
+        async def noop(start_block_height: int, end_block_height: int) -> None:
+            return None
+
+        with pytest.raises(ValueError, match="load"):
+            WindowedStagePipeline(
+                stages=[WindowStage("fetch", noop, depends_on=["load"]), WindowStage("load", noop)], window_size=10
+            )
+        with pytest.raises(ValueError, match="fetch"):
+            WindowedStagePipeline(stages=[WindowStage("fetch", noop, depends_on=["fetch"])], window_size=10)
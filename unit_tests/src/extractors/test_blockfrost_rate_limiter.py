@@ -0,0 +1,162 @@
+import time
+import pytest
+from typing import Any
+from unittest.mock import MagicMock
+
+from src.extractors.blockfrost_rate_limiter import (
+    MAX_ATTEMPTS,
+    MAX_FAILED_ATTEMPTS,
+    BlockfrostRateLimiter,
+    BlockfrostRateLimitError,
+)
+from src.extractors.get_tx_utxo import CardanoTxUtxoExtractor
+from src.models.blockfrost_models.cardano_transaction_utxo import TransactionUTxO
+
+
+class FakeResponse:
+    def __init__(self, status: int, data: Any = None, headers: dict[str, str] | None = None) -> None:
+        self.status: int = status
+        self.headers: dict[str, str] = headers or {}
+        self._data: Any = data
+
+    async def json(self) -> Any:
+        return self._data
+
+    async def __aenter__(self) -> "FakeResponse":
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        return None
+
+
+class FakeSession:
+    """
+    returns the queued responses in order, one per get call
+    """
+    def __init__(self, responses: list[FakeResponse]) -> None:
+        self._responses: list[FakeResponse] = responses
+        self.calls: int = 0
+
+    def get(self, url: str, headers: dict[str, str]) -> FakeResponse:
+        response: FakeResponse = self._responses[self.calls]
+        self.calls += 1
+        return response
+
+
+class TestBlockfrostRateLimiter:
+    """
+    test the token bucket and the 429 pause shared by the Blockfrost extractors
+    Prepare: BlockfrostRateLimiter with a small burst and rate
+    Act: acquire tokens, pause the limiter, and run an extractor against a session answering 429
+    Assert: the burst is served immediately, later calls are throttled, and 429s pause and retry
+    """
+
+    @pytest.mark.asyncio
+    async def test_burst_then_sustained_rate(self) -> None:
+        """
+        GIVEN a limiter with a burst of 5 and a rate of 50 per second
+        WHEN 10 tokens are acquired
+        THEN the first 5 are immediate and the other 5 take about 5 / 50 seconds
+        """
+        rate_limiter: BlockfrostRateLimiter = BlockfrostRateLimiter(rate_per_second=50, burst=5)
+        start: float = time.monotonic()
+        for _ in range(5):
+            await rate_limiter.acquire()
+        assert time.monotonic() - start < 0.05
+        for _ in range(5):
+            await rate_limiter.acquire()
+        assert time.monotonic() - start >= 0.09
+
+    @pytest.mark.asyncio
+    async def test_pause_blocks_every_caller(self) -> None:
+        """
+        GIVEN a limiter with plenty of tokens
+        WHEN it is paused for 0.1 seconds
+        THEN the next acquire waits for the pause to end
+        """
+        rate_limiter: BlockfrostRateLimiter = BlockfrostRateLimiter(rate_per_second=1000, burst=100)
+        rate_limiter.pause(0.1)
+        start: float = time.monotonic()
+        await rate_limiter.acquire()
+        assert time.monotonic() - start >= 0.09
+
+    def test_parse_retry_after(self) -> None:
+        """
+        GIVEN Retry-After header values in seconds, as garbage, or missing
+        WHEN parse_retry_after is invoked
+        THEN the number of seconds is returned, falling back to the default
+        """
+        assert BlockfrostRateLimiter.parse_retry_after("3") == 3.0
+        assert BlockfrostRateLimiter.parse_retry_after("not a date", default=2.0) == 2.0
+        assert BlockfrostRateLimiter.parse_retry_after(None) == 1.0
+
+    @pytest.mark.asyncio
+    async def test_extractor_retries_after_429(self) -> None:
+        """
+        GIVEN a session that answers 429 with Retry-After: 0 and then 200
+        WHEN CardanoTxUtxoExtractor.get_tx_utxo is invoked
+        THEN the limiter is paused, the request is retried and the UTXO is returned
+        """
+        tx_utxo_data: dict[str, Any] = {"hash": "abc", "inputs": [], "outputs": []}
+        session: FakeSession = FakeSession(
+            [FakeResponse(429, headers={"Retry-After": "0"}), FakeResponse(200, data=tx_utxo_data)]
+        )
+        session_provider: MagicMock = MagicMock()
+        session_provider.get_session.return_value = session
+        rate_limiter: BlockfrostRateLimiter = BlockfrostRateLimiter(rate_per_second=1000, burst=10)
+        extractor: CardanoTxUtxoExtractor = CardanoTxUtxoExtractor(
+            session_provider=session_provider, rate_limiter=rate_limiter
+        )
+
+        result: TransactionUTxO = await extractor.get_tx_utxo(tx_hash="abc")
+
+        assert result == TransactionUTxO.model_validate(tx_utxo_data)
+        assert session.calls == 2
+
+    @staticmethod
+    def extractor_for(session: FakeSession) -> CardanoTxUtxoExtractor:
+        session_provider: MagicMock = MagicMock()
+        session_provider.get_session.return_value = session
+        return CardanoTxUtxoExtractor(
+            session_provider=session_provider, rate_limiter=BlockfrostRateLimiter(rate_per_second=10000, burst=10)
+        )
+
+    @pytest.mark.asyncio
+    async def test_429s_stop_after_max_attempts(self) -> None:
+        """
+        GIVEN a session that always answers 429
+        WHEN CardanoTxUtxoExtractor.get_tx_utxo is invoked
+        THEN it gives up with BlockfrostRateLimitError after MAX_ATTEMPTS requests in total
+        """
+        session: FakeSession = FakeSession(
+            [FakeResponse(429, headers={"Retry-After": "0"}) for _ in range(MAX_ATTEMPTS * 5)]
+        )
+
+        with pytest.raises(BlockfrostRateLimitError):
+            await self.extractor_for(session).get_tx_utxo(tx_hash="abc")
+
+        assert session.calls == MAX_ATTEMPTS
+
+    @pytest.mark.asyncio
+    async def test_other_failures_stop_after_max_failed_attempts(self) -> None:
+        """
+        GIVEN a session that answers one 429 and then always 500
+        WHEN CardanoTxUtxoExtractor.get_tx_utxo is invoked
+        THEN it gives up with the 500 once MAX_FAILED_ATTEMPTS requests have failed with it
+        """
+        session: FakeSession = FakeSession(
+            [FakeResponse(429, headers={"Retry-After": "0"})] + [FakeResponse(500) for _ in range(MAX_ATTEMPTS)]
+        )
+
+        with pytest.raises(Exception, match="500"):
+            await self.extractor_for(session).get_tx_utxo(tx_hash="abc")
+
+        assert session.calls == 1 + MAX_FAILED_ATTEMPTS
+
+    def test_rate_limit_error_carries_retry_after(self) -> None:
+        """
+        GIVEN a retry_after value
+        WHEN BlockfrostRateLimitError is raised
+        THEN the value is kept for the caller
+        """
+        assert BlockfrostRateLimitError(2.5).retry_after == 2.5
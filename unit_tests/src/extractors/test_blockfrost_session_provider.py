@@ -0,0 +1,33 @@
+import aiohttp
+import pytest
+
+from src.extractors.blockfrost_session_provider import BlockfrostSessionProvider
+
+
+class TestBlockfrostSessionProvider:
+    """
+    test that the extractors share one long-lived session and that it is closed cleanly
+    Prepare: BlockfrostSessionProvider with a per-host limit and DNS cache
+    Act: get_session twice, then close
+    Assert: the same session and connector settings are reused, and a new session is only created after close
+    """
+
+    @pytest.mark.asyncio
+    async def test_session_is_shared_and_closed(self) -> None:
+        """
+        GIVEN a BlockfrostSessionProvider
+        WHEN get_session is called repeatedly and close is awaited
+        THEN the same configured session is returned until it is closed
+        """
+        session_provider: BlockfrostSessionProvider = BlockfrostSessionProvider(limit_per_host=7, ttl_dns_cache=60)
+
+        session: aiohttp.ClientSession = session_provider.get_session()
+        assert session_provider.get_session() is session
+        assert isinstance(session.connector, aiohttp.TCPConnector)
+        assert session.connector.limit_per_host == 7
+
+        await session_provider.close()
+        assert session.closed
+        new_session: aiohttp.ClientSession = session_provider.get_session()
+        assert new_session is not session
+        await session_provider.close()
@@ -1,7 +1,7 @@
 import pytest
 from dotenv import load_dotenv
 from asyncio import AbstractEventLoop, new_event_loop
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from src.extractors.get_block import CardanoBlockExtractor
 from src.models.blockfrost_models.raw_cardano_blocks import RawBlockfrostCardanoBlockInfo
@@ -52,7 +52,7 @@ class TestCardanoBlockExtractor:
             "src.extractors.get_block.CardanoBlockExtractor.get_block",
             new=AsyncMock(return_value=dummy_raw_blockfrost_block_info),
         ):
-            extractor=CardanoBlockExtractor()
+            extractor=CardanoBlockExtractor(session_provider=MagicMock())
 
             response: RawBlockfrostCardanoBlockInfo = await extractor.get_block(block_number=expected_height)
 
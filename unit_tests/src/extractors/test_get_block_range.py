@@ -0,0 +1,95 @@
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from src.extractors.get_block_range import CardanoBlockRangeExtractor
+from src.models.blockfrost_models.raw_cardano_blocks import RawBlockfrostCardanoBlockInfo
+
+
+def make_block(height: int) -> RawBlockfrostCardanoBlockInfo:
+    return RawBlockfrostCardanoBlockInfo(
+        time=1735887615,
+        height=height,
+        hash=f"hash_{height}",
+        slot=144321324 + height,
+        epoch=531,
+        epoch_slot=292524,
+        slot_leader="pool12p0qtp89dfzr6spqq4xl6ha2s9m8lqydnvfafyd0h38fy0hfv3f",
+        size=3117,
+        tx_count=2,
+        output="3504478834",
+        fees="597821",
+        block_vrf=None,
+        op_cert=None,
+        op_cert_counter="1",
+        previous_block=f"hash_{height - 1}",
+        next_block=f"hash_{height + 1}",
+        confirmations=700484,
+    )
+
+
+class TestCardanoBlockRangeExtractor:
+    """
+    test that a block height range is assembled from /next pages with per-block fallback
+    Prepare: CardanoBlockRangeExtractor whose page and per-block calls are mocked
+    Act: get_block_range
+    Assert: pages are anchored on the block before them, gaps fall back to per-block calls, result is contiguous
+    """
+
+    @pytest.mark.asyncio
+    async def test_range_is_fetched_in_pages(self) -> None:
+        """
+        GIVEN a range of 250 blocks
+        WHEN get_block_range is invoked
+        THEN 3 pages of at most 100 are requested, each anchored on the block before the page
+        """
+        extractor: CardanoBlockRangeExtractor = CardanoBlockRangeExtractor(
+            block_extractor=MagicMock(), session_provider=MagicMock(), rate_limiter=MagicMock()
+        )
+        extractor.get_next_blocks = AsyncMock(
+            side_effect=lambda block_number, count: [make_block(int(block_number) + i) for i in range(1, count + 1)]
+        )
+
+        result: list[RawBlockfrostCardanoBlockInfo] = await extractor.get_block_range(1000, 1249)
+
+        assert [block.height for block in result] == list(range(1000, 1250))
+        assert [call.args for call in extractor.get_next_blocks.call_args_list] == [
+            ("999", 100), ("1099", 100), ("1199", 50)
+        ]
+
+    @pytest.mark.asyncio
+    async def test_gaps_fall_back_to_per_block_requests(self) -> None:
+        """
+        GIVEN a page missing block 1005
+        WHEN get_block_range is invoked
+        THEN block 1005 is fetched on its own and the range is complete
+        """
+        block_extractor: MagicMock = MagicMock()
+        block_extractor.get_block = AsyncMock(side_effect=lambda block_number: make_block(int(block_number)))
+        extractor: CardanoBlockRangeExtractor = CardanoBlockRangeExtractor(
+            block_extractor=block_extractor, session_provider=MagicMock(), rate_limiter=MagicMock()
+        )
+        extractor.get_next_blocks = AsyncMock(
+            return_value=[make_block(height) for height in range(1000, 1010) if height != 1005]
+        )
+
+        result: list[RawBlockfrostCardanoBlockInfo] = await extractor.get_block_range(1000, 1009)
+
+        assert [block.height for block in result] == list(range(1000, 1010))
+        block_extractor.get_block.assert_awaited_once_with("1005")
+
+    @pytest.mark.asyncio
+    async def test_broken_hash_chain_raises(self) -> None:
+        """
+        GIVEN a page whose block 1003 does not point at the hash of block 1002
+        WHEN get_block_range is invoked
+        THEN a ValueError is raised
+        """
+        blocks: list[RawBlockfrostCardanoBlockInfo] = [make_block(height) for height in range(1000, 1005)]
+        blocks[3] = blocks[3].model_copy(update={"previous_block": "forked_hash"})
+        extractor: CardanoBlockRangeExtractor = CardanoBlockRangeExtractor(
+            block_extractor=MagicMock(), session_provider=MagicMock(), rate_limiter=MagicMock()
+        )
+        extractor.get_next_blocks = AsyncMock(return_value=blocks)
+
+        with pytest.raises(ValueError):
+            await extractor.get_block_range(1000, 1004)
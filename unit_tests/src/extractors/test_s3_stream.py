@@ -0,0 +1,55 @@
+import io
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.extractors.get_tx_utxo_from_s3 import CardanoTxUtxoS3Extractor
+from src.models.blockfrost_models.cardano_transaction_utxo import TransactionUTxO
+
+
+class TestOpenS3Stream:
+    """
+    test that the streaming readers retry opening the S3 object, but not an error partway through it
+    Prepare: an S3Explorer whose open_stream fails before handing out a stream, or a stream failing while read
+    Act: stream a raw tx utxo file through CardanoTxUtxoS3Extractor.iter_raw_tx_utxo_from_s3
+    Assert: a failed open is retried, a failed read is raised after the chunks already yielded
+    """
+    def test_retries_opening_the_stream(self) -> None:
+        """
+        GIVEN an S3 object whose first two opens fail
+        WHEN it is streamed
+        THEN the third open is read, and every record is yielded once
+        """
+        s3_explorer: MagicMock = MagicMock()
+        s3_explorer.open_stream.side_effect = [
+            ConnectionError("connection reset"),
+            ConnectionError("connection reset"),
+            io.BytesIO(b'{"hash":"tx_0","inputs":[],"outputs":[]}\n{"hash":"tx_1","inputs":[],"outputs":[]}\n'),
+        ]
+        extractor: CardanoTxUtxoS3Extractor = CardanoTxUtxoS3Extractor(s3_explorer=s3_explorer)
+
+        chunks: list[list[TransactionUTxO]] = list(extractor.iter_raw_tx_utxo_from_s3("raw/utxo.jsonl", chunk_size=1))
+
+        assert [tx.hash for chunk in chunks for tx in chunk] == ["tx_0", "tx_1"]
+        assert s3_explorer.open_stream.call_count == 3
+
+    def test_does_not_replay_a_stream_failing_partway(self) -> None:
+        """
+        GIVEN an S3 object whose stream fails after its first record
+        WHEN it is streamed
+        THEN the first chunk is yielded, the read error is raised, and the object is not opened again
+        """
+        stream: MagicMock = MagicMock()
+        stream.read.side_effect = [b'{"hash":"tx_0","inputs":[],"outputs":[]}\n', ConnectionError("connection reset")]
+        s3_explorer: MagicMock = MagicMock()
+        s3_explorer.open_stream.return_value = stream
+        extractor: CardanoTxUtxoS3Extractor = CardanoTxUtxoS3Extractor(s3_explorer=s3_explorer)
+        chunks: list[list[TransactionUTxO]] = []
+
+        with pytest.raises(ConnectionError):
+            for chunk in extractor.iter_raw_tx_utxo_from_s3("raw/utxo.jsonl", chunk_size=1):
+                chunks.append(chunk)
+
+        assert [tx.hash for chunk in chunks for tx in chunk] == ["tx_0"]
+        assert s3_explorer.open_stream.call_count == 1
+        stream.close.assert_called_once()
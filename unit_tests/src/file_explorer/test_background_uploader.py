@@ -0,0 +1,92 @@
+import asyncio
+import time
+from typing import Generator
+
+import boto3
+import pandas as pd
+import pytest
+from moto import mock_aws
+from mypy_boto3_s3 import Client
+
+from src.file_explorer.background_uploader import BackgroundCsvUploader
+from src.file_explorer.s3_file_explorer import S3Explorer
+
+
+class TestBackgroundCsvUploader:
+    @pytest.fixture
+    def s3_explorer(self) -> Generator[S3Explorer, None, None]:
+        with mock_aws():
+            client: Client = boto3.client("s3", region_name="us-east-1")
+            client.create_bucket(Bucket="cardano")
+            yield S3Explorer(bucket_name="cardano", client=client)
+
+    @pytest.mark.asyncio
+    async def test_uploads_csv_after_wait(self, s3_explorer: S3Explorer) -> None:
+        """
+        GIVEN more DataFrames submitted than uploads allowed in flight
+        WHEN wait() returns
+        THEN every DataFrame is in S3 as a csv without index
+        """
+        uploader: BackgroundCsvUploader = BackgroundCsvUploader(s3_explorer, max_pending=2)
+        frames: list[pd.DataFrame] = [pd.DataFrame({"hash": [f"tx_{i}"], "size": [i]}) for i in range(5)]
+
+        for part, df in enumerate(frames):
+            await uploader.submit(df, f"transformed/part{part}.csv")
+        await uploader.wait()
+
+        for part, df in enumerate(frames):
+            uploaded: pd.DataFrame = pd.read_csv(s3_explorer.download_to_buffer(f"transformed/part{part}.csv"))
+            pd.testing.assert_frame_equal(uploaded, df)
+
+    @pytest.mark.asyncio
+    async def test_disabled_uploads_nothing(self, s3_explorer: S3Explorer) -> None:
+        """
+        GIVEN a disabled uploader
+        WHEN a DataFrame is submitted
+        THEN nothing is written to S3
+        """
+        uploader: BackgroundCsvUploader = BackgroundCsvUploader(s3_explorer, enabled=False)
+
+        await uploader.submit(pd.DataFrame({"hash": ["tx_0"]}), "transformed/part0.csv")
+        await uploader.wait()
+
+        assert list(s3_explorer.list_files("transformed", pd.Timestamp("2020-01-01").to_pydatetime())) == []
+
+    @pytest.mark.asyncio
+    async def test_wait_raises_upload_error(self) -> None:
+        """
+        GIVEN an upload that fails
+        WHEN wait() is called
+        THEN the error is raised
+        """
+        class FailingS3Explorer:
+            def upload_buffer(self, bytes_io, source_path: str) -> None:
+                raise RuntimeError(f"cannot upload {source_path}")
+
+        uploader: BackgroundCsvUploader = BackgroundCsvUploader(FailingS3Explorer())  # type: ignore[arg-type]
+
+        await uploader.submit(pd.DataFrame({"hash": ["tx_0"]}), "transformed/part0.csv")
+        with pytest.raises(RuntimeError, match="transformed/part0.csv"):
+            await uploader.wait()
+
+    @pytest.mark.asyncio
+    async def test_failed_upload_drops_the_others(self) -> None:
+        """
+        GIVEN a failing upload submitted before slower ones
+        WHEN wait() raises the error
+        THEN no upload task is left behind
+        """
+        class FirstFailingS3Explorer:
+            def upload_buffer(self, bytes_io, source_path: str) -> None:
+                if source_path.endswith("part0.csv"):
+                    raise RuntimeError(f"cannot upload {source_path}")
+                time.sleep(0.05)
+
+        uploader: BackgroundCsvUploader = BackgroundCsvUploader(FirstFailingS3Explorer())  # type: ignore[arg-type]
+
+        for part in range(3):
+            await uploader.submit(pd.DataFrame({"hash": [f"tx_{part}"]}), f"transformed/part{part}.csv")
+        with pytest.raises(RuntimeError, match="transformed/part0.csv"):
+            await uploader.wait()
+
+        assert [task for task in asyncio.all_tasks() if task is not asyncio.current_task()] == []
@@ -0,0 +1,29 @@
+import importlib
+import sys
+from typing import Generator
+
+import pytest
+
+from src.file_explorer import compression
+
+
+class TestCompression:
+    @pytest.fixture
+    def without_zstandard(self, monkeypatch: pytest.MonkeyPatch) -> Generator[None, None, None]:
+        # a None entry in sys.modules makes the import raise ImportError
+        monkeypatch.setitem(sys.modules, "zstandard", None)
+        importlib.reload(compression)
+        yield
+        monkeypatch.undo()
+        importlib.reload(compression)
+
+    def test_zstd_not_offered_without_zstandard(self, without_zstandard: None) -> None:
+        """
+        GIVEN zstandard is not installed
+        WHEN the codec choices are listed, or zstd is asked for
+        THEN zstd is not among the choices and parsing it raises, while gzip still works
+        """
+        assert compression.CODEC_CHOICES == ["none", "gzip"]
+        with pytest.raises(RuntimeError, match="zstandard"):
+            compression.parse_codec("zstd")
+        assert compression.decompress_bytes(compression.compress_bytes(b"block", "gzip"), "gzip") == b"block"
@@ -0,0 +1,85 @@
+import io
+import json
+from typing import Any, Generator
+
+import boto3
+import pytest
+from moto import mock_aws
+from mypy_boto3_s3 import Client
+
+from src.extractors.get_tx_utxo_from_s3 import CardanoTxUtxoS3Extractor
+from src.file_explorer.json_lines import iter_json_records
+from src.file_explorer.s3_file_explorer import S3Explorer
+from src.models.database_transfer_objects.cardano_transactions_utxo_dto import CardanoTransactionUtxoDTO
+
+
+class TestIterJsonRecords:
+    """
+    test that raw files are parsed record by record while they are read
+    Prepare: raw records written as a JSON array and as JSON lines
+    Act: iter_json_records with read sizes smaller than a record
+    Assert: the records come back whole and in order
+    """
+    @pytest.fixture()
+    def records(self) -> list[dict[str, Any]]:
+        return [
+            {"hash": f"tx_{i}", "inputs": [], "outputs": [{"amount": [{"unit": "lovelace", "quantity": "1"}]}], "memo": "é" * i}
+            for i in range(50)
+        ]
+
+    @pytest.mark.parametrize("read_size", [1, 7, 1024])
+    def test_json_array(self, records: list[dict[str, Any]], read_size: int) -> None:
+        """
+        GIVEN a .json file holding one indented JSON array
+        WHEN it is read read_size bytes at a time
+        THEN every element is yielded in order
+        """
+        stream: io.BytesIO = io.BytesIO(json.dumps(records, indent=2, ensure_ascii=False).encode("utf-8"))
+
+        assert list(iter_json_records(stream, "raw/file.json", read_size=read_size)) == records
+
+    @pytest.mark.parametrize("read_size", [1, 7, 1024])
+    def test_json_lines(self, records: list[dict[str, Any]], read_size: int) -> None:
+        """
+        GIVEN a .jsonl file with one record per line
+        WHEN it is read read_size bytes at a time
+        THEN every line is yielded in order
+        """
+        stream: io.BytesIO = io.BytesIO(
+            b"".join(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n" for record in records)
+        )
+
+        assert list(iter_json_records(stream, "raw/file.jsonl", read_size=read_size)) == records
+
+    def test_truncated_json_array_raises(self) -> None:
+        """
+        GIVEN a .json file cut off in the middle of the array
+        WHEN it is parsed
+        THEN an error is raised instead of silently dropping the tail
+        """
+        with pytest.raises(ValueError):
+            list(iter_json_records(io.BytesIO(b'[{"hash": "tx_0"}, {"hash": "tx'), "raw/file.json", read_size=4))
+
+
+class TestCardanoTxUtxoS3ExtractorStreaming:
+    @pytest.fixture
+    def s3_explorer(self) -> Generator[S3Explorer, None, None]:
+        with mock_aws():
+            client: Client = boto3.client("s3", region_name="us-east-1")
+            client.create_bucket(Bucket="cardano")
+            yield S3Explorer(bucket_name="cardano", client=client)
+
+    def test_iter_tx_utxo_from_s3(self, s3_explorer: S3Explorer) -> None:
+        """
+        GIVEN a raw tx utxo file of 5 transactions in S3
+        WHEN it is streamed in chunks of 2
+        THEN the chunks hold 2, 2 and 1 DTOs in file order
+        """
+        records: list[dict[str, Any]] = [{"hash": f"tx_{i}", "inputs": [], "outputs": []} for i in range(5)]
+        s3_explorer.upload_buffer(io.BytesIO(json.dumps(records).encode("utf-8")), source_path="raw/utxo.json")
+        extractor: CardanoTxUtxoS3Extractor = CardanoTxUtxoS3Extractor(s3_explorer=s3_explorer)
+
+        chunks: list[list[CardanoTransactionUtxoDTO]] = list(extractor.iter_tx_utxo_from_s3("raw/utxo.json", chunk_size=2))
+
+        assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+        assert [dto.hash for chunk in chunks for dto in chunk] == [record["hash"] for record in records]
@@ -0,0 +1,91 @@
+from typing import Generator
+
+import boto3
+import pytest
+from moto import mock_aws
+from mypy_boto3_s3 import Client
+
+from src.file_explorer.key_layout import (
+    MAX_HEIGHT_RANGE_WIDTH,
+    derived_key,
+    height_range_key,
+    parse_height_range,
+    parse_part,
+)
+from src.file_explorer.s3_file_explorer import S3Explorer
+
+
+class TestKeyLayout:
+    def test_keys_sort_by_height(self) -> None:
+        """
+        GIVEN block ranges whose heights have different numbers of digits
+        WHEN their keys are built
+        THEN the keys sort in height order and parse back to their range
+        """
+        ranges: list[tuple[int, int]] = [(999, 1998), (1999, 2998), (11292700, 11293699)]
+        keys: list[str] = [height_range_key("blocks", "raw", start, end) for start, end in reversed(ranges)]
+
+        assert sorted(keys) == list(reversed(keys))
+        assert [parse_height_range(key) for key in sorted(keys)] == ranges
+        assert sorted(keys)[0] == "cardano/blocks/raw/height=0000000999-0000001998/part-00000.jsonl"
+
+    def test_range_wider_than_max_raises(self) -> None:
+        """
+        GIVEN a block range wider than an object may cover
+        WHEN its key is built
+        THEN a ValueError asks to split it
+        """
+        with pytest.raises(ValueError):
+            height_range_key("blocks", "raw", 0, MAX_HEIGHT_RANGE_WIDTH)
+
+    def test_derived_key(self) -> None:
+        """
+        GIVEN a raw key in the height range layout and a legacy raw key
+        WHEN the key of a transformed part is derived from them
+        THEN it covers the same range under the transformed prefix, and is None for the legacy key
+        """
+        raw_key: str = height_range_key("transactions", "raw", 100, 199)
+
+        assert derived_key(raw_key, "cardano/transactions/transformed/", 3, "csv") == (
+            "cardano/transactions/transformed/height=0000000100-0000000199/part-00003.csv"
+        )
+        assert derived_key("cardano/transactions/raw/199/cardano_transactions_199.jsonl", "cardano/transactions/transformed", 0, "csv") is None
+
+    def test_derived_keys_of_later_parts_do_not_collide(self) -> None:
+        """
+        GIVEN part 0 and part 1 of the raw objects of one block range
+        WHEN the keys of their transformed parts are derived
+        THEN no two keys are the same, and each raw key parses back to its part
+        """
+        raw_keys: list[str] = [height_range_key("transactions", "raw", 100, 199, part=part) for part in range(2)]
+        derived_keys: list[str | None] = [
+            derived_key(raw_key, "cardano/transactions/transformed/", part, "csv") for raw_key in raw_keys for part in range(2)
+        ]
+
+        assert [parse_part(raw_key) for raw_key in raw_keys] == [0, 1]
+        assert len(set(derived_keys)) == 4
+        assert derived_keys[2] == "cardano/transactions/transformed/height=0000000100-0000000199/part-00001-00000.csv"
+
+
+class TestListFilesInHeightRange:
+    @pytest.fixture
+    def s3_explorer(self) -> Generator[S3Explorer, None, None]:
+        with mock_aws():
+            client: Client = boto3.client("s3", region_name="us-east-1")
+            client.create_bucket(Bucket="cardano")
+            for start in range(0, 10_000, 1_000):
+                client.put_object(Bucket="cardano", Key=height_range_key("blocks", "raw", start, start + 999), Body=b"{}")
+            client.put_object(Bucket="cardano", Key="cardano/blocks/raw/999/cardano_blocks_raw/999.json", Body=b"{}")
+            yield S3Explorer(bucket_name="cardano", client=client)
+
+    def test_lists_overlapping_ranges(self, s3_explorer: S3Explorer) -> None:
+        """
+        GIVEN objects of 1000 blocks each from height 0 to 9999, and a legacy key
+        WHEN the objects overlapping 2500 to 4000 are listed
+        THEN the objects starting at 2000, 3000 and 4000 are returned, in height order
+        """
+        file_paths: list[str] = [
+            file_info.file_path for file_info in s3_explorer.list_files_in_height_range("cardano/blocks/raw", 2500, 4000)
+        ]
+
+        assert [parse_height_range(file_path) for file_path in file_paths] == [(2000, 2999), (3000, 3999), (4000, 4999)]
@@ -1,6 +1,8 @@
+import gzip
+import hashlib
 import io
 from datetime import datetime
-from typing import Generator
+from typing import Any, Generator
 
 import freezegun
 from pandas.testing import assert_frame_equal
@@ -10,6 +12,7 @@ import pytest
 import boto3
 from moto import mock_aws
 from src.file_explorer.s3_file_explorer import S3Explorer
+from src.file_explorer.json_lines import MIN_PART_SIZE, iter_json_records, load_json_records
 from src.models.file_info.file_info import FileInfo
 
 ENDPOINT_URL = "http://localhost:9001"
@@ -115,11 +118,9 @@ class TestS3Explorer:
         WHEN I list S3 files
         THEN I expect to be able to get the test file's FileInfo
         """
-        buffer = io.BytesIO(
-            b"instrument,timestamp,price,created_at\nA,2025-05-02 00:00:00,1.00,2025-05-02 00:00:00"
-        )
+        content: bytes = b"instrument,timestamp,price,created_at\nA,2025-05-02 00:00:00,1.00,2025-05-02 00:00:00"
         s3_client.upload_fileobj(
-            buffer, bucket_name, "sample_source_path/sample_file.csv"
+            io.BytesIO(content), bucket_name, "sample_source_path/sample_file.csv"
         )
         file_infos: list[FileInfo] = list(
             s3_explorer.list_files(
@@ -130,6 +131,164 @@ class TestS3Explorer:
             FileInfo(
                 file_path="sample_source_path/sample_file.csv",
                 modified_date=datetime(2025, 5, 3),
+                etag=hashlib.md5(content).hexdigest(),
+                size=len(content),
             )
         ]
         assert file_infos == expected_file_infos
+
+    def test_list_files_after(
+        self, bucket_name: str, s3_client: Client, s3_explorer: S3Explorer
+    ) -> None:
+        """
+        GIVEN files under a prefix, and a file under a sibling prefix sharing its beginning
+        WHEN I list the files after a key
+        THEN I expect only the files of the prefix sorting after that key, in key order
+        """
+        for key in [
+            "raw/00000002/part-0.jsonl",
+            "raw/00000001/part-0.jsonl",
+            "raw/00000003/part-0.jsonl",
+            "raw_other/00000004/part-0.jsonl",
+        ]:
+            s3_client.put_object(Bucket=bucket_name, Key=key, Body=b"{}")
+
+        assert [file_info.file_path for file_info in s3_explorer.list_files_after("raw/", "raw/00000001/part-0.jsonl")] == [
+            "raw/00000002/part-0.jsonl",
+            "raw/00000003/part-0.jsonl",
+        ]
+        assert [file_info.file_path for file_info in s3_explorer.list_files_after("raw/", None)] == [
+            "raw/00000001/part-0.jsonl",
+            "raw/00000002/part-0.jsonl",
+            "raw/00000003/part-0.jsonl",
+        ]
+
+    def test_open_json_lines_writer(
+        self, bucket_name: str, s3_client: Client, s3_explorer: S3Explorer
+    ) -> None:
+        """
+        GIVEN more records than fit in one 5 MiB multipart part
+        WHEN I write them through the json lines writer
+        THEN I expect one S3 object with one record per line, in write order
+        """
+        records: list[dict[str, Any]] = [{"height": i, "hash": "a" * 100} for i in range(60000)]
+        with s3_explorer.open_json_lines_writer(
+            "sample_source_path/sample_file.jsonl", part_size=MIN_PART_SIZE
+        ) as writer:
+            writer.write_many(records)
+
+        actual_buffer: io.BytesIO = s3_explorer.download_to_buffer("sample_source_path/sample_file.jsonl")
+        assert len(actual_buffer.getvalue()) > MIN_PART_SIZE
+        assert load_json_records(actual_buffer, "sample_source_path/sample_file.jsonl") == records
+
+    def test_open_json_lines_writer_aborts_on_error(
+        self, bucket_name: str, s3_client: Client, s3_explorer: S3Explorer
+    ) -> None:
+        """
+        GIVEN a json lines writer that fails after uploading a part
+        WHEN the error leaves the with block
+        THEN I expect no S3 object and no pending multipart upload
+        """
+        with pytest.raises(RuntimeError):
+            with s3_explorer.open_json_lines_writer(
+                "sample_source_path/sample_file.jsonl", part_size=MIN_PART_SIZE
+            ) as writer:
+                writer.write_many({"height": i, "hash": "a" * 100} for i in range(60000))
+                raise RuntimeError("provider failed")
+
+        assert "Contents" not in s3_client.list_objects_v2(Bucket=bucket_name)
+        assert "Uploads" not in s3_client.list_multipart_uploads(Bucket=bucket_name)
+
+    def test_upload_many(
+        self, bucket_name: str, s3_client: Client, s3_explorer: S3Explorer
+    ) -> None:
+        """
+        GIVEN 5 buffers uploaded at once
+        WHEN I download each of them
+        THEN I expect each buffer's content back at its path
+        """
+        s3_explorer.upload_many(
+            (io.BytesIO(f"file {i}".encode()), f"sample_source_path/file_{i}.csv") for i in range(5)
+        )
+        s3_explorer.close()
+
+        buffers: list[io.BytesIO] = [
+            s3_explorer.download_to_buffer(f"sample_source_path/file_{i}.csv") for i in range(5)
+        ]
+
+        assert [buffer.getvalue() for buffer in buffers] == [f"file {i}".encode() for i in range(5)]
+
+    @pytest.mark.asyncio
+    async def test_prefetch(
+        self, bucket_name: str, s3_client: Client, s3_explorer: S3Explorer
+    ) -> None:
+        """
+        GIVEN 6 files listed under a prefix
+        WHEN I iterate over them with a read ahead of 2, stopping after the 4th
+        THEN I expect each file with its content in listing order, up to where I stopped
+        """
+        for i in range(6):
+            s3_client.put_object(Bucket=bucket_name, Key=f"raw/{i:08d}.jsonl", Body=f"file {i}".encode())
+
+        fetched: list[tuple[str, bytes]] = []
+        async for file_info, buffer in s3_explorer.prefetch(s3_explorer.list_files_after("raw/", None), read_ahead=2):
+            fetched.append((file_info.file_path, buffer.getvalue()))
+            if len(fetched) == 4:
+                break
+        s3_explorer.close()
+
+        assert fetched == [(f"raw/{i:08d}.jsonl", f"file {i}".encode()) for i in range(4)]
+
+    def test_gzip_objects(
+        self, bucket_name: str, s3_client: Client, s3_explorer: S3Explorer
+    ) -> None:
+        """
+        GIVEN records written through the json lines writer and a csv buffer uploaded, both under .gz keys
+        WHEN I read them back through the explorer
+        THEN I expect gzip objects in S3, and the plain records and csv from every read path
+        """
+        records: list[dict[str, Any]] = [{"height": i, "hash": "a" * 64} for i in range(1000)]
+        with s3_explorer.open_json_lines_writer("raw/part-00000.jsonl.gz") as writer:
+            writer.write_many(records)
+        s3_explorer.upload_buffer(io.BytesIO(b"height,hash\n1,a\n"), "transformed/part-00000.csv.gz")
+
+        stored: bytes = s3_client.get_object(Bucket=bucket_name, Key="raw/part-00000.jsonl.gz")["Body"].read()
+        assert gzip.decompress(stored).count(b"\n") == len(records)
+        assert len(stored) < len(gzip.decompress(stored))
+        assert load_json_records(
+            s3_explorer.download_to_buffer("raw/part-00000.jsonl.gz"), "raw/part-00000.jsonl.gz"
+        ) == records
+        stream = s3_explorer.open_stream("raw/part-00000.jsonl.gz")
+        assert list(iter_json_records(stream, "raw/part-00000.jsonl.gz", read_size=100)) == records
+        stream.close()
+        assert s3_explorer.download_to_buffer("transformed/part-00000.csv.gz").getvalue() == b"height,hash\n1,a\n"
+
+    def test_open_stream_content_encoding(
+        self, bucket_name: str, s3_client: Client, s3_explorer: S3Explorer
+    ) -> None:
+        """
+        GIVEN a gzip object written by another tool, with a Content-Encoding but no codec suffix
+        WHEN I open it as a stream
+        THEN I expect the decoded bytes
+        """
+        s3_client.put_object(
+            Bucket=bucket_name, Key="raw/legacy.jsonl", Body=gzip.compress(b'{"height":1}\n'), ContentEncoding="gzip"
+        )
+
+        stream = s3_explorer.open_stream("raw/legacy.jsonl")
+        assert list(iter_json_records(stream, "raw/legacy.jsonl")) == [{"height": 1}]
+        stream.close()
+
+    def test_download_to_buffer_content_encoding(
+        self, bucket_name: str, s3_client: Client, s3_explorer: S3Explorer
+    ) -> None:
+        """
+        GIVEN a gzip object written by another tool, with a Content-Encoding but no codec suffix
+        WHEN I download it to a buffer
+        THEN I expect the decoded bytes, as open_stream returns them
+        """
+        s3_client.put_object(
+            Bucket=bucket_name, Key="raw/legacy.jsonl", Body=gzip.compress(b'{"height":1}\n'), ContentEncoding="gzip"
+        )
+
+        assert s3_explorer.download_to_buffer("raw/legacy.jsonl").getvalue() == b'{"height":1}\n'
@@ -0,0 +1,100 @@
+import uuid
+import pytest
+import pandas as pd
+from datetime import datetime
+from typing import Iterator
+from pandas.testing import assert_frame_equal
+
+from src.models.blockfrost_models.cardano_transaction_utxo import (
+    TransactionUTxO,
+    TransactionInput,
+    TransactionOutput,
+    Amount,
+)
+from src.models.database_transfer_objects import cardano_transactions_utxo_dto
+from src.models.database_transfer_objects.cardano_transactions_utxo_dto import CardanoTransactionUtxoDTO
+from src.transformer.transform_cardano_tx_utxo_dto_to_df import TransformCardanoTxUtxoDTOToDf
+
+
+class TestTransformCardanoTxUtxoDTOToDf:
+    @pytest.fixture()
+    def tx_utxo_list(self) -> list[TransactionUTxO]:
+        return [
+            TransactionUTxO(
+                hash=f"tx{i}",
+                inputs=[
+                    TransactionInput(
+                        address=f"addr_in{i}_{j}",
+                        amount=[
+                            Amount(unit="lovelace", quantity=str(2000000 + j)),
+                            Amount(unit="29d222ce763455e3d7a09a665ce554f00ac89d2e99a1a83d267170c64d494e", quantity="50000000000"),
+                        ],
+                        tx_hash=f"prev{i}_{j}",
+                        output_index=j,
+                        data_hash=None if j else "datahash",
+                        collateral=False,
+                    )
+                    for j in range(2)
+                ],
+                outputs=[
+                    TransactionOutput(
+                        address=f"addr_out{i}",
+                        amount=[Amount(unit="lovelace", quantity="682590846")],
+                        output_index=0,
+                        inline_datum="d87980",
+                        collateral=False,
+                        consumed_by_tx=None if i else "next0",
+                    )
+                ],
+            )
+            for i in range(3)
+        ]
+
+    @staticmethod
+    def _deterministic_uuid4(monkeypatch: pytest.MonkeyPatch) -> None:
+        counter: Iterator[int] = iter(range(1, 1_000_000))
+        monkeypatch.setattr(uuid, "uuid4", lambda: uuid.UUID(int=next(counter)))
+
+    def test_transform_raw_matches_transform_of_dtos(
+        self, tx_utxo_list: list[TransactionUTxO], monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        """
+        GIVEN validated TransactionUTxO models, the same sequence of generated ids for both paths and a frozen clock
+        WHEN the frames are built with transform_raw and with transform over from_raw_cardano_tx_utxo DTOs
+        THEN all five frames are identical, values, dtypes and column order
+        """
+        created_at: datetime = datetime(2025, 5, 2)
+
+        class _FrozenDatetime(datetime):
+            @classmethod
+            def utcnow(cls) -> datetime:
+                return created_at
+
+        monkeypatch.setattr(cardano_transactions_utxo_dto, "datetime", _FrozenDatetime)
+        self._deterministic_uuid4(monkeypatch)
+        dtos: list[CardanoTransactionUtxoDTO] = [
+            CardanoTransactionUtxoDTO.from_raw_cardano_tx_utxo(hash=tx.hash, input=tx) for tx in tx_utxo_list
+        ]
+        expected: dict[str, pd.DataFrame] = TransformCardanoTxUtxoDTOToDf.transform(cardano_tx_utxo_dto_list=dtos)
+
+        self._deterministic_uuid4(monkeypatch)
+        actual: dict[str, pd.DataFrame] = TransformCardanoTxUtxoDTOToDf.transform_raw(
+            tx_utxo_list=tx_utxo_list, created_at=created_at
+        )
+
+        assert list(actual) == list(expected)
+        for name in expected:
+            assert_frame_equal(actual[name], expected[name])
+        assert len(actual["cardano_tx_utxo_input_amt"]) == 12
+        assert actual["cardano_tx_utxo_output_amt"]["parent_id"].tolist() == actual["cardano_tx_utxo_output"]["id"].tolist()
+
+    def test_transform_empty_list(self) -> None:
+        """
+        GIVEN no transactions
+        WHEN transform and transform_raw are invoked
+        THEN every frame is empty, without columns, as DataFrame.from_records([]) returns
+        """
+        for dfs in (TransformCardanoTxUtxoDTOToDf.transform([]), TransformCardanoTxUtxoDTOToDf.transform_raw([])):
+            assert len(dfs) == 5
+            for df in dfs.values():
+                assert_frame_equal(df, pd.DataFrame.from_records([]))
@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+
+from src.utils.concurrency_utils import gather_with_concurrency
+
+
+class TestGatherWithConcurrency:
+    """
+    test that gather_with_concurrency keeps the input order of results while never exceeding the in-flight limit
+    Prepare: coroutines that sleep for different durations and record how many are running at once
+    Act: gather_with_concurrency
+    Assert: results are in input order and the peak in-flight count never exceeds the limit
+    """
+
+    @pytest.mark.asyncio
+    async def test_results_in_input_order_within_limit(self) -> None:
+        """
+        GIVEN 20 coroutines that finish in reverse order and a limit of 4
+        WHEN gather_with_concurrency is invoked
+        THEN results are returned in input order and at most 4 coroutines ran at once
+        """
+        in_flight: int = 0
+        peak_in_flight: int = 0
+
+        async def fetch(i: int) -> int:
+            nonlocal in_flight, peak_in_flight
+            in_flight += 1
+            peak_in_flight = max(peak_in_flight, in_flight)
+            await asyncio.sleep(0.001 * (20 - i))
+            in_flight -= 1
+            return i
+
+        results: list[int] = await gather_with_concurrency(4, (fetch(i) for i in range(20)))
+
+        assert results == list(range(20))
+        assert peak_in_flight == 4
+
+    @pytest.mark.asyncio
+    async def test_invalid_limit(self) -> None:
+        """
+        GIVEN a limit lower than 1
+        WHEN gather_with_concurrency is invoked
+        THEN a ValueError is raised
+        """
+        with pytest.raises(ValueError):
+            await gather_with_concurrency(0, [])
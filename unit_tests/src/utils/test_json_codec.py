@@ -0,0 +1,72 @@
+import io
+import json
+from typing import Any
+import pytest
+
+from src.utils import json_codec
+
+
+class TestJsonCodec:
+    """
+    test that the native and stdlib codecs are interchangeable
+    Prepare: a raw provider style record with unicode, nulls, nesting and a wide integer
+    Act: encode and decode with orjson and with the stdlib fallback
+    Assert: both produce the same bytes and decode back to the same record
+    """
+    @pytest.fixture()
+    def record(self) -> dict[str, Any]:
+        return {
+            "hash": "0715ec14c618e9d44847e1a782f26aaaa7ef69c2853f17a2c7e3926af65cf2a2",
+            "height": 11302700,
+            "metadata": {"msg": ["café ☃"]},
+            "amount": [{"unit": "lovelace", "quantity": "42000000"}],
+            "block_vrf": None,
+            "valid_contract": True,
+        }
+
+    def test_native_and_fallback_bytes_match(self, record: dict[str, Any], monkeypatch: pytest.MonkeyPatch) -> None:
+        """
+        GIVEN a raw record
+        WHEN it is encoded with orjson and with the stdlib fallback
+        THEN the bytes are identical and decode back to the record
+        """
+        pytest.importorskip("orjson")
+        native_bytes: bytes = json_codec.dumps(record)
+        monkeypatch.setattr(json_codec, "orjson", None)
+        fallback_bytes: bytes = json_codec.dumps(record)
+
+        assert native_bytes == fallback_bytes
+        assert json_codec.load(io.BytesIO(fallback_bytes)) == record
+
+    def test_wide_integer_falls_back_to_stdlib(self) -> None:
+        """
+        GIVEN an integer wider than 64 bits
+        WHEN it is encoded
+        THEN it is written out exactly
+        """
+        assert json_codec.dumps({"quantity": 2**70}) == b'{"quantity":1180591620717411303424}'
+
+    def test_wide_integer_round_trips(self) -> None:
+        """
+        GIVEN integers on both sides of the 64 bit boundary
+        WHEN they are encoded and decoded
+        THEN they come back as the same exact integers
+        """
+        record: dict[str, Any] = {"quantity": 2**70, "negative": -(2**64), "max_unsigned": 2**64 - 1, "id": "9" * 25}
+
+        decoded: Any = json_codec.loads(json_codec.dumps(record))
+
+        assert decoded == record
+        assert isinstance(decoded["quantity"], int)
+        assert json_codec.loads(json_codec.dumps(record).decode("utf-8")) == record
+
+    def test_reads_files_written_by_json_dumps(self, record: dict[str, Any]) -> None:
+        """
+        GIVEN a record written with the plain json.dumps of the earlier provider pipelines
+        WHEN it is decoded
+        THEN the record comes back unchanged, although newly written bytes are compact UTF-8
+        """
+        legacy_bytes: bytes = json.dumps([record]).encode("utf-8")
+
+        assert json_codec.load(io.BytesIO(legacy_bytes)) == [record]
+        assert json_codec.dumps([{"a": 1, "b": "é"}]) == '[{"a":1,"b":"é"}]'.encode("utf-8")